@@ -15,17 +15,33 @@ SETUP INSTRUCTIONS:
 
 LINKS:
 - Credentials Guide: https://strandsagents.com/latest/user-guide/quickstart/#configuring-credentials
-- HTTP Request Tool: https://github.com/strands-agents/tools/blob/main/src/strands_tools/http_request.py
+- Token security client (batching, caching, summaries): goplus_client.py
 - GoPlus: https://docs.gopluslabs.io/reference/api-overview
 - GoPlus API used: https://api.gopluslabs.io/api/v1/token_security/{chain_id}
 """
 
 # This example queries the goplus api to get token security information
 from strands import Agent, tool
-from strands.models import BedrockModel
-from strands_tools import http_request
-from config import INFERENCE_MODEL, REGION
+from model_registry import get_bedrock_model
+from config import (
+   INFERENCE_MODEL,
+   REGION,
+   SUB_AGENT_POOL_SIZE,
+   SUB_AGENT_POOL_LEASE_TIMEOUT,
+   GOPLUS_API_URL,
+   GOPLUS_CACHE_TTL,
+   GOPLUS_MAX_BATCH,
+   GOPLUS_POOL_SIZE,
+   GOPLUS_TIMEOUT,
+)
+from agent_pool import AgentPool
+from goplus_client import GoPlusClient, GoPlusError
+from streaming import stream_callback_handler
+from response_cache import response_cache
+from tool_metrics import measured, record_agent_result
+import json
 import os
+import requests
 
 # Define a crypto-focused system prompt
 CRYPTO_SYSTEM_PROMPT = """
@@ -34,28 +50,26 @@ CRYPTO_SYSTEM_PROMPT = """
 You are a specialized agent that analyzes the **security risk of cryptocurrency tokens** using the **GoPlus Labs Token Security API**.
 
 ## Agent Objective
-Your job is to call the GoPlus Labs API using the `http_request` tool to retrieve and summarize **security-related information** about a given token on a specific blockchain network.
-
-## API Endpoint
-- URL: `https://api.gopluslabs.io/api/v1/token_security/{chain_id}?contract_addresses={contract_address}`
-- Method: `GET`
-- Required Query Parameter:
-  - `contract_addresses`: a comma-separated list of token contract addresses.
-  
-Example request:
-http_request.get(
-url="https://api.gopluslabs.io/api/v1/token_security/1?contract_addresses=0x123abc..."
-)
+Your job is to call the GoPlus Labs API using the `goplus_token_security` tool to retrieve and summarize **security-related information** about a given token on a specific blockchain network.
+
+## Tool
+- `goplus_token_security(chain_id, contract_addresses)`
+  - `chain_id`: the chain id as a string
+  - `contract_addresses`: a list of token contract addresses on that chain, check them all in **one** call
+- Returns JSON with a security summary per address (or `null` when GoPlus has no data for it), including a `red_flags` list.
+
+Example call:
+goplus_token_security(chain_id="1", contract_addresses=["0x123abc...", "0x456def..."])
 
 ## Inputs
 You will be given:
 - A `chain_id` (e.g., `1` for Ethereum, `56` for BNB Chain)
-- A `contract_address` of a token on that chain.
+- One or more `contract_address` values of tokens on that chain.
 If you are not provided these, you must ask the user to supply them before calling the API.
 
 ## Instructions
-1. Use `http_request.get` to call the API with the provided `chain_id` and `contract_address`.
-2. Parse the JSON response.
+1. Call `goplus_token_security` once per chain with the provided `chain_id` and all of its contract addresses.
+2. Read the returned summary, it is already extracted from the raw API response.
 3. Summarize key security-related fields including (but not limited to):
    - `is_honeypot`
    - `buy_tax`, `sell_tax`
@@ -101,18 +115,61 @@ os.environ["AWS_REGION"] = REGION
 
 # NOTE define all of these outside the invoke function to avoid re-initialization on each call
 
-# Create a BedrockModel with specific LLM and region
-bedrock_model = BedrockModel(model_id=INFERENCE_MODEL, region_name=REGION)
+# Get the BedrockModel for the LLM and region, shared with the other agents (one boto3 client and connection pool)
+bedrock_model = get_bedrock_model(INFERENCE_MODEL, REGION)
 
-# Create the strands agent and add the KB to the agent's tools
-kb_agent = Agent(
-   name="CryptoRiskDetectionAgent",
-   system_prompt=CRYPTO_SYSTEM_PROMPT,
-   model=bedrock_model,
-   tools=[http_request],
+# One client for all agents, its connection pool and token cache are shared by every request
+goplus_client = GoPlusClient(
+   GOPLUS_API_URL,
+   cache_ttl=GOPLUS_CACHE_TTL,
+   max_batch=GOPLUS_MAX_BATCH,
+   pool_size=GOPLUS_POOL_SIZE,
+   timeout=GOPLUS_TIMEOUT,
 )
 
 @tool
+def goplus_token_security(chain_id: str, contract_addresses: list[str]) -> str:
+   """
+   Look up GoPlus Labs token security data for one or more token contracts on one chain.
+
+   Args:
+      chain_id: Chain id, eg "1" for Ethereum or "56" for BNB Chain.
+      contract_addresses: Token contract addresses on that chain, all are checked in a single request.
+
+   Returns:
+      JSON with a security summary (flags, taxes, owner, holder count and red flags) per address
+   """
+   try:
+      summaries = goplus_client.token_security(chain_id, contract_addresses)
+   except (GoPlusError, requests.RequestException) as e:
+      return json.dumps({"error": str(e)})
+   return json.dumps(summaries, separators=(",", ":"))
+
+# Pool of strands agents (sharing the model and tools above), one is leased per request
+# NOTE a single module level agent would be shared by every session, mixing their histories and serializing requests
+def create_kb_agent():
+   return Agent(
+      name="CryptoRiskDetectionAgent",
+      system_prompt=CRYPTO_SYSTEM_PROMPT,
+      model=bedrock_model,
+      tools=[goplus_token_security],
+      callback_handler=stream_callback_handler("crypto_security_analyzer"),
+   )
+
+kb_agent_pool = AgentPool(create_kb_agent, size=SUB_AGENT_POOL_SIZE, lease_timeout=SUB_AGENT_POOL_LEASE_TIMEOUT)
+
+def warm_up():
+   """Build the first pooled agent, called by the orchestrator's background warm-up"""
+   kb_agent_pool.warm(1)
+
+def shutdown():
+   """Clean up the pooled agents and close the GoPlus connections, called by the orchestrator's shutdown"""
+   kb_agent_pool.close()
+   goplus_client.close()
+
+@tool
+@measured
+@response_cache.cached
 def crypto_security_analyzer(query: str) -> str:
    """
    Process and respond to security risks of cryptocurrency token queries.
@@ -124,6 +181,9 @@ def crypto_security_analyzer(query: str) -> str:
       A detailed and helpful token risk analysis with citations
    """
 
-   # Query the agent
-   response = kb_agent(query)
+   # Query an agent leased from the pool, its history is cleared when it is returned
+   with kb_agent_pool.lease() as kb_agent:
+      response = kb_agent(query)
+   # goplus_token_security is an HTTP call to the GoPlus API
+   record_agent_result(response, io="http")
    return str(response)
@@ -17,8 +17,12 @@ LINKS:
 # This example queries the goplus api
 
 from strands import Agent, tool
-from strands.models import BedrockModel
-from config import INFERENCE_MODEL, REGION
+from model_registry import get_bedrock_model
+from config import INFERENCE_MODEL, REGION, SUB_AGENT_POOL_SIZE, SUB_AGENT_POOL_LEASE_TIMEOUT
+from agent_pool import AgentPool
+from streaming import stream_callback_handler
+from response_cache import response_cache
+from tool_metrics import measured, record_agent_result
 import os
 
 # ===== CONFIGURATION =====
@@ -75,18 +79,33 @@ You are **not a specialist or expert** in any specific field, but you are capabl
 
 # NOTE define all of these outside the invoke function to avoid re-initialization on each call
 
-# Create a BedrockModel with specific LLM and region
-bedrock_model = BedrockModel(model_id=INFERENCE_MODEL, region_name=REGION)
+# Get the BedrockModel for the LLM and region, shared with the other agents (one boto3 client and connection pool)
+bedrock_model = get_bedrock_model(INFERENCE_MODEL, REGION)
 
-# Create the strands agent and add the KB to the agent's tools
-kb_agent = Agent(
-   name="GeneralKnowledgeAgent",
-   system_prompt=GENERAL_SYSTEM_PROMPT,
-   model=bedrock_model,
-   tools=[],
-)
+# Pool of strands agents (sharing the model and tools above), one is leased per request
+# NOTE a single module level agent would be shared by every session, mixing their histories and serializing requests
+def create_kb_agent():
+   return Agent(
+      name="GeneralKnowledgeAgent",
+      system_prompt=GENERAL_SYSTEM_PROMPT,
+      model=bedrock_model,
+      tools=[],
+      callback_handler=stream_callback_handler("general_knowledge"),
+   )
+
+kb_agent_pool = AgentPool(create_kb_agent, size=SUB_AGENT_POOL_SIZE, lease_timeout=SUB_AGENT_POOL_LEASE_TIMEOUT)
+
+def warm_up():
+   """Build the first pooled agent, called by the orchestrator's background warm-up"""
+   kb_agent_pool.warm(1)
+
+def shutdown():
+   """Clean up the pooled agents, called by the orchestrator's shutdown"""
+   kb_agent_pool.close()
 
 @tool
+@measured
+@response_cache.cached
 def general_knowledge(query: str) -> str:
    """
    Handle general knowledge queries that fall outside specialized domains.
@@ -99,6 +118,8 @@ def general_knowledge(query: str) -> str:
       A concise response to the general knowledge query
    """
 
-   # Query the agent
-   response = kb_agent(query)
+   # Query an agent leased from the pool, its history is cleared when it is returned
+   with kb_agent_pool.lease() as kb_agent:
+      response = kb_agent(query)
+   record_agent_result(response)
    return str(response)
\ No newline at end of file
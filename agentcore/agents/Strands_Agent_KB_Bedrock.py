@@ -11,7 +11,9 @@ SETUP INSTRUCTIONS:
    - Enable model access in Amazon Bedrock console
 
 3. KNOWLEDGE BASE:
-   - Requires pre-configured KB ID (set below)
+   - Bedrock (default): requires pre-configured KB ID (set in config.py)
+   - Local: set KB_RETRIEVAL_BACKEND=local, searches an in-process index of resources/kb-datasource, build it before
+     deploying with `python kb_ingestion.py` (without it the Bedrock Knowledge Base is queried)
 
 LINKS:
 - Credentials Guide: https://strandsagents.com/latest/user-guide/quickstart/#configuring-credentials
@@ -22,11 +24,28 @@ LINKS:
 # You will need to know its ID
 
 from strands import Agent, tool
-from strands.models import BedrockModel
+from model_registry import get_bedrock_model
 from strands_tools import retrieve
-from config import INFERENCE_MODEL, REGION, KB_ID
+from config import (
+   INFERENCE_MODEL, REGION, KB_ID, SUB_AGENT_POOL_SIZE, SUB_AGENT_POOL_LEASE_TIMEOUT,
+   KB_RETRIEVAL_BACKEND, KB_LOCAL_INDEX_DIR, KB_LOCAL_EMBEDDER, KB_LOCAL_TOP_K, KB_LOCAL_MIN_SCORE,
+   KB_REMOTE_FALLBACK, KB_METADATA_FILTERS, KB_HYBRID_SEARCH, KB_RERANK, KB_CONTEXT_TOKEN_BUDGET,
+   KB_QUERY_EMBEDDING_CACHE_SIZE, KB_QUERY_EMBEDDING_CACHE_PATH, KB_S3_VECTOR_BUCKET, KB_S3_VECTOR_INDEX,
+   KB_S3_VECTORS_DIM, KB_QUANTIZED_CANDIDATES, KB_HNSW_EF_SEARCH,
+)
+from agent_pool import AgentPool
+from embedding_cache import CachedEmbedder
+from embeddings import BedrockEmbedder
+from local_kb import LocalKnowledgeBase, create_embedder, retrieve_tool
+from s3_vectors_kb import S3VectorsKnowledgeBase
+from streaming import stream_callback_handler
+from response_cache import response_cache
+from tool_metrics import measured, record_agent_result
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 # ===== CONFIGURATION =====
 # Set environment variables
 os.environ["AWS_REGION"] = REGION
@@ -48,6 +67,7 @@ You are trained on a verified knowledge base which you access via the `retrieve`
 - How to buy, store, and trade crypto safely
 - Risks (scams, volatility, security)
 - Investment strategies (DCA, research tips)
+If the student has told you they are a beginner (or more advanced), pass that as the `level` of `retrieve`.
 
 ## Instructions
 ### Tone
@@ -85,18 +105,96 @@ You: *"Bitcoin is digital money that isn`t controlled by banks—it`s like cash
 
 # NOTE define all of these outside the invoke function to avoid re-initialization on each call
 
-# Create a BedrockModel with specific LLM and region
-bedrock_model = BedrockModel(model_id=INFERENCE_MODEL, region_name=REGION)
+# Get the BedrockModel for the LLM and region, shared with the other agents (one boto3 client and connection pool)
+bedrock_model = get_bedrock_model(INFERENCE_MODEL, REGION)
 
-# Create the strands agent and add the KB to the agent's tools
-kb_agent = Agent(
-   name="CryptoFocusedAgent",
-   system_prompt=CRYPTO_SYSTEM_PROMPT,
-   model=bedrock_model,
-   tools=[retrieve],
-)
+def remote_retrieve(text, number_of_results, filters=None):
+   """Query the Bedrock Knowledge Base through strands' retrieve tool, the local knowledge base's fallback
+
+   Args:
+      text: The query
+      number_of_results: Most results returned
+      filters: Optional metadata filters of the local search (field -> values), pushed down to the knowledge base
+   """
+   tool_input = {"text": text, "numberOfResults": number_of_results}
+   # the metadata attributes are comma separated lists, so a value matches when the attribute contains it
+   conditions = [
+      {"orAll": [{"stringContains": {"key": field, "value": value}} for value in values]} if len(values) > 1
+      else {"stringContains": {"key": field, "value": values[0]}}
+      for field, values in (filters or {}).items()
+   ]
+   if conditions:
+      tool_input["retrieveFilter"] = conditions[0] if len(conditions) == 1 else {"andAll": conditions}
+   result = retrieve.retrieve({"toolUseId": "local-kb-fallback", "input": tool_input})
+   return "\n".join(content["text"] for content in result["content"] if "text" in content)
+
+def cached_query_embedder(embedder):
+   """The embedder with a cache of its query vectors, shared by the pooled agents (and processes, on disk)"""
+   return CachedEmbedder(embedder, KB_QUERY_EMBEDDING_CACHE_SIZE, KB_QUERY_EMBEDDING_CACHE_PATH or None)
+
+def create_retrieve_tool():
+   """The agent's retrieve tool, searching the local index, the S3 Vectors index or the Bedrock Knowledge Base
+
+   Returns:
+      The tool, and True when it searches locally
+   """
+   if KB_RETRIEVAL_BACKEND == "s3vectors":
+      # the query is embedded here rather than by the knowledge base, so repeated questions skip the model call
+      embedder = cached_query_embedder(BedrockEmbedder(region=REGION, dim=KB_S3_VECTORS_DIM))
+      knowledge_base = S3VectorsKnowledgeBase(KB_S3_VECTOR_BUCKET, KB_S3_VECTOR_INDEX, embedder, region=REGION)
+      remote_tool = retrieve_tool(
+         knowledge_base, KB_LOCAL_TOP_K, KB_LOCAL_MIN_SCORE, metadata_filters=False, hybrid=False,
+         token_budget=KB_CONTEXT_TOKEN_BUDGET,
+      )
+      return remote_tool, False
+   if KB_RETRIEVAL_BACKEND == "local":
+      try:
+         # NOTE the index is built by kb_ingestion.py, importing the agent never writes it
+         embedder = create_embedder(KB_LOCAL_EMBEDDER, REGION)
+         # a hashing embedding costs about as much as a cache lookup, Bedrock's a network call
+         knowledge_base = LocalKnowledgeBase.open(
+            KB_LOCAL_INDEX_DIR, cached_query_embedder(embedder) if KB_LOCAL_EMBEDDER == "bedrock" else embedder,
+            KB_QUANTIZED_CANDIDATES, KB_HNSW_EF_SEARCH,
+         )
+         fallback = remote_retrieve if KB_REMOTE_FALLBACK else None
+         local_tool = retrieve_tool(
+            knowledge_base, KB_LOCAL_TOP_K, KB_LOCAL_MIN_SCORE, fallback, KB_METADATA_FILTERS,
+            hybrid=KB_HYBRID_SEARCH, rerank_hits=KB_RERANK, token_budget=KB_CONTEXT_TOKEN_BUDGET,
+         )
+         return local_tool, True
+      except (FileNotFoundError, ValueError):
+         # eg a container deployed without the index
+         logger.warning("local knowledge base %s unavailable, using the Bedrock Knowledge Base", KB_LOCAL_INDEX_DIR,
+                        exc_info=True)
+   return retrieve, False
+
+# NOTE the index is memory-mapped once per process, the pooled agents share the tool
+kb_retrieve_tool, kb_is_local = create_retrieve_tool()
+
+# Pool of strands agents (sharing the model and tools above), one is leased per request
+# NOTE a single module level agent would be shared by every session, mixing their histories and serializing requests
+def create_kb_agent():
+   return Agent(
+      name="CryptoFocusedAgent",
+      system_prompt=CRYPTO_SYSTEM_PROMPT,
+      model=bedrock_model,
+      tools=[kb_retrieve_tool],
+      callback_handler=stream_callback_handler("crypto_educator"),
+   )
+
+kb_agent_pool = AgentPool(create_kb_agent, size=SUB_AGENT_POOL_SIZE, lease_timeout=SUB_AGENT_POOL_LEASE_TIMEOUT)
+
+def warm_up():
+   """Build the first pooled agent, called by the orchestrator's background warm-up"""
+   kb_agent_pool.warm(1)
+
+def shutdown():
+   """Clean up the pooled agents, called by the orchestrator's shutdown"""
+   kb_agent_pool.close()
 
 @tool
+@measured
+@response_cache.cached
 def crypto_educator(query: str) -> str:
    """
    Process and respond to cryptocurrency research-related queries.
@@ -108,6 +206,9 @@ def crypto_educator(query: str) -> str:
       A detailed and helpful educational answer with citations
    """
 
-   # Query the agent
-   response = kb_agent(query)
+   # Query an agent leased from the pool, its history is cleared when it is returned
+   with kb_agent_pool.lease() as kb_agent:
+      response = kb_agent(query)
+   # the remote retrieve queries the Bedrock knowledge base over HTTP, the local one searches in-process
+   record_agent_result(response, io=None if kb_is_local else "http")
    return str(response)
\ No newline at end of file
@@ -18,10 +18,24 @@ LINKS:
 # This example queries the Coin Gecko MCP asking for a live token price
 
 from strands import Agent, tool
-from strands.models import BedrockModel
+from model_registry import get_bedrock_model
 from strands.tools.mcp import MCPClient
 from mcp import stdio_client, StdioServerParameters
-from config import INFERENCE_MODEL, REGION
+from mcp_session_pool import MCPSessionPool
+from mcp_tool_catalog import MCPToolCatalog
+from streaming import stream_callback_handler
+from response_cache import response_cache
+from tool_metrics import measured, record_agent_result
+from config import (
+    INFERENCE_MODEL,
+    REGION,
+    MCP_POOL_SIZE,
+    MCP_POOL_IDLE_TIMEOUT,
+    MCP_POOL_HEALTH_CHECK_INTERVAL,
+    MCP_POOL_LEASE_TIMEOUT,
+    MCP_TOOL_CATALOG_TTL,
+    MCP_TOOL_CATALOG_DIR,
+)
 import os
 
 # ===== CONFIGURATION =====
@@ -87,22 +101,55 @@ If no results are returned or the coin/NFT is not found:
 
 # NOTE define all of these outside the invoke function to avoid re-initialization on each call
 
-# Create a BedrockModel with specific LLM and region
-bedrock_model = BedrockModel(model_id=INFERENCE_MODEL, region_name=REGION)
-# Connect to the CoinGecko MCP server - able to return live prices of tokens - coingecko_api_remote
-coingecko_mcp_client = MCPClient(
-    lambda: stdio_client(
-        StdioServerParameters(
-            command="npx",  # Matches the "command" in your config
-            args=[
-                "mcp-remote",
-                "https://mcp.api.coingecko.com/sse",  # Matches your endpoint
-            ],
+# Get the BedrockModel for the LLM and region, shared with the other agents (one boto3 client and connection pool)
+bedrock_model = get_bedrock_model(INFERENCE_MODEL, REGION)
+# CoinGecko MCP server endpoint - able to return live prices of tokens - coingecko_api_remote
+COINGECKO_MCP_URL = "https://mcp.api.coingecko.com/sse"
+
+def create_coingecko_mcp_client():
+    """Create a new (not yet started) client for the CoinGecko MCP server"""
+    return MCPClient(
+        lambda: stdio_client(
+            StdioServerParameters(
+                command="npx",  # Matches the "command" in your config
+                args=[
+                    "mcp-remote",
+                    COINGECKO_MCP_URL,  # Matches your endpoint
+                ],
+            )
         )
     )
+
+# Cache of the CoinGecko tool schemas, they rarely change so there is no need to list them on every connect
+coingecko_tool_catalog = MCPToolCatalog(
+    COINGECKO_MCP_URL,
+    ttl=MCP_TOOL_CATALOG_TTL,
+    snapshot_dir=MCP_TOOL_CATALOG_DIR,
+)
+
+# Pool of long-lived CoinGecko MCP sessions
+# NOTE the pool is started by the orchestration agent's background warm-up (see warm_up below), or on first use
+# starting a session spawns the npx process and does the MCP handshake, so we only want to pay that once
+coingecko_mcp_pool = MCPSessionPool(
+    create_coingecko_mcp_client,
+    size=MCP_POOL_SIZE,
+    idle_timeout=MCP_POOL_IDLE_TIMEOUT,
+    health_check_interval=MCP_POOL_HEALTH_CHECK_INTERVAL,
+    lease_timeout=MCP_POOL_LEASE_TIMEOUT,
+    catalog=coingecko_tool_catalog,
 )
 
+def warm_up():
+    """Open the MCP sessions, called by the orchestrator's background warm-up"""
+    coingecko_mcp_pool.start()
+
+def shutdown():
+    """Close the MCP sessions and stop their server processes, called by the orchestrator's shutdown"""
+    coingecko_mcp_pool.stop()
+
 @tool
+@measured
+@response_cache.cached
 def crypto_market_analyst(query: str) -> str:
     """
     Process and respond to real-time crypto market data queries.
@@ -115,18 +162,17 @@ def crypto_market_analyst(query: str) -> str:
     """
 
     # Query the agent
-    # Must use the MCP client in a context manager
+    # Lease an already connected MCP session from the pool, its tools come from the cached tool catalog
     # https://strandsagents.com/latest/documentation/docs/user-guide/concepts/tools/mcp-tools/
-    with coingecko_mcp_client:
-        # Get the tools from the MCP server
-        coingecko_tools = coingecko_mcp_client.list_tools_sync()
-
+    with coingecko_mcp_pool.lease() as session:
         # Create the strands agent and add to the agent's tools
         crypto_agent = Agent(
             name="CryptoMarketAnalystAgent",
             system_prompt=CRYPTO_SYSTEM_PROMPT,
             model=bedrock_model,
-            tools=coingecko_tools,
+            tools=session.tools,
+            callback_handler=stream_callback_handler("crypto_market_analyst"),
         )
         response = crypto_agent(query)
+        record_agent_result(response, io="mcp")
         return str(response)
\ No newline at end of file
@@ -18,15 +18,66 @@ LINKS:
 - Orchestration Agent: https://strandsagents.com/latest/documentation/docs/user-guide/concepts/multi-agent/agents-as-tools/
 """
 
+import time
+# NOTE timed from here, the startup report shows how long the imports below take
+IMPORT_START = time.perf_counter()
 import argparse
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import wait
+from opentelemetry import trace
 from strands import Agent
+from strands.telemetry import StrandsTelemetry
 from bedrock_agentcore import BedrockAgentCoreApp
-from strands.models import BedrockModel
-from Strands_Agent_KB_Bedrock import crypto_educator
-from Strands_Agent_MCP_CoinGecko import crypto_market_analyst
-from Strands_Agent_API import crypto_security_analyzer
-from Strands_Agent_General import general_knowledge
-from config import INFERENCE_MODEL, REGION
+from model_registry import get_bedrock_model
+from intent_router import IntentRouter
+from lazy_agents import LazyAgentTool, start_warm_up, startup_report
+from streaming import stream_events, current_sink
+from response_cache import track as track_cache_lookups, summarize as summarize_cache_lookups
+from tool_metrics import track as track_tool_calls
+from conversation_memory import BoundedConversationManager, model_summarizer, shutdown as shutdown_summaries
+from sessions import SessionRegistry
+from branch_pool import BranchPool
+from session_store import DynamoDBSessionStore, PersistedSession, SQLiteSessionStore
+from config import (
+    INFERENCE_MODEL,
+    REGION,
+    ROUTER_ENABLED,
+    ROUTER_CONFIDENCE_THRESHOLD,
+    FAN_OUT_ENABLED,
+    FAN_OUT_BRANCH_TIMEOUT,
+    FAN_OUT_MAX_WORKERS,
+    ORCHESTRATOR_MAX_SESSIONS,
+    ORCHESTRATOR_SESSION_IDLE_TIMEOUT,
+    CONVERSATION_MAX_TURNS,
+    CONVERSATION_MAX_TOKENS,
+    CONVERSATION_SUMMARIZE,
+    CONVERSATION_SUMMARY_MAX_WORDS,
+    SESSION_STORE_BACKEND,
+    SESSION_STORE_SQLITE_PATH,
+    SESSION_STORE_DYNAMODB_TABLE,
+    SESSION_STORE_SNAPSHOT_EVERY,
+    SESSION_STORE_TTL,
+    LAZY_SUB_AGENTS,
+    SUB_AGENT_WARMUP,
+    OTEL_CONSOLE_EXPORTER,
+    OTEL_OTLP_EXPORTER,
+)
+
+startup_report.record("import orchestrator dependencies", time.perf_counter() - IMPORT_START)
+
+# NOTE on AgentCore the runtime's OpenTelemetry instrumentation exports the spans, these are for running locally
+if OTEL_CONSOLE_EXPORTER or OTEL_OTLP_EXPORTER:
+    strands_telemetry = StrandsTelemetry()
+    if OTEL_CONSOLE_EXPORTER:
+        strands_telemetry.setup_console_exporter()
+    if OTEL_OTLP_EXPORTER:
+        strands_telemetry.setup_otlp_exporter()
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
 
 # Define a crypto-focused system prompt
 CRYPTO_SYSTEM_PROMPT = """
@@ -121,65 +172,379 @@ You are a high-level orchestration agent responsible for understanding user prom
 - Always confirm your understanding before routing to ensure accurate assistance.
 """
 
+# heading of each sub-agent's part of a fanned out answer
+TOOL_TITLES = {
+    "crypto_educator": "Crypto education",
+    "crypto_market_analyst": "Market data",
+    "crypto_security_analyzer": "Token security",
+    "general_knowledge": "General",
+}
+
 class CryptoOrchestrator:
-    def __init__(self):
-        self.orchestrator_agent = self._initialize_agent()
+    def __init__(self, tools, router=None, fan_out=False, branch_timeout=60, max_workers=16, fan_out_pool=None,
+                 conversation_manager=None, persistence=None):
+        """
+        Args:
+            tools: The sub-agent tools, eg LazyAgentTools that import their module on first use
+            router: Optional pre-router with a route(prompt) method returning a RouteDecision,
+                    confident decisions call the sub-agent tool directly instead of the LLM orchestrator
+            fan_out: Run the parts of multi-intent prompts (found by the router's split_intents) concurrently
+            branch_timeout: Seconds each fanned out part may take
+            max_workers: Threads running fanned out parts, when no fan_out_pool is given
+            fan_out_pool: Optional BranchPool running fanned out parts, eg one shared by every session's orchestrator
+            conversation_manager: Optional strands ConversationManager bounding the history, eg a
+                                  BoundedConversationManager, the strands default otherwise
+            persistence: Optional PersistedSession, the history is restored from it and every turn saved to it
+        """
+        self.tools = {t.tool_name: t for t in tools}
+        self.router = router
+        self.fan_out = fan_out and router is not None
+        self.branch_timeout = branch_timeout
+        if self.fan_out and fan_out_pool is None:
+            fan_out_pool = BranchPool(max_workers)
+        self._fan_out_pool = fan_out_pool
+        self.orchestrator_agent = self._initialize_agent(conversation_manager)
+        self.persistence = persistence
+        if persistence is not None:
+            self._restore()
 
-    def _initialize_agent(self):
+    def _initialize_agent(self, conversation_manager=None):
         """Initialize the Bedrock model and crypto agent"""
-        bedrock_model = BedrockModel(model_id=INFERENCE_MODEL, region_name=REGION)
+        # shared with the sub-agents, see model_registry
+        bedrock_model = get_bedrock_model(INFERENCE_MODEL, REGION)
 
         # NOTE conversational context is preserved within the Agent object itself, as long as it is running
+        # the conversation manager bounds it, so the tokens sent per turn do not grow with the session
         # if your agent cannot be kept running (eg hosted in a Lambda) use session management
         # https://strandsagents.com/latest/documentation/docs/user-guide/concepts/agents/session-management/
         return Agent(
             name="CryptoOrchestrator",
             system_prompt=CRYPTO_SYSTEM_PROMPT,
             model=bedrock_model,
-            tools=[
-                crypto_educator,
-                crypto_market_analyst,
-                crypto_security_analyzer,
-                general_knowledge,
-            ],
+            tools=list(self.tools.values()),
+            **({"conversation_manager": conversation_manager} if conversation_manager is not None else {}),
         )
 
     def query(self, question):
         """Query the agent and return formatted response"""
+        # collect the sub-agent response cache hits and misses and the sub-agent tool calls of this request
+        with (
+            tracer.start_as_current_span("crypto_orchestrator query") as span,
+            track_cache_lookups() as cache_lookups,
+            track_tool_calls() as tool_calls,
+        ):
+            result = self._query(question)
+            metrics = result["metrics"]
+            metrics["response_cache"] = summarize_cache_lookups(cache_lookups)
+            metrics["tools"] = self._tool_breakdown(tool_calls, cache_lookups)
+            span.set_attributes({
+                "orchestrator.path": metrics.get("routing", {}).get("path", "llm"),
+                "orchestrator.total_tokens": metrics["total_tokens"],
+                "orchestrator.model_time": metrics["model_time"],
+                "orchestrator.sub_agent_tokens": sum(t["total_tokens"] for t in metrics["tools"].values()),
+                "orchestrator.cache_hits": metrics["response_cache"]["hits"],
+            })
+        if self.persistence is not None:
+            metrics["session_store"] = self._save_turn()
+        return result
+
+    def _restore(self):
+        """Restore the session's saved history, on a failure it is logged and the session is not saved"""
+        try:
+            self.persistence.restore(self.orchestrator_agent)
+        except Exception:
+            logger.exception("failed to restore session %s, it is not saved", self.persistence.session_id)
+            # saving on top of a history this agent does not have would corrupt it
+            self.orchestrator_agent.messages = []
+            self.persistence = None
+
+    def _save_turn(self):
+        """Save the turn just answered to the session store, a failure is logged and the answer still returned"""
+        start = time.perf_counter()
+        try:
+            write = self.persistence.save_turn(self.orchestrator_agent)
+        except Exception:
+            logger.exception("failed to save the turn of session %s", self.persistence.session_id)
+            write = "failed"
+        return {"write": write, "seconds": round(time.perf_counter() - start, 4)}
+
+    @staticmethod
+    def _tool_breakdown(tool_calls, cache_lookups):
+        """Per sub-agent tool calls, times, tokens and cache hits of a request"""
+        tools = tool_calls.report()
+        for stats in tools.values():
+            stats.update(cache_hits=0, cache_misses=0)
+        for lookup in cache_lookups:
+            if lookup.tool in tools and lookup.result != "bypass":
+                tools[lookup.tool]["cache_misses" if lookup.result == "miss" else "cache_hits"] += 1
+        return tools
+
+    def _query(self, question):
+        # the sub-agents do not see the conversation, follow ups that refer to it go to the orchestrator's model
+        has_history = bool(self.orchestrator_agent.messages)
+        parts = self.router.split_intents(question, has_history) if self.fan_out else None
+        if parts:
+            result = self._query_fan_out(question, parts)
+            if result is not None:
+                return result
+
+        # a multi-intent prompt that was not fanned out goes to the LLM orchestrator, a single sub-agent would only
+        # answer part of it
+        route = self.router.route(question, has_history) if self.router and not parts else None
+        if route is not None and route.confident:
+            return self._query_direct(question, route)
+
+        # NOTE the orchestrator agent's metrics accumulate over every query it has answered, report the difference
+        metrics = self.orchestrator_agent.event_loop_metrics
+        usage_before = dict(metrics.accumulated_usage)
+        latency_before = metrics.accumulated_metrics["latencyMs"]
+        calls_before = {name: m.call_count for name, m in metrics.tool_metrics.items()}
+        start = time.perf_counter()
         response = self.orchestrator_agent(question)
+        execution_time = time.perf_counter() - start
+        usage = {k: v - usage_before.get(k, 0) for k, v in response.metrics.accumulated_usage.items()}
 
         # Format the output
         result = {
             "answer": str(response),
             "metrics": {
-                "total_tokens": response.metrics.accumulated_usage["totalTokens"],
-                "input_tokens": response.metrics.accumulated_usage["inputTokens"],
-                "output_tokens": response.metrics.accumulated_usage["outputTokens"],
-                "execution_time": f"{sum(response.metrics.cycle_durations):.2f}s",
-                "tools_used": list(response.metrics.tool_metrics.keys()),
+                "total_tokens": usage["totalTokens"],
+                "input_tokens": usage["inputTokens"],
+                "output_tokens": usage["outputTokens"],
+                "execution_time": f"{execution_time:.2f}s",
+                # time of the orchestrator's own model calls, the sub-agents' is in "tools"
+                "model_time": round((response.metrics.accumulated_metrics["latencyMs"] - latency_before) / 1000, 3),
+                "tools_used": [
+                    name for name, m in response.metrics.tool_metrics.items() if m.call_count > calls_before.get(name, 0)
+                ],
             },
         }
+        if route is not None:
+            result["metrics"]["routing"] = {**route._asdict(), "path": "llm"}
         return result
 
+    def _query_direct(self, question, route):
+        """Fast path, forward the prompt straight to the sub-agent tool the pre-router picked"""
+        start = time.perf_counter()
+        answer = self.tools[route.tool](question)
+        execution_time = time.perf_counter() - start
+
+        # keep the turn in the orchestrator's history so follow up prompts routed by the LLM have the context
+        self._remember(question, answer)
+        return {
+            "answer": answer,
+            "metrics": {
+                # no orchestrator model call was made
+                "total_tokens": 0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "execution_time": f"{execution_time:.2f}s",
+                "model_time": 0.0,
+                "tools_used": [route.tool],
+                "routing": {**route._asdict(), "path": "fast"},
+            },
+        }
+
+    def _query_fan_out(self, question, parts):
+        """Multi-intent path, each part runs on its sub-agent tool concurrently, so it takes as long as the slowest
+
+        Returns:
+            The result, or None when the pool has no threads free for every part (the prompt is then answered the
+            usual way rather than queued behind other requests' parts)
+        """
+        start = time.perf_counter()
+        abandoned = threading.Event()
+        # each part runs in a copy of this request's context, so its cache lookups are still counted
+        calls = [
+            functools.partial(contextvars.copy_context().run, self._run_part, question, part, abandoned)
+            for part in parts
+        ]
+        submitted = self._fan_out_pool.try_submit(calls)
+        if submitted is None:
+            logger.warning("fan-out pool busy (%s), not fanning out", self._fan_out_pool.stats())
+            return None
+        futures = dict(zip(submitted, parts))
+        done, not_done = wait(futures, timeout=self.branch_timeout)
+        if not_done:
+            # NOTE the threads cannot be stopped, the parts finish in the background (still holding their thread in
+            # the pool) and neither stream nor return their answers
+            abandoned.set()
+            self._fan_out_pool.abandon(not_done)
+
+        sections = []
+        branches = []
+        for future, part in futures.items():
+            if future not in done:
+                status, answer, seconds = "timeout", "Sorry, this part took too long, please ask it again on its own.", None
+            elif future.exception() is not None:
+                status, answer, seconds = "error", f"Sorry, this part failed: {future.exception()}", None
+            else:
+                status, (answer, seconds) = "ok", future.result()
+            sections.append(f"**{TOOL_TITLES.get(part.tool, part.tool)}**\n\n{answer}")
+            branches.append({**part._asdict(), "status": status, "execution_time": seconds})
+        answer = "\n\n".join(sections)
+        execution_time = time.perf_counter() - start
+
+        self._remember(question, answer)
+        return {
+            "answer": answer,
+            "metrics": {
+                # no orchestrator model call was made
+                "total_tokens": 0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "execution_time": f"{execution_time:.2f}s",
+                "model_time": 0.0,
+                "tools_used": [part.tool for part in parts],
+                "routing": {"path": "fan_out", "branches": branches},
+            },
+        }
+
+    def _remember(self, question, answer):
+        """Add a turn answered without the orchestrator's model to its history, within the conversation bounds"""
+        self.orchestrator_agent.messages.extend([
+            {"role": "user", "content": [{"text": question}]},
+            {"role": "assistant", "content": [{"text": answer}]},
+        ])
+        # the agent applies its conversation manager after its own invocations only
+        self.orchestrator_agent.conversation_manager.apply_management(self.orchestrator_agent)
+
+    def _run_part(self, question, part, abandoned):
+        """Answer one part of a multi-intent prompt, returns (answer, seconds)
+
+        Args:
+            question: The whole prompt
+            part: The IntentPart to answer
+            abandoned: Event set once the request stopped waiting, the answer is then not streamed
+        """
+        start = time.perf_counter()
+        # tokens of parts running side by side would interleave, so each part is streamed whole once it is done
+        sink = current_sink.get()
+        current_sink.set(None)
+        # the sub-agent sees the whole prompt, so a part like "is it a honeypot?" keeps its context
+        answer = self.tools[part.tool](f'{question}\n\nOnly answer this part of the question: "{part.text}"')
+        if sink is not None and not abandoned.is_set():
+            sink({"type": "token", "tool": part.tool, "data": f"**{TOOL_TITLES.get(part.tool, part.tool)}**\n\n{answer}\n\n"})
+        return answer, round(time.perf_counter() - start, 3)
+
 # NOTE define all of these outside the invoke function to avoid re-initialization on each call
 
 # Initialize Bedrock AgentCore App
 app = BedrockAgentCoreApp()
 
-# Initialize the Crypto Orchestrator
-orchestrator = CryptoOrchestrator()
+# Sub-agent tools, each module (and the model, pools and MCP client it builds) is imported on first use
+# NOTE so the runtime can accept traffic without waiting for all four, see the warm-up in __main__
+with startup_report.phase("read sub-agent tool specs"):
+    SUB_AGENT_TOOLS = [
+        LazyAgentTool("crypto_educator", "Strands_Agent_KB_Bedrock"),
+        LazyAgentTool("crypto_market_analyst", "Strands_Agent_MCP_CoinGecko"),
+        LazyAgentTool("crypto_security_analyzer", "Strands_Agent_API"),
+        LazyAgentTool("general_knowledge", "Strands_Agent_General"),
+    ]
+if not LAZY_SUB_AGENTS:
+    for sub_agent_tool in SUB_AGENT_TOOLS:
+        sub_agent_tool.load()
+
+# Initialize the pre-router, its classifier is trained on the routing examples in the system prompt above
+with startup_report.phase("build intent router"):
+    router = IntentRouter.from_system_prompt(CRYPTO_SYSTEM_PROMPT, threshold=ROUTER_CONFIDENCE_THRESHOLD) if ROUTER_ENABLED else None
+
+# Threads running the parts of fanned out prompts, shared by every session's orchestrator
+fan_out_pool = BranchPool(FAN_OUT_MAX_WORKERS) if FAN_OUT_ENABLED else None
+conversation_summarizer = (
+    model_summarizer(get_bedrock_model(INFERENCE_MODEL, REGION), max_words=CONVERSATION_SUMMARY_MAX_WORDS)
+    if CONVERSATION_SUMMARIZE else None
+)
+
+def create_session_store():
+    """Store of the session histories, None when they are not saved or the store cannot be opened"""
+    try:
+        if SESSION_STORE_BACKEND == "sqlite":
+            return SQLiteSessionStore(SESSION_STORE_SQLITE_PATH, ttl=SESSION_STORE_TTL)
+        if SESSION_STORE_BACKEND == "dynamodb":
+            return DynamoDBSessionStore(SESSION_STORE_DYNAMODB_TABLE, REGION, ttl=SESSION_STORE_TTL)
+    except Exception:
+        # eg a read-only working directory, the runtime still starts
+        logger.exception("failed to open the %s session store, sessions are not saved", SESSION_STORE_BACKEND)
+    return None
+
+# A session whose container was recycled resumes from the store with one read
+session_store = create_session_store()
+
+def new_orchestrator(session_id):
+    """Crypto Orchestrator of a session, with its own bounded conversation history, restored from the store"""
+    persistence = None
+    if session_store is not None:
+        persistence = PersistedSession(session_store, session_id, snapshot_every=SESSION_STORE_SNAPSHOT_EVERY)
+    return CryptoOrchestrator(
+        SUB_AGENT_TOOLS,
+        router=router,
+        fan_out=FAN_OUT_ENABLED,
+        branch_timeout=FAN_OUT_BRANCH_TIMEOUT,
+        fan_out_pool=fan_out_pool,
+        conversation_manager=BoundedConversationManager(
+            max_turns=CONVERSATION_MAX_TURNS,
+            max_tokens=CONVERSATION_MAX_TOKENS,
+            summarizer=conversation_summarizer,
+        ),
+        persistence=persistence,
+    )
+
+# One Crypto Orchestrator per AgentCore runtime session, built on the session's first request
+# NOTE a single module level orchestrator would mix the conversations of every session into one history
+with startup_report.phase("build session registry"):
+    orchestrator_sessions = SessionRegistry(
+        new_orchestrator,
+        max_sessions=ORCHESTRATOR_MAX_SESSIONS,
+        idle_timeout=ORCHESTRATOR_SESSION_IDLE_TIMEOUT,
+    )
+
+def query_session(session_id, question):
+    """Answer a question with the session's orchestrator, requests of one session run one at a time"""
+    with orchestrator_sessions.lease(session_id) as orchestrator:
+        return orchestrator.query(question)
+
+def shutdown():
+    """Release the sub-agents' pools and MCP sessions and the shared threads, once the process is done serving"""
+    for sub_agent_tool in SUB_AGENT_TOOLS:
+        sub_agent_tool.shutdown()
+    if fan_out_pool is not None:
+        fan_out_pool.shutdown(wait=True)
+    shutdown_summaries()
 
 @app.entrypoint
-def invoke(payload):
+def invoke(payload, context):
     user_message = payload.get("prompt", "Hello")
+    # the runtimeSessionId the request was sent with, None when testing locally without one
+    session_id = context.session_id
+    # with {"stream": true} in the payload return an async generator, AgentCore serves it as text/event-stream
+    # sub-agent tokens are sent as they are generated and the metrics block is the final event
+    if payload.get("stream", False):
+        return stream_events(functools.partial(query_session, session_id), user_message)
     # to call the orchestrator agent directly
     #result = orchestrator.orchestrator_agent(user_message)
     # but we want to use the query so we can get some metrics in this lab example
-    result = orchestrator.query(user_message)
+    result = query_session(session_id, user_message)
     return {
         "answer": result["answer"],
         "metrics": result["metrics"],
     }
 
 if __name__ == "__main__":
-    app.run()
+    parser = argparse.ArgumentParser(description="Crypto orchestration agent")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="import every sub-agent, print where the start up time went and exit")
+    args = parser.parse_args()
+
+    if args.startup_report:
+        for sub_agent_tool in SUB_AGENT_TOOLS:
+            sub_agent_tool.load()
+        print(startup_report.format())
+    else:
+        if SUB_AGENT_WARMUP:
+            # Build the sub-agents and open the CoinGecko MCP sessions in the background while the app serves,
+            # so the first query to each is already warm
+            start_warm_up(SUB_AGENT_TOOLS, on_done=lambda: print(startup_report.format(), flush=True))
+        else:
+            print(startup_report.format(), flush=True)
+        app.run()
@@ -0,0 +1,100 @@
+# test_branch_pool.py
+# Exercises the fan-out threads (branch_pool.py) and the orchestrator's fan-out path: a part that times out keeps
+# its thread until it finishes but never streams its answer, and a prompt whose parts cannot all start at once is
+# answered by the LLM orchestrator rather than queued behind abandoned parts
+# Runs locally with the stub model, no Bedrock calls are made
+import threading
+import time
+from concurrent.futures import wait
+from strands import tool
+from branch_pool import BranchPool
+from config import INFERENCE_MODEL, REGION
+from intent_router import IntentPart
+from model_registry import set_bedrock_model
+from streaming import current_sink
+from stub_model import StubModel
+
+print("Branch Pool Test")
+
+# branches are counted until they finish, abandoned ones included
+pool = BranchPool(max_workers=2)
+release = threading.Event()
+futures = pool.try_submit([release.wait, release.wait])
+assert pool.try_submit([lambda: None]) is None
+done, not_done = wait(futures, timeout=0.05)
+pool.abandon(not_done)
+print(f"after a timeout: {pool.stats()}")
+assert pool.stats()["abandoned_running"] == 2 and pool.try_submit([lambda: None]) is None
+release.set()
+wait(futures)
+time.sleep(0.01)
+assert pool.stats()["running"] == 0 and pool.stats()["abandoned_running"] == 0
+assert [f.result() for f in pool.try_submit([lambda: 1, lambda: 2])] == [1, 2]
+pool.shutdown()
+
+# the orchestrator's fan-out, with a part that outlives the branch timeout
+set_bedrock_model(StubModel(first_token_latency=0, token_latency=0, output_tokens=5), INFERENCE_MODEL, REGION)
+import Strands_Orchestration_Crypto_Agent as orchestration  # noqa: E402
+
+slow_release = threading.Event()
+
+
+@tool
+def crypto_educator(query: str) -> str:
+    """Teach a concept.
+
+    Args:
+        query: The question.
+    """
+    slow_release.wait(5)
+    return "late lesson"
+
+
+@tool
+def crypto_market_analyst(query: str) -> str:
+    """Quote a price.
+
+    Args:
+        query: The question.
+    """
+    return "price"
+
+
+class TwoParts:
+    def split_intents(self, prompt, has_history=False):
+        return [
+            IntentPart("crypto_educator", "what is staking", 1.0), IntentPart("crypto_market_analyst", "price", 1.0),
+        ]
+
+    def route(self, prompt, has_history=False):
+        raise AssertionError("a multi-intent prompt is never routed to a single sub-agent")
+
+
+pool = BranchPool(max_workers=2)
+orchestrator = orchestration.CryptoOrchestrator(
+    [crypto_educator, crypto_market_analyst], router=TwoParts(), fan_out=True, branch_timeout=0.2, fan_out_pool=pool,
+)
+events = []
+current_sink.set(events.append)
+result = orchestrator.query("What is staking and what is the price of ETH?")
+branches = {b["tool"]: b["status"] for b in result["metrics"]["routing"]["branches"]}
+print(f"fan-out: {branches}, pool {pool.stats()}")
+assert branches == {"crypto_educator": "timeout", "crypto_market_analyst": "ok"}
+
+# one thread is left of two, not enough for both parts, the LLM orchestrator answers
+result = orchestrator.query("What is staking and what is the price of ETH?")
+print(f"pool busy: path {result['metrics'].get('routing', {}).get('path', 'llm')}, pool {pool.stats()}")
+assert "routing" not in result["metrics"] and pool.stats()["refused"] == 1
+
+# the abandoned part finishes, its answer is not streamed into the finished request
+slow_release.set()
+deadline = time.monotonic() + 5
+while pool.stats()["running"] and time.monotonic() < deadline:
+    time.sleep(0.01)
+streamed = [e["tool"] for e in events if e.get("tool") in ("crypto_educator", "crypto_market_analyst")]
+print(f"streamed parts: {streamed}")
+assert streamed == ["crypto_market_analyst"] and pool.stats()["running"] == 0
+current_sink.set(None)
+pool.shutdown()
+orchestration.shutdown()
+print("OK")
@@ -0,0 +1,144 @@
+# test_conversation_memory.py
+# Exercises the orchestrator's bounded conversation (conversation_memory.py) and the per session registry
+# (sessions.py) with the stub model, the window, token cap, background summary and session eviction
+# Runs locally, no Bedrock calls are made
+import threading
+import time
+from strands import Agent, tool
+from conversation_memory import SUMMARY_PREFIX, BoundedConversationManager, estimate_tokens, is_turn_start
+from sessions import SessionRegistry
+from stub_model import StubModel
+
+
+@tool
+def lookup(query: str) -> str:
+    """Look something up.
+
+    Args:
+        query: What to look up.
+    """
+    return f"result for {query}"
+
+
+def turns(messages):
+    """Number of turns in the history, the summary pair excluded"""
+    start = 2 if messages and messages[0]["content"][0].get("text", "").startswith(SUMMARY_PREFIX) else 0
+    return sum(1 for message in messages[start:] if is_turn_start(message))
+
+
+def new_agent(manager, tool_inputs=None):
+    model = StubModel(first_token_latency=0, token_latency=0, output_tokens=20, tool_inputs=tool_inputs)
+    return Agent(model=model, tools=[lookup], conversation_manager=manager, callback_handler=None)
+
+
+print("Conversation Memory Test")
+
+# the window keeps the last max_turns turns, tool use and result pairs stay with their turn
+agent = new_agent(BoundedConversationManager(max_turns=3, max_tokens=100000), {"lookup": {"query": "bitcoin"}})
+for i in range(6):
+    agent(f"question {i}")
+first = agent.messages[0]["content"][0]["text"]
+print(f"max_turns 3: {turns(agent.messages)} turns, {len(agent.messages)} messages, first {first!r}, "
+      f"removed {agent.conversation_manager.removed_message_count}")
+assert turns(agent.messages) == 3 and first == "question 3"
+assert [m["role"] for m in agent.messages] == ["user", "assistant", "user", "assistant"] * 3
+assert any("toolUse" in block for block in agent.messages[1]["content"])
+
+# the token cap evicts further, the most recent turn is always kept
+agent = new_agent(BoundedConversationManager(max_turns=10, max_tokens=120))
+for i in range(6):
+    agent(f"question {i} " + "padding " * 20)
+tokens = estimate_tokens(agent.messages)
+print(f"max_tokens 120: {turns(agent.messages)} turns, ~{tokens} tokens")
+assert turns(agent.messages) < 6 and (tokens <= 120 or turns(agent.messages) == 1)
+agent = new_agent(BoundedConversationManager(max_turns=10, max_tokens=10))
+agent("a single turn larger than the cap " * 10)
+assert turns(agent.messages) == 1
+
+# evicted turns are summarized in the background and the summary pair is put first on the next turn
+summarized = []
+release = threading.Event()
+
+
+def summarizer(summary, dropped):
+    release.wait(5)
+    summarized.append(dropped)
+    return f"{summary} | {len(dropped.splitlines())} lines".strip(" |")
+
+
+manager = BoundedConversationManager(max_turns=2, max_tokens=100000, summarizer=summarizer)
+agent = new_agent(manager)
+for i in range(4):
+    start = time.perf_counter()
+    agent(f"question {i}")
+    # the turn does not wait for the summary
+    assert time.perf_counter() - start < 1
+release.set()
+deadline = time.monotonic() + 5
+while (manager._summarizing or manager._pending) and time.monotonic() < deadline:
+    time.sleep(0.01)
+summary = manager.summary
+agent("question 4")
+print(f"summary {summary!r} after {len(summarized)} summarizer call(s), "
+      f"history starts {agent.messages[0]['content'][0]['text']!r}")
+assert summary and agent.messages[0]["content"][0]["text"] == f"{SUMMARY_PREFIX}\n{summary}"
+assert turns(agent.messages) == 2 and "question 0" in summarized[0]
+
+# a context window overflow drops the oldest turn
+agent = new_agent(BoundedConversationManager(max_turns=10, max_tokens=100000))
+for i in range(3):
+    agent(f"question {i}")
+agent.conversation_manager.reduce_context(agent)
+assert turns(agent.messages) == 2 and agent.messages[0]["content"][0]["text"] == "question 1"
+print("reduce_context: oldest turn dropped")
+
+# sessions: least recently used beyond max_sessions, and idle ones past the timeout, are dropped
+evicted = []
+registry = SessionRegistry(lambda session_id: {"id": session_id}, max_sessions=2, idle_timeout=None,
+                           on_evict=lambda session_id, value: evicted.append(session_id))
+for session_id in ("a", "b", "a", "c"):
+    with registry.lease(session_id) as value:
+        assert value["id"] == session_id
+print(f"max_sessions 2: evicted {evicted}, stats {registry.stats()}")
+assert evicted == ["b"] and registry.stats()["sessions"] == 2
+
+# a leased session is never dropped, even past max_sessions
+evicted.clear()
+with registry.lease("a"):
+    for session_id in ("d", "e"):
+        with registry.lease(session_id):
+            pass
+assert "a" not in evicted
+
+registry = SessionRegistry(lambda session_id: object(), max_sessions=10, idle_timeout=0.1)
+with registry.lease("old"):
+    pass
+time.sleep(0.2)
+with registry.lease("new"):
+    pass
+print(f"idle_timeout 0.1s: stats {registry.stats()}")
+assert registry.stats()["expired"] == 1 and registry.stats()["sessions"] == 1
+
+# requests of one session run one at a time, another session is not held up
+registry = SessionRegistry(lambda session_id: [], max_sessions=10, idle_timeout=None)
+order = []
+
+
+def request(session_id, name, seconds):
+    with registry.lease(session_id):
+        order.append(f"{name} start")
+        time.sleep(seconds)
+        order.append(f"{name} end")
+
+
+threads = [threading.Thread(target=request, args=args) for args in (("s1", "first", 0.2), ("s1", "second", 0))]
+threads[0].start()
+time.sleep(0.05)
+threads[1].start()
+other = threading.Thread(target=request, args=("s2", "other", 0))
+other.start()
+for thread in threads + [other]:
+    thread.join()
+print(f"same session serialized: {order}")
+assert order.index("second start") > order.index("first end") and order.index("other end") < order.index("first end")
+print("OK")
@@ -0,0 +1,90 @@
+# test_embedding_cache.py
+# Queries an S3 Vectors index of the datasource with and without the query embedding cache (embedding_cache.py)
+# Popular questions are asked many times, with different case and punctuation, then a restarted process reuses the
+# persisted embeddings
+# Runs locally against the stubs of stub_aws.py, no AWS calls are made
+import json
+import os
+import random
+import tempfile
+import time
+from embedding_cache import CachedEmbedder
+from embeddings import BedrockEmbedder
+from kb_ingestion import S3Source, S3VectorsSink, ingest
+from s3_vectors_kb import S3VectorsKnowledgeBase
+from stub_aws import StubBedrockRuntimeClient, StubS3Client, StubS3VectorsClient, corpus
+
+LOOKUPS = 300
+EMBED_LATENCY = 0.03
+
+with open("kb_eval.json", encoding="utf-8") as f:
+    questions = [query["query"] for query in json.load(f)]
+random.seed(7)
+# a few questions are asked most of the time (Zipf-like), in varying case and punctuation
+weights = [1 / rank for rank in range(1, len(questions) + 1)]
+lookups = [
+    random.choice([q, q.lower(), q.upper(), q.rstrip("?"), f"  {q}  "])
+    for q in random.choices(questions, weights, k=LOOKUPS)
+]
+
+
+def run(name, embedder, bedrock, s3vectors):
+    bedrock.calls.clear()
+    knowledge_base = S3VectorsKnowledgeBase("vectors", "index", embedder, client=s3vectors)
+    started = time.perf_counter()
+    results = [[hit.document for hit in knowledge_base.search(text, 3)] for text in lookups]
+    seconds = time.perf_counter() - started
+    stats = {}
+    if isinstance(embedder, CachedEmbedder):
+        stats = embedder.stats()
+        embedder.close()
+    print(f"{name}: {LOOKUPS} lookups in {seconds:.2f}s ({seconds / LOOKUPS * 1000:.1f}ms each), "
+          f"invoke_model {bedrock.calls['invoke_model']} {stats}")
+    return results, bedrock.calls["invoke_model"]
+
+
+print("Embedding Cache Test")
+with tempfile.TemporaryDirectory() as folder:
+    bedrock = StubBedrockRuntimeClient(latency=EMBED_LATENCY)
+    s3vectors = StubS3VectorsClient(latency=0.005)
+    ingest(
+        S3Source("bucket", "crypto", client=StubS3Client(corpus("../resources/kb-datasource"), latency=0)),
+        S3VectorsSink("vectors", "index", client=s3vectors),
+        BedrockEmbedder(client=bedrock, dim=1024),
+        os.path.join(folder, "manifest.json"),
+    )
+    distinct = len({text.strip().lower().rstrip("?") for text in lookups})
+    print(f"{len(s3vectors.vectors)} vectors, {distinct} distinct questions, "
+          f"stub latency {EMBED_LATENCY * 1000:.0f}ms per embedding and 5ms per query_vectors")
+
+    uncached, calls = run("uncached", BedrockEmbedder(client=bedrock, dim=1024), bedrock, s3vectors)
+    assert calls == LOOKUPS
+
+    path = os.path.join(folder, "query_embeddings.db")
+    cached, calls = run("cached", CachedEmbedder(BedrockEmbedder(client=bedrock, dim=1024), path=path), bedrock, s3vectors)
+    assert cached == uncached and calls == distinct
+
+    # a new process, the persisted embeddings are loaded on start
+    restarted, calls = run(
+        "restarted", CachedEmbedder(BedrockEmbedder(client=bedrock, dim=1024), path=path), bedrock, s3vectors
+    )
+    assert restarted == uncached and calls == 0
+
+    # fewer entries in memory than questions, the evicted ones are read back from disk
+    small = CachedEmbedder(BedrockEmbedder(client=bedrock, dim=1024), max_entries=5, path=path)
+    evicting, calls = run("5 in memory", small, bedrock, s3vectors)
+    assert evicting == uncached and calls == 0 and small.stats()["disk_hits"] > 0
+
+    # vectors of another dimension are not reused
+    bedrock.calls.clear()
+    other = CachedEmbedder(BedrockEmbedder(client=bedrock, dim=512), path=path)
+    assert other.embed(lookups[:1]).shape == (1, 512) and bedrock.calls["invoke_model"] == 1
+    other.close()
+
+    # a file that cannot be created (eg a read-only container) leaves a memory only cache
+    bedrock.calls.clear()
+    read_only = CachedEmbedder(BedrockEmbedder(client=bedrock, dim=1024), path=os.path.join(path, "embeddings.db"))
+    read_only.embed(lookups[:1])
+    read_only.embed(lookups[:1])
+    assert read_only._db is None and bedrock.calls["invoke_model"] == 1
+print("OK")
@@ -0,0 +1,60 @@
+# test_goplus_client.py
+# Exercises the batched, cached GoPlus client and the security sub-agent's tool against the local stub API
+# Runs locally, no GoPlus or Bedrock calls are made
+import json
+import time
+import requests
+from goplus_client import GoPlusClient, summarize_token
+from stub_goplus_server import serve
+from stub_goplus_server import token_security as raw_token_security
+
+server = serve()
+base_url = f"http://127.0.0.1:{server.server_port}/api/v1"
+client = GoPlusClient(base_url, cache_ttl=60, max_batch=20)
+
+addresses = [
+    "0x6982508145454Ce325dDbE47a25d4ec3d2311933",
+    "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48",
+    "0x95aD61b0a150d79219dCF64E1E6Cc01f0B64C4cE",
+    "0x000000000000000000000000000000000000dead",
+    "0x1234567890abcdef1234567890abcdef12340000",
+]
+
+print("GoPlus Client Test")
+start = time.perf_counter()
+summaries = client.token_security("1", addresses)
+print(f"{len(addresses)} tokens in {time.perf_counter() - start:.3f}s, stub stats: {requests.get(f'http://127.0.0.1:{server.server_port}/stats').json()}")
+for address, summary in summaries.items():
+    print(f"  {address}: {summary['red_flags'] if summary else 'not found'}")
+# the unknown token makes the answer partial (code 2), the other tokens are still returned
+assert summaries[addresses[-1]] is None and all(summaries[a.lower()] for a in addresses[:-1])
+
+# the same tokens again (different case) are served from the cache
+start = time.perf_counter()
+client.token_security(1, [a.upper().replace("0X", "0x") for a in addresses])
+print(f"Cached lookup in {(time.perf_counter() - start) * 1000:.2f}ms, client stats: {client.stats()}")
+
+# a token GoPlus had no data on is asked again, the others stay cached
+before = client.stats()["requests"]
+client.token_security("1", addresses)
+print(f"Repeat lookup made {client.stats()['requests'] - before} request(s) for the not found token")
+
+# non-numeric values are reported as they are instead of failing the tool
+odd = summarize_token({"token_symbol": "ODD", "buy_tax": "unknown", "sell_tax": "0.25", "holder_count": "n/a"})
+print(f"Non-numeric fields: {odd}")
+assert odd["buy_tax"] == "unknown" and odd["sell_tax"] == "25%" and odd["red_flags"] == ["high sell tax of 25%"]
+
+# the model reads the compact summary instead of the raw record
+address = addresses[0].lower()
+raw = json.dumps({"code": 1, "message": "OK", "result": {address: raw_token_security("1", address)}})
+compact = json.dumps(summaries[address], separators=(",", ":"))
+print(f"Raw response {len(raw)} chars, summary {len(compact)} chars ({1 - len(compact) / len(raw):.0%} smaller)")
+print(f"Summary: {compact}")
+
+# 30 tokens with max_batch 20 is 2 requests
+client.clear()
+before = requests.get(f"http://127.0.0.1:{server.server_port}/stats").json()["requests"]
+client.token_security("56", [f"0x{i:040x}" for i in range(1, 31)])
+after = requests.get(f"http://127.0.0.1:{server.server_port}/stats").json()["requests"]
+print(f"30 tokens on chain 56 took {after - before} requests")
+server.shutdown()
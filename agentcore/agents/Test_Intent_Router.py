@@ -0,0 +1,107 @@
+# test_intent_router.py
+# Reports routing accuracy, fast-path coverage and latency of the pre-router on a labelled prompt set
+# Runs locally, no Bedrock calls are made
+import ast
+from intent_router import IntentRouter, EDUCATION, MARKET, SECURITY, GENERAL, is_follow_up
+from config import ROUTER_CONFIDENCE_THRESHOLD
+
+# the orchestrator's system prompt, read from its source rather than imported, importing the module would set up
+# its agent pools and session store
+with open("Strands_Orchestration_Crypto_Agent.py", encoding="utf-8") as f:
+    CRYPTO_SYSTEM_PROMPT = next(
+        ast.literal_eval(node.value) for node in ast.parse(f.read()).body
+        if isinstance(node, ast.Assign) and getattr(node.targets[0], "id", None) == "CRYPTO_SYSTEM_PROMPT"
+    )
+
+# held out prompts, none of these appear in the orchestrator system prompt
+LABELLED_PROMPTS = [
+    ("What is Bitcoin?", EDUCATION),
+    ("Explain how a crypto wallet works", EDUCATION),
+    ("How do I store my crypto safely?", EDUCATION),
+    ("What is the difference between a coin and a token?", EDUCATION),
+    ("What does DeFi mean?", EDUCATION),
+    ("How does proof of stake work?", EDUCATION),
+    ("What are common crypto scams I should watch out for?", EDUCATION),
+    ("What is dollar cost averaging in crypto?", EDUCATION),
+    ("How do I choose which coins to invest in?", EDUCATION),
+    ("What is a crypto bubble?", EDUCATION),
+    ("Teach me the basics of NFTs", EDUCATION),
+    ("What is token supply and why does it matter?", EDUCATION),
+    ("What is the price of Ethereum?", MARKET),
+    ("How much is Solana worth right now?", MARKET),
+    ("What is the market cap of Bitcoin?", MARKET),
+    ("Show me the top 10 coins by market cap", MARKET),
+    ("What are the trending coins on CoinGecko today?", MARKET),
+    ("Give me a 7d chart for BTC", MARKET),
+    ("What is the 24h trading volume of XRP?", MARKET),
+    ("What is the floor price of Bored Ape Yacht Club NFT?", MARKET),
+    ("Which tokens are the top gainers today?", MARKET),
+    ("Is token 0x6982508145454ce325ddbe47a25d4ec3d2311933 on chain id 1 a honeypot?", SECURITY),
+    ("Check the sell tax for 0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48 on chain 1", SECURITY),
+    ("Is ownership renounced for contract 0x95aD61b0a150d79219dCF64E1E6Cc01f0B64C4cE?", SECURITY),
+    ("Can the owner modify slippage on this token 0x1234567890abcdef on BNB chain?", SECURITY),
+    ("Is this token safe? 0xdac17f958d2ee523a2206206994597c13d831ec7 chain id 1", SECURITY),
+    ("Does the contract 0xabcdef123456 have a blacklist function?", SECURITY),
+    ("Tell me a joke", GENERAL),
+    ("What is the capital of France?", GENERAL),
+    ("Write me a haiku about autumn", GENERAL),
+    ("How do I boil an egg?", GENERAL),
+    ("Help me write a cover letter", GENERAL),
+    ("Who painted the Mona Lisa?", GENERAL),
+    ("Give me three tips for better sleep", GENERAL),
+    ("What is the price of a gallon of milk in the US?", GENERAL),
+    ("Recommend a good science fiction book", GENERAL),
+]
+
+# opinion and advice questions, these must go to the LLM orchestrator for its risk caveats
+ADVICE_PROMPTS = [
+    "Is Bitcoin a good investment?",
+    "Should I sell my BTC?",
+    "Should I buy Ethereum now?",
+    "Is Solana undervalued?",
+    "What is your BTC price prediction for next year?",
+    "Is it worth investing in Dogecoin?",
+]
+
+# follow ups that only make sense with the conversation, the sub-agents do not see it
+FOLLOW_UP_PROMPTS = [
+    "What about its price?",
+    "And what is its market cap?",
+    "Is it a honeypot?",
+    "Can you summarize what you just said?",
+    "What was the first thing I asked you?",
+]
+
+router = IntentRouter.from_system_prompt(CRYPTO_SYSTEM_PROMPT, threshold=ROUTER_CONFIDENCE_THRESHOLD)
+report = router.evaluate(LABELLED_PROMPTS)
+
+print("Intent Router Evaluation")
+print(f"Prompts:            {report['prompts']}")
+print(f"Fast path:          {report['fast_path']} ({report['coverage']:.0%} of prompts skip the LLM orchestrator)")
+print(f"Fast path accuracy: {report['fast_path_accuracy']:.0%}")
+print(f"Top-1 accuracy:     {report['top1_accuracy']:.0%}")
+print(f"Latency:            mean {report['mean_latency_ms']}ms, max {report['max_latency_ms']}ms")
+for prompt, routed, expected in report["errors"]:
+    print(f"  MISROUTED: {prompt!r} -> {routed} (expected {expected})")
+for prompt, _ in LABELLED_PROMPTS:
+    print(f"  {router.route(prompt)} {prompt}")
+
+print("Advice prompts (LLM orchestrator expected):")
+for prompt in ADVICE_PROMPTS:
+    decision = router.route(prompt)
+    print(f"  {'FAST PATH' if decision.confident else 'fallback '} {decision} {prompt}")
+    assert not decision.confident, prompt
+
+print("Follow up prompts in a session with history (LLM orchestrator expected):")
+for prompt in FOLLOW_UP_PROMPTS:
+    decision = router.route(prompt, has_history=True)
+    print(f"  {'FAST PATH' if decision.confident else 'fallback '} {decision} {prompt}")
+    assert not decision.confident and decision.source == "follow_up", prompt
+    assert router.split_intents(f"What is staking? {prompt}", has_history=True) is None, prompt
+# a prompt naming its own subject is routed the same with or without history, eg a contract address and "this token"
+standalone = [prompt for prompt, _ in LABELLED_PROMPTS if not is_follow_up(prompt)]
+for prompt in standalone:
+    decision = router.route(prompt, has_history=True)
+    assert decision == router.route(prompt)._replace(latency_ms=decision.latency_ms), prompt
+print(f"{len(standalone)} of {len(LABELLED_PROMPTS)} labelled prompts are routed the same in a session with history")
+print("OK")
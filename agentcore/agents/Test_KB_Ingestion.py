@@ -0,0 +1,51 @@
+# test_kb_ingestion.py
+# Runs the knowledge base ingestion pipeline against local stubs of S3, Bedrock and S3 Vectors (stub_aws.py)
+# Compares a sequential run with the concurrent pipeline, then re-syncs after a few changes
+# Runs locally, no AWS calls are made
+import os
+import tempfile
+from embeddings import BedrockEmbedder
+from kb_ingestion import S3Source, S3VectorsSink, format_report, ingest
+from stub_aws import StubBedrockRuntimeClient, StubS3Client, StubS3VectorsClient, corpus
+
+COPIES = 20
+
+
+def run(name, s3, manifest, **kwargs):
+    bedrock = StubBedrockRuntimeClient(latency=0.005, max_concurrency=6)
+    s3vectors = StubS3VectorsClient()
+    s3.calls.clear()
+    report = ingest(
+        S3Source("bucket", "crypto", client=s3),
+        S3VectorsSink("vectors", "index", client=s3vectors),
+        BedrockEmbedder(client=bedrock),
+        manifest,
+        **kwargs,
+    )
+    print(f"{name}: {format_report(report)}")
+    print(f"    S3 {dict(s3.calls)} max {s3.max_in_flight} at once, Bedrock {dict(bedrock.calls)} "
+          f"max {bedrock.max_in_flight} at once, S3 Vectors {dict(s3vectors.calls)}")
+    return report, s3vectors
+
+
+print("KB Ingestion Test")
+with tempfile.TemporaryDirectory() as folder:
+    s3 = StubS3Client(corpus("../resources/kb-datasource", copies=COPIES), latency=0.01)
+    print(f"{COPIES * 6} documents, stub latency 10ms per S3 read and 5ms per embedding, at most 6 embeddings at once")
+
+    sequential, _ = run("sequential", s3, os.path.join(folder, "sequential.json"), read_workers=1, embed_workers=1)
+    concurrent, s3vectors = run("concurrent", s3, os.path.join(folder, "concurrent.json"))
+    print(f"speed-up {sequential.seconds / concurrent.seconds:.1f}x, {len(s3vectors.vectors)} vectors stored")
+    assert sequential.embedded == concurrent.embedded == len(s3vectors.vectors)
+
+    # nothing changed, nothing is read or embedded
+    unchanged, _ = run("re-sync", s3, os.path.join(folder, "concurrent.json"))
+    assert unchanged.embedded == 0 and s3.calls["get_object"] == 0
+
+    # one paragraph edited, one document removed (with its metadata)
+    key = "crypto/0000/Token Supply.md"
+    s3.objects[key] = s3.objects[key].replace(b"Locked liquidity means", b"Locked liquidity (LL) means", 1)
+    for removed in ("crypto/0001/Crypto Bubble.md", "crypto/0001/Crypto Bubble.md.metadata.json"):
+        del s3.objects[removed]
+    diff, _ = run("after changes", s3, os.path.join(folder, "concurrent.json"))
+    assert diff.changed == [key] and diff.embedded == 1 and len(diff.removed) == 1
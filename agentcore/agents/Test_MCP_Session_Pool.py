@@ -0,0 +1,79 @@
+# test_mcp_session_pool.py
+# Exercises the MCP session pool against the local stdio stand-in server (no npx or network needed)
+import sys
+import threading
+import tempfile
+import time
+from mcp import stdio_client, StdioServerParameters
+from strands.tools.mcp import MCPClient
+from mcp_session_pool import MCPSessionPool
+from mcp_tool_catalog import MCPToolCatalog
+
+
+def create_stub_client():
+    return MCPClient(
+        lambda: stdio_client(StdioServerParameters(command=sys.executable, args=["stub_mcp_server.py"]))
+    )
+
+
+snapshot_dir = tempfile.mkdtemp()
+catalog = MCPToolCatalog("stub://coingecko", ttl=3600, snapshot_dir=snapshot_dir)
+pool = MCPSessionPool(create_stub_client, size=2, idle_timeout=None, health_check_interval=1, catalog=catalog)
+
+print("MCP Session Pool Test")
+start = time.perf_counter()
+pool.start()
+print(f"Pool started in {time.perf_counter() - start:.2f}s: {pool.stats()}")
+
+# warm leases should not pay the process start and handshake
+for i in range(3):
+    start = time.perf_counter()
+    with pool.lease() as session:
+        tool_names = [t.tool_name for t in session.tools]
+        result = session.client.call_tool_sync("price-1", "get_simple_price", {"ids": "bitcoin"})
+    print(f"Lease {i + 1} in {time.perf_counter() - start:.3f}s, tools={tool_names}, result={result['content']}")
+
+# kill the server process and check the background health check reconnects the session
+with pool.lease() as session:
+    session.client.call_tool_sync("crash-1", "crash", {})
+    print("Server process killed")
+time.sleep(3)
+with pool.lease() as session:
+    result = session.client.call_tool_sync("price-2", "get_simple_price", {"ids": "ethereum"})
+    print(f"After reconnect: {result['content']}")
+
+print(f"Pool stats: {pool.stats()}")
+pool.stop()
+
+# a new catalog (eg in a cold container) is served from the snapshot without listing the tools
+cold_catalog = MCPToolCatalog("stub://coingecko", ttl=3600, snapshot_dir=snapshot_dir)
+print(f"Cold catalog from snapshot: {cold_catalog.stats()}")
+print(f"Fingerprint unchanged: {cold_catalog.fingerprint == catalog.fingerprint}")
+
+# a session leased across stop() is closed when returned, so a restarted pool keeps its size
+pool = MCPSessionPool(create_stub_client, size=1, idle_timeout=None, health_check_interval=3600)
+with pool.lease() as session:
+    pool.stop()
+    pool.start()
+print(f"Closed on return after stop: {session.client is None}, restarted pool: {pool.stats()}")
+try:
+    with pool.lease() as held, pool.lease(timeout=0):
+        pass
+except TimeoutError as e:
+    print(f"Lease timeout: {e}")
+
+# a health check keeps the other sessions available to leases
+pool.stop()
+pool = MCPSessionPool(create_stub_client, size=2, idle_timeout=None, health_check_interval=3600).start()
+with pool.lease() as first:
+    pass
+first.is_healthy = lambda timeout=10: time.sleep(1) or True
+checker = threading.Thread(target=pool.check_idle_sessions)
+checker.start()
+time.sleep(0.2)
+start = time.perf_counter()
+with pool.lease(timeout=5) as session:
+    print(f"Lease during a health check in {time.perf_counter() - start:.3f}s, other session: {session is not first}")
+checker.join()
+print(f"Pool stats: {pool.stats()}")
+pool.stop()
@@ -0,0 +1,87 @@
+# test_session_store.py
+# Exercises the persisted session histories (session_store.py): appended turns, compacted snapshots and the restore
+# of a session in a new agent, on SQLite and on a stub DynamoDB table that throttles its batch deletes
+# Runs locally with the stub model and stub_aws.py, no Bedrock or DynamoDB calls are made
+import os
+import tempfile
+from strands import Agent
+from conversation_memory import BoundedConversationManager
+from session_store import DynamoDBSessionStore, PersistedSession, SQLiteSessionStore
+from stub_aws import StubDynamoDBClient
+from stub_model import StubModel
+
+TURNS = 11
+SNAPSHOT_EVERY = 4
+
+
+def new_agent():
+    model = StubModel(first_token_latency=0, token_latency=0, output_tokens=10)
+    manager = BoundedConversationManager(max_turns=3, max_tokens=100000, summarizer=lambda summary, dropped: "summary")
+    return Agent(model=model, conversation_manager=manager, callback_handler=None)
+
+
+def run_session(store, session_id):
+    """TURNS turns of a session, returns the agent and the write made for each turn"""
+    agent = new_agent()
+    persistence = PersistedSession(store, session_id, snapshot_every=SNAPSHOT_EVERY)
+    assert persistence.restore(agent) is False
+    writes = []
+    for i in range(TURNS):
+        agent(f"question {i}")
+        writes.append(persistence.save_turn(agent))
+    return agent, writes
+
+
+def check_store(name, store):
+    agent, writes = run_session(store, "session-1")
+    record = store.load("session-1")
+    print(f"{name}: writes {writes}")
+    print(f"{name}: record seq {record.seq}, snapshot_seq {record.snapshot_seq}, {len(record.messages)} messages")
+    # a snapshot every SNAPSHOT_EVERY turns, the turns in between are appends
+    assert writes.count("snapshot") == TURNS // SNAPSHOT_EVERY
+    assert record.seq == TURNS and record.snapshot_seq == TURNS // SNAPSHOT_EVERY * SNAPSHOT_EVERY
+    assert record.state is not None
+
+    # a new agent, eg in a recycled container, resumes with the same bounded history
+    restored = new_agent()
+    persistence = PersistedSession(store, "session-1", snapshot_every=SNAPSHOT_EVERY)
+    assert persistence.restore(restored) is True
+    assert restored.messages == agent.messages and persistence.seq == TURNS
+    restored("question after restore")
+    # the numbering carries on from the saved turns, turn 12 is the third snapshot
+    assert persistence.save_turn(restored) == "snapshot" and store.load("session-1").seq == TURNS + 1
+    print(f"{name}: restored {len(restored.messages)} messages, first {restored.messages[0]['content'][0]['text']!r}")
+
+    store.delete("session-1")
+    assert store.load("session-1") is None
+
+
+print("Session Store Test")
+with tempfile.TemporaryDirectory() as folder:
+    sqlite = SQLiteSessionStore(os.path.join(folder, "sessions.db"))
+    check_store("sqlite", sqlite)
+    # compaction removes the turns the snapshot includes
+    run_session(sqlite, "session-2")
+    turn_rows = sqlite._conn.execute("SELECT COUNT(*) FROM turns WHERE session_id = 'session-2'").fetchone()[0]
+    assert turn_rows == TURNS % SNAPSHOT_EVERY
+    sqlite._conn.close()
+
+# the first batch deletes leave half their requests unprocessed, they are retried until none is left
+dynamodb = StubDynamoDBClient(unprocessed_calls=3)
+store = DynamoDBSessionStore("sessions", "us-east-1", client=dynamodb, backoff=0.001)
+check_store("dynamodb", store)
+run_session(store, "session-2")
+turn_items = [key for key in dynamodb.items if key[0] == "session-2" and key[1].startswith("turn#")]
+print(f"dynamodb: batch_write_item calls {dynamodb.calls['batch_write_item']}, {len(turn_items)} turn items left")
+assert len(turn_items) == TURNS % SNAPSHOT_EVERY
+
+# a table that keeps throttling makes delete() fail instead of leaving items behind silently
+store = DynamoDBSessionStore("sessions", "us-east-1", client=StubDynamoDBClient(unprocessed_calls=100),
+                             max_retries=2, backoff=0.001)
+run_session(store, "session-3")
+try:
+    store.delete("session-3")
+    raise AssertionError("delete should have failed")
+except RuntimeError as e:
+    print(f"dynamodb, always throttled: {e}")
+print("OK")
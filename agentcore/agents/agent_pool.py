@@ -0,0 +1,136 @@
+"""
+Bounded pool of pre-built Strands agents
+
+A Strands Agent keeps its conversation history and refuses concurrent invocations, so a single module-level
+agent shared by every AgentCore session is both a source of history bleed between users and a bottleneck
+that serializes requests. The pool builds up to `size` agents from a factory (sharing one BedrockModel and
+the same tools) and leases one per request. Returned agents are reset, so their history never grows beyond
+a single request and no state leaks into the next lease. close() cleans up the idle agents' tool providers at
+shutdown, agents leased at the time are cleaned up when returned.
+
+USAGE:
+    pool = AgentPool(lambda: Agent(model=bedrock_model, tools=[retrieve]), size=8)
+
+    with pool.lease() as agent:
+        response = agent(query)
+"""
+
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from strands.agent.state import AgentState
+from strands.telemetry.metrics import EventLoopMetrics
+
+logger = logging.getLogger(__name__)
+
+
+class AgentPool:
+    """Leases pre-built agents to one request at a time"""
+
+    def __init__(self, agent_factory, size=8, lease_timeout=60, prebuild=0):
+        """
+        Args:
+            agent_factory: Callable returning a new Agent
+            size: Maximum number of agents, ie concurrent requests served by this pool
+            lease_timeout: Default seconds to wait for a free agent before raising TimeoutError
+            prebuild: Number of agents to build up front, the rest are built on demand
+        """
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.agent_factory = agent_factory
+        self.size = size
+        self.lease_timeout = lease_timeout
+        # LIFO so a small number of agents stay hot under light load
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._stats = {"leases": 0, "waits": 0, "lease_wait_time": 0.0}
+        for _ in range(min(prebuild, size)):
+            self._idle.put(self._create())
+
+    @contextmanager
+    def lease(self, timeout=None):
+        """Borrow an agent with an empty history for the duration of the with block
+
+        Args:
+            timeout: Seconds to wait for a free agent, defaults to the pool's lease_timeout
+
+        Raises:
+            TimeoutError: If all agents stay busy for longer than the timeout
+        """
+        if self._closed:
+            raise RuntimeError("the agent pool is closed")
+        agent = self._acquire(self.lease_timeout if timeout is None else timeout)
+        try:
+            yield agent
+        finally:
+            self.reset(agent)
+            if self._closed:
+                agent.cleanup()
+            else:
+                self._idle.put(agent)
+
+    def warm(self, count=1):
+        """Build agents until at least count exist, so the first requests do not pay for building them"""
+        while True:
+            with self._lock:
+                if self._created >= min(count, self.size):
+                    return
+            self._idle.put(self._create())
+
+    def close(self):
+        """Clean up the idle agents, the leased ones are cleaned up when returned, no more leases are served"""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().cleanup()
+            except queue.Empty:
+                return
+
+    @staticmethod
+    def reset(agent):
+        """Clear everything a request leaves behind on an agent"""
+        agent.messages = []
+        agent.state = AgentState()
+        # the metrics object keeps every cycle's durations and traces, start a new one rather than let it grow
+        agent.event_loop_metrics = EventLoopMetrics()
+
+    def stats(self):
+        return {**self._stats, "size": self.size, "created": self._created, "idle": self._idle.qsize()}
+
+    def _create(self):
+        with self._lock:
+            self._created += 1
+        return self.agent_factory()
+
+    def _acquire(self, timeout):
+        self._stats["leases"] += 1
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                # reserve the slot before building outside the lock
+                self._created += 1
+        if can_create:
+            try:
+                return self.agent_factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        self._stats["waits"] += 1
+        wait_start = time.monotonic()
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"no agent became free within {timeout}s") from None
+        finally:
+            self._stats["lease_wait_time"] += time.monotonic() - wait_start
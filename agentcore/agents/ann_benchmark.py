@@ -0,0 +1,144 @@
+"""
+Offline benchmark of the HNSW index (hnsw.py) against the exact search
+
+A synthetic corpus of clustered unit vectors (see quantization_benchmark.py) is indexed with the build parameters
+of the Aurora notebooks' pgvector index (m 16, ef_construction 256), then queried with noisy copies of some of its
+vectors. The benchmark reports:
+
+- build: inserts per second and the size of the graph
+- search: median and 95th percentile latency and recall@k (the share of the exact top k found) for several
+  ef_search, against the exact float32 search
+- persistence: the graph saved and memory-mapped back, the time to open it and whether it answers the same
+- incremental: the graph of most of the corpus updated (rows reordered, some deleted, the rest inserted) against
+  one built from scratch, time and recall
+
+The datasource part indexes the knowledge base documents (kb_ingestion.py) with and without the graph and gives
+the retrieval metrics of chunking_benchmark.py for the labelled queries of kb_eval.json.
+
+USAGE:
+    python ann_benchmark.py
+    python ann_benchmark.py --chunks 100000 --ef-search 20 40 80 --folder /tmp/kb_bench
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from chunking import MarkdownChunker
+from chunking_benchmark import EVAL_FILE, evaluate
+from config import (
+    KB_DATASOURCE_DIR, KB_CHUNK_MAX_TOKENS, KB_CHUNK_OVERLAP_TOKENS, KB_HNSW_M, KB_HNSW_EF_CONSTRUCTION,
+    KB_HNSW_EF_SEARCH,
+)
+from hnsw import HNSWIndex
+from kb_ingestion import sync_local_index
+from local_kb import LocalKnowledgeBase, create_embedder
+from quantization_benchmark import exact_top, measure, synthetic_vectors
+
+
+def noisy_queries(vectors, count, seed=1):
+    """Unit vectors near count rows of vectors, as paraphrases of a chunk's question"""
+    rng = np.random.default_rng(seed)
+    queries = vectors[np.sort(rng.choice(len(vectors), count, replace=False))]
+    queries = queries + rng.standard_normal(queries.shape).astype(np.float32) * (0.5 / vectors.shape[1] ** 0.5)
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+def build(vectors, args):
+    index = HNSWIndex(vectors, args.m, args.ef_construction)
+    started = time.perf_counter()
+    index.add(range(len(vectors)))
+    return index, time.perf_counter() - started
+
+
+def bench_synthetic(args):
+    with tempfile.TemporaryDirectory(dir=args.folder) as folder:
+        vectors = synthetic_vectors(os.path.join(folder, "vectors.npy"), args.chunks, args.dim)
+        queries = noisy_queries(vectors, args.queries)
+        truth = [exact_top(vectors, vector, args.top_k) for vector in queries]
+        print(f"{args.chunks} x {args.dim} vectors, m {args.m}, ef_construction {args.ef_construction}, top {args.top_k}")
+
+        index, seconds = build(vectors, args)
+        graph_bytes = sum(array.nbytes for array in index.arrays().values())
+        print(f"build: {seconds:.1f}s ({args.chunks / seconds:.0f} inserts/s), graph {graph_bytes / 2**20:.1f} MB, "
+              f"{len(index.upper)} chunks on upper layers, {int(index.levels.max()) + 1} layers")
+
+        print(f"{'exact':>14}: {json.dumps(measure(lambda v, k: exact_top(vectors, v, k), queries, truth, args.top_k))}")
+        for ef in args.ef_search:
+            metrics = measure(lambda v, k: index.search(v, k, ef)[0], queries, truth, args.top_k)
+            print(f"{f'ef_search {ef}':>14}: {json.dumps(metrics)}")
+
+        for name, array in index.arrays().items():
+            np.save(os.path.join(folder, name), array)
+        started = time.perf_counter()
+        opened = HNSWIndex.open(folder, index.spec, vectors, args.ef_search[0])
+        seconds = time.perf_counter() - started
+        same = all(
+            np.array_equal(opened.search(vector, args.top_k)[0], index.search(vector, args.top_k, args.ef_search[0])[0])
+            for vector in queries
+        )
+        print(f"persistence: memory-mapped in {seconds * 1000:.1f}ms, same results {same}")
+
+        # the corpus of an update: a tenth of the rows deleted, the rest reordered and a tenth more rows added
+        rng = np.random.default_rng(2)
+        initial = args.chunks * 9 // 10
+        old, _ = build(vectors[:initial], args)
+        kept = np.sort(rng.choice(initial, initial * 9 // 10, replace=False))
+        order = np.concatenate([kept, np.arange(initial, args.chunks)])
+        rng.shuffle(order)
+        updated = np.ascontiguousarray(vectors[order])
+        position = np.full(args.chunks, -1)
+        position[order] = np.arange(len(order))
+        started = time.perf_counter()
+        repaired = old.remap(position[:initial], updated)
+        old.add(range(len(updated)))
+        seconds = time.perf_counter() - started
+        truth = [exact_top(updated, vector, args.top_k) for vector in queries]
+        fresh, fresh_seconds = build(updated, args)
+        recall = {
+            name: measure(lambda v, k: graph.search(v, k, KB_HNSW_EF_SEARCH)[0], queries, truth, args.top_k)[f"recall@{args.top_k}"]
+            for name, graph in (("updated", old), ("rebuilt", fresh))
+        }
+        print(f"incremental (ef_search {KB_HNSW_EF_SEARCH}): {initial - len(kept)} deleted ({repaired} chunks repaired) "
+              f"and {args.chunks - initial} inserted in {seconds:.1f}s, recall@{args.top_k} {recall['updated']}; "
+              f"rebuilt in {fresh_seconds:.1f}s, recall@{args.top_k} {recall['rebuilt']}")
+
+
+def bench_datasource(args):
+    with open(args.eval, encoding="utf-8") as f:
+        queries = json.load(f)
+    embedder = create_embedder("hashing")
+    chunker = MarkdownChunker(KB_CHUNK_MAX_TOKENS, KB_CHUNK_OVERLAP_TOKENS)
+    for hnsw in (None, {"m": args.m, "ef_construction": args.ef_construction}):
+        with tempfile.TemporaryDirectory() as folder:
+            sync_local_index(args.datasource, folder, embedder, chunker, hnsw=hnsw)
+            knowledge_base = LocalKnowledgeBase.open(folder, embedder, ef_search=KB_HNSW_EF_SEARCH)
+            metrics = evaluate(knowledge_base.search, queries, 5)
+            print(f"{'hnsw' if hnsw else 'exact':>8}: {len(knowledge_base.chunks)} chunks, {json.dumps(metrics)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the HNSW index")
+    parser.add_argument("--chunks", type=int, default=20000, help="vectors of the synthetic corpus")
+    parser.add_argument("--dim", type=int, default=1024, help="dimension of the vectors, Titan's by default")
+    parser.add_argument("--queries", type=int, default=100, help="queries of the synthetic corpus")
+    parser.add_argument("--top-k", type=int, default=10, help="rows retrieved per query")
+    parser.add_argument("--m", type=int, default=KB_HNSW_M, help="links per chunk")
+    parser.add_argument("--ef-construction", type=int, default=KB_HNSW_EF_CONSTRUCTION, help="candidates when linking")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 20, KB_HNSW_EF_SEARCH, 80, 160],
+                        help="candidates kept by a search")
+    parser.add_argument("--folder", help="folder of the synthetic corpus files, the temporary folder by default")
+    parser.add_argument("--datasource", default=KB_DATASOURCE_DIR, help="folder of markdown documents")
+    parser.add_argument("--eval", default=EVAL_FILE, help="labelled queries")
+    args = parser.parse_args()
+
+    print("Datasource")
+    bench_datasource(args)
+    print("Synthetic corpus")
+    bench_synthetic(args)
+
+
+if __name__ == "__main__":
+    main()
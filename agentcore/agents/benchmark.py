@@ -0,0 +1,329 @@
+"""
+Offline benchmark of the orchestrator and the sub-agent tools
+
+Runs everything locally, no Bedrock, CoinGecko or GoPlus calls are made:
+
+- the Bedrock model is a StubModel (see stub_model.py) with a fixed time to first token, token rate and token
+  counts, and scripted tool calls, so the security sub-agent calls goplus_token_security and the market sub-agent
+  calls a CoinGecko MCP tool like they do with the real model
+- the CoinGecko MCP sessions run stub_mcp_server.py and GoPlus is stub_goplus_server.py, each with a configurable
+  latency
+- the response cache is disabled (unless --cache), so every request runs its sub-agent
+
+With the model and tool latencies fixed, what is left of the measured latency is the agents' own overhead
+(routing, pooling, strands' event loop, MCP and HTTP clients). The benchmark reports:
+
+- per sub-agent tool: p50/p95/p99 latency of direct calls and the overhead p50 (time not spent in the model or
+  the tools, from tool_metrics)
+- per orchestrator scenario (pre-router on, or every prompt through the orchestrator's model) and number of
+  concurrent sessions: p50/p95/p99 latency and throughput, each session has its own CryptoOrchestrator
+- memory per session, Python heap allocated by a session's orchestrator and requests (tracemalloc)
+
+NOTE the knowledge base sub-agent's retrieve tool would call Bedrock, so the benchmark builds a local index of the
+knowledge base documents (see local_kb.py, with the in-process hashing embedder) in a temporary folder and searches it
+
+USAGE:
+    python benchmark.py
+    python benchmark.py --sessions 1 8 32 --requests 200 --first-token-latency 0.3 --save baseline.json
+
+    # after a change, exit code 1 if any p95 latency or the memory per session is over 20% worse
+    python benchmark.py --sessions 1 8 32 --requests 200 --first-token-latency 0.3 --baseline baseline.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from statistics import median
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def latency_stats(latencies, wall_time=None):
+    stats = {
+        "requests": len(latencies),
+        "p50": round(percentile(latencies, 50), 4),
+        "p95": round(percentile(latencies, 95), 4),
+        "p99": round(percentile(latencies, 99), 4),
+    }
+    if wall_time:
+        stats["throughput"] = round(len(latencies) / wall_time, 2)
+    return stats
+
+
+def prompt(i):
+    """The i-th prompt of the workload, a mix of every sub-agent and multi-intent prompts"""
+    # a new token address each time, so each security request calls the GoPlus stub
+    address = f"0x{i:036x}a1b2"
+    prompts = [
+        "What is a blockchain?",
+        "What is the price of Bitcoin right now?",
+        f"Is token {address} on chain id 1 a honeypot?",
+        "Write me a blog post on productivity tools.",
+        f"What is staking? Also, is {address} on chain id 1 a honeypot?",
+    ]
+    return prompts[i % len(prompts)]
+
+
+def tool_prompts():
+    """One direct prompt per sub-agent tool"""
+    return {
+        "crypto_educator": lambda i: "What is a blockchain?",
+        "crypto_market_analyst": lambda i: "What is the price of Bitcoin right now?",
+        "crypto_security_analyzer": lambda i: f"Is token 0x{i:036x}a1b2 on chain id 1 a honeypot?",
+        "general_knowledge": lambda i: "Write me a blog post on productivity tools.",
+    }
+
+
+def load_agents(args, index_dir):
+    """Start the stubs, build the local knowledge base index in index_dir and import the agents wired to them
+
+    Returns:
+        (orchestration module, pre-router, GoPlus stub server)
+    """
+    # NOTE the stubs must be in place before the agent modules are imported, they read config and get their
+    # model when they are imported
+    from stub_goplus_server import serve
+
+    goplus_server = serve(latency=args.http_latency)
+    os.environ["GOPLUS_API_URL"] = f"http://127.0.0.1:{goplus_server.server_port}/api/v1"
+    os.environ["STUB_MCP_LATENCY"] = str(args.mcp_latency)
+    os.environ["KB_RETRIEVAL_BACKEND"] = "local"
+    os.environ["KB_LOCAL_EMBEDDER"] = "hashing"
+    os.environ["KB_LOCAL_INDEX_DIR"] = index_dir
+    os.environ["KB_REMOTE_FALLBACK"] = "0"
+
+    from mcp import stdio_client, StdioServerParameters
+    from strands.tools.mcp import MCPClient
+    from chunking import MarkdownChunker
+    from config import (
+        INFERENCE_MODEL, REGION, ROUTER_CONFIDENCE_THRESHOLD, KB_DATASOURCE_DIR, KB_CHUNK_MAX_TOKENS,
+        KB_CHUNK_OVERLAP_TOKENS,
+    )
+    from intent_router import ADDRESS_RE, IntentRouter
+    from kb_ingestion import sync_local_index
+    from local_kb import create_embedder
+    from mcp_tool_catalog import MCPToolCatalog
+    from model_registry import set_bedrock_model
+    from stub_model import StubModel
+
+    model = StubModel(
+        first_token_latency=args.first_token_latency,
+        token_latency=args.token_latency,
+        output_tokens=args.output_tokens,
+        tool_inputs={
+            "goplus_token_security": lambda text: {"chain_id": "1", "contract_addresses": ADDRESS_RE.findall(text)},
+            "get_simple_price": {"ids": "bitcoin"},
+            "retrieve": lambda text: {"text": text},
+        },
+    )
+    set_bedrock_model(model, INFERENCE_MODEL, REGION)
+    # the explicit build step of a deploy (python kb_ingestion.py), importing the agents does not build it
+    sync_local_index(KB_DATASOURCE_DIR, index_dir, create_embedder("hashing"),
+                     MarkdownChunker(KB_CHUNK_MAX_TOKENS, KB_CHUNK_OVERLAP_TOKENS))
+    import Strands_Orchestration_Crypto_Agent as orchestration
+    # the orchestrator's model forwards each prompt to the sub-agent the pre-router would pick
+    router = IntentRouter.from_system_prompt(orchestration.CRYPTO_SYSTEM_PROMPT, threshold=ROUTER_CONFIDENCE_THRESHOLD)
+    model.choose_tool = lambda text, names: router.route(text).tool
+    import Strands_Agent_MCP_CoinGecko as coingecko
+    from response_cache import response_cache
+
+    coingecko.coingecko_mcp_pool.client_factory = lambda: MCPClient(
+        lambda: stdio_client(StdioServerParameters(command=sys.executable, args=["stub_mcp_server.py"]))
+    )
+    coingecko.coingecko_mcp_pool.catalog = MCPToolCatalog("stub://coingecko", ttl=None)
+    if not args.cache:
+        response_cache.ttls = {}
+    for sub_agent_tool in orchestration.SUB_AGENT_TOOLS:
+        sub_agent_tool.warm_up()
+    return orchestration, router, goplus_server
+
+
+def bench_tools(orchestration, requests):
+    """Latency of direct sub-agent tool calls, one at a time"""
+    from tool_metrics import track
+
+    prompts = tool_prompts()
+    results = {}
+    for sub_agent_tool in orchestration.SUB_AGENT_TOOLS:
+        latencies, overheads = [], []
+        for i in range(requests):
+            with track() as tool_calls:
+                start = time.perf_counter()
+                sub_agent_tool(prompts[sub_agent_tool.tool_name](i))
+                latencies.append(time.perf_counter() - start)
+            overheads.append(tool_calls.report()[sub_agent_tool.tool_name]["other_time"])
+        results[sub_agent_tool.tool_name] = {**latency_stats(latencies), "overhead_p50": round(median(overheads), 4)}
+    return results
+
+
+def new_session(orchestration, router=None):
+    """A session's orchestrator, like one AgentCore runtime session"""
+    return orchestration.CryptoOrchestrator(
+        orchestration.SUB_AGENT_TOOLS,
+        router=router,
+        fan_out=orchestration.FAN_OUT_ENABLED,
+        branch_timeout=orchestration.FAN_OUT_BRANCH_TIMEOUT,
+        fan_out_pool=orchestration.fan_out_pool,
+    )
+
+
+def run_sessions(sessions, requests):
+    """Send requests across the sessions, each session sends its prompts one after the other
+
+    Returns:
+        (latencies, errors, wall time)
+    """
+    per_session = max(1, requests // len(sessions))
+
+    def run(index):
+        latencies, errors = [], 0
+        for i in range(per_session):
+            start = time.perf_counter()
+            try:
+                sessions[index].query(prompt(index * per_session + i))
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+        return latencies, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(len(sessions)) as executor:
+        outcomes = list(executor.map(run, range(len(sessions))))
+    wall_time = time.perf_counter() - start
+    return [l for latencies, _ in outcomes for l in latencies], sum(errors for _, errors in outcomes), wall_time
+
+
+def bench_orchestrator(orchestration, session_counts, requests, router=None):
+    """Latency and throughput of the orchestrator at each number of concurrent sessions"""
+    results = {}
+    for count in session_counts:
+        sessions = [new_session(orchestration, router) for _ in range(count)]
+        latencies, errors, wall_time = run_sessions(sessions, requests)
+        results[str(count)] = {**latency_stats(latencies, wall_time), "errors": errors}
+    return results
+
+
+def bench_memory(orchestration, router, count):
+    """Python heap per session, for count sessions that have each answered one of every prompt"""
+    # a first round fills the shared pools and caches, so they are not counted as per session memory
+    run_sessions([new_session(orchestration, router) for _ in range(count)], count * 5)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = [new_session(orchestration, router) for _ in range(count)]
+    run_sessions(sessions, count * 5)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "sessions": count,
+        "kb_per_session": round((current - before) / count / 1024, 1),
+        "peak_kb_per_session": round((peak - before) / count / 1024, 1),
+    }
+
+
+def regressions(results, baseline, tolerance):
+    """Metrics that are more than tolerance worse than in the baseline results"""
+    found = []
+    pairs = [(f"tools.{name}", stats, baseline.get("tools", {}).get(name)) for name, stats in results["tools"].items()]
+    for scenario in ("router", "llm"):
+        for count, stats in results[scenario].items():
+            pairs.append((f"{scenario}.{count} sessions", stats, baseline.get(scenario, {}).get(count)))
+    for name, stats, old in pairs:
+        if old and stats["p95"] > old["p95"] * (1 + tolerance):
+            found.append(f"{name} p95 {old['p95']}s -> {stats['p95']}s")
+    old_memory = baseline.get("memory", {}).get("kb_per_session")
+    if old_memory and results["memory"]["kb_per_session"] > old_memory * (1 + tolerance):
+        found.append(f"memory per session {old_memory}KB -> {results['memory']['kb_per_session']}KB")
+    return found
+
+
+def print_results(results):
+    print(f"\nStub model: {results['settings']}")
+    print(f"\n{'sub-agent tool':<32}{'p50':>9}{'p95':>9}{'p99':>9}{'overhead p50':>14}")
+    for name, stats in results["tools"].items():
+        print(f"{name:<32}{stats['p50']:>8.3f}s{stats['p95']:>8.3f}s{stats['p99']:>8.3f}s{stats['overhead_p50']:>13.4f}s")
+    for scenario, title in (("router", "orchestrator, pre-router on"), ("llm", "orchestrator, all via its model")):
+        print(f"\n{title:<32}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>9}{'errors':>8}")
+        for count, stats in results[scenario].items():
+            label = f"{count} sessions"
+            print(f"{label:<32}{stats['p50']:>8.3f}s{stats['p95']:>8.3f}s{stats['p99']:>8.3f}s"
+                  f"{stats['throughput']:>9.1f}{stats['errors']:>8}")
+    memory = results["memory"]
+    print(f"\nMemory per session ({memory['sessions']} sessions): {memory['kb_per_session']}KB, "
+          f"peak {memory['peak_kb_per_session']}KB")
+
+
+def run_benchmarks(args):
+    """Run every benchmark, returns the results dict"""
+    index_dir = tempfile.TemporaryDirectory()
+    orchestration, router, goplus_server = load_agents(args, index_dir.name)
+    try:
+        return {
+            "settings": {
+                "first_token_latency": args.first_token_latency,
+                "token_latency": args.token_latency,
+                "output_tokens": args.output_tokens,
+                "mcp_latency": args.mcp_latency,
+                "http_latency": args.http_latency,
+            },
+            "tools": bench_tools(orchestration, args.requests),
+            "router": bench_orchestrator(orchestration, args.sessions, args.requests, router),
+            "llm": bench_orchestrator(orchestration, args.sessions, args.requests),
+            "memory": bench_memory(orchestration, router, max(args.sessions)),
+        }
+    finally:
+        # the pooled MCP sessions, agents and threads are released as the runtime would, a leaked thread hangs
+        # the exit instead of going unnoticed
+        orchestration.shutdown()
+        goplus_server.shutdown()
+        index_dir.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the orchestrator and sub-agent tools")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 8], help="concurrent sessions to test")
+    parser.add_argument("--requests", type=int, default=50, help="requests per tool and per session count")
+    parser.add_argument("--first-token-latency", type=float, default=0.05, help="seconds per stub model call")
+    parser.add_argument("--token-latency", type=float, default=0.001, help="seconds per stub output token")
+    parser.add_argument("--output-tokens", type=int, default=50, help="tokens per stub model answer")
+    parser.add_argument("--mcp-latency", type=float, default=0.01, help="seconds per MCP stub tool call")
+    parser.add_argument("--http-latency", type=float, default=0.01, help="seconds per GoPlus stub request")
+    parser.add_argument("--cache", action="store_true", help="keep the response cache enabled")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="results JSON to compare with, exit code 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs the baseline, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    # the agents print their answers and tool calls as they stream, keep them out of the report
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        results = run_benchmarks(args)
+    print_results(results)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        print(f"\nRegressions vs {args.baseline}: {found or 'none'}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
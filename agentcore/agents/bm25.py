@@ -0,0 +1,200 @@
+"""
+BM25 keyword index and rank fusion for the local knowledge base
+
+Embeddings match meaning but blur exact terms: a query for a ticker ("USDT", "STM") or a term of art ("rug pull",
+"hard cap") can rank chunks that merely talk about similar things above the one chunk naming it. BM25 scores the
+query's terms themselves, weighted by how rare they are in the corpus, so the two rankings complement each other.
+
+- BM25Index: in-memory inverted index of term -> (rows, term frequencies), built from the chunk texts when the
+  knowledge base is opened; a search only touches the postings of the query's terms
+- reciprocal_rank_fusion(): merges rankings by rank rather than by score, so cosine similarities and BM25 scores
+  (on unrelated scales) need no calibration; a ranking can be weighted, eg the keyword ranking of a query naming
+  an exact term (has_exact_term(), a ticker or acronym like "USDT" or a short query like "DEX Screener")
+- rerank(): orders the fused candidates by how much of the query each covers, in order and close together, and
+  by how much of it their heading covers
+
+USAGE:
+    index = BM25Index(["Locked liquidity means ...", "The maximum supply or Hard Cap ..."])
+    rows, scores = index.search("what is a hard cap", top_k=5)
+    fused = reciprocal_rank_fusion([vector_rows, rows])  # [(row, score), ...] best first
+"""
+
+import math
+import re
+from functools import lru_cache
+import numpy as np
+from intent_router import STOP_WORDS, TOKEN_RE
+
+# damping of the top ranks in reciprocal rank fusion, 60 as in the original RRF paper
+RRF_K = 60
+# weight of the keyword ranking in the fusion for a query naming an exact term, it then mostly decides the order and
+# the vector ranking breaks its ties (measured with the hashing embedder only, see retrieval_benchmark.py)
+EXACT_TERM_WEIGHT = 10
+# queries of at most this many terms are a term themselves, eg "Proof of Stake"
+EXACT_TERM_MAX_TERMS = 3
+# a ticker or acronym as written in the query, eg "USDT", "ERC-20" or "ETFs"
+ACRONYM_RE = re.compile(r"\b[A-Z][A-Z0-9]+(?:-[0-9]+)?s?\b")
+
+
+@lru_cache(maxsize=65536)
+def _term(word):
+    """The term of a lowercase word, None for a stop word"""
+    if word in STOP_WORDS:
+        return None
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def terms(text):
+    """Lowercase words of text without stop words, plurals folded onto the singular ("scams" -> "scam")"""
+    return [term for term in map(_term, TOKEN_RE.findall(text.lower())) if term is not None]
+
+
+class BM25Index:
+    """Okapi BM25 over a list of texts"""
+
+    def __init__(self, texts, k1=1.2, b=0.75):
+        """
+        Args:
+            texts: The documents (chunks), a row per text
+            k1: Term frequency saturation, a term's score grows less with every further occurrence
+            b: Length normalization, 0 for none, 1 for scores proportional to the inverse of the length
+        """
+        self.k1 = k1
+        self.b = b
+        self.size = len(texts)
+        postings = {}
+        lengths = np.zeros(self.size, dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = terms(text)
+            lengths[row] = len(words)
+            counts = {}
+            for word in words:
+                counts[word] = counts.get(word, 0) + 1
+            for word, count in counts.items():
+                postings.setdefault(word, ([], []))
+                postings[word][0].append(row)
+                postings[word][1].append(count)
+        average = float(lengths.mean()) if self.size else 0.0
+        # the length part of the BM25 denominator, per row, computed once
+        self._norms = k1 * (1 - b + b * lengths / average) if average else np.full(self.size, k1, dtype=np.float32)
+        self._postings = {
+            word: (np.array(rows, dtype=np.int32), np.array(counts, dtype=np.float32), self._idf(len(rows)))
+            for word, (rows, counts) in postings.items()
+        }
+
+    def _idf(self, document_frequency):
+        # the "plus one" variant, never negative for terms in most of the rows
+        return math.log(1 + (self.size - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def scores(self, query, rows=None):
+        """BM25 score of every row for query, 0 for rows without any of its terms
+
+        Args:
+            query: The query text
+            rows: Optional sorted array of the rows to score, the others get 0
+        """
+        scores = np.zeros(self.size, dtype=np.float32)
+        # a term repeated in the query counts once
+        for word in set(terms(query)):
+            posting = self._postings.get(word)
+            if posting is None:
+                continue
+            posting_rows, counts, idf = posting
+            if rows is not None:
+                keep = np.isin(posting_rows, rows, assume_unique=True)
+                posting_rows, counts = posting_rows[keep], counts[keep]
+            scores[posting_rows] += idf * counts * (self.k1 + 1) / (counts + self._norms[posting_rows])
+        return scores
+
+    def search(self, query, top_k=10, rows=None):
+        """The top_k rows by BM25 score and their scores, best first, only rows with a query term
+
+        Returns:
+            (rows, scores) arrays
+        """
+        scores = self.scores(query, rows)
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return matched, scores[matched]
+        top_k = min(top_k, len(matched))
+        top = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return top, scores[top]
+
+    def __contains__(self, word):
+        """Whether a term (as given by terms()) is in any row"""
+        return word in self._postings
+
+    def idf(self, word):
+        """Inverse document frequency of a term (as given by terms()), that of a term in no row if unknown"""
+        posting = self._postings.get(word)
+        return posting[2] if posting is not None else self._idf(0)
+
+
+def has_exact_term(query, index):
+    """Whether the query names an exact term of the index, a ticker or acronym, or is a short term itself"""
+    query_terms = terms(query)
+    if 0 < len(query_terms) <= EXACT_TERM_MAX_TERMS:
+        return True
+    return any(term in index for word in ACRONYM_RE.findall(query) for term in terms(word))
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K, weights=None):
+    """Fuse rankings (lists of rows, best first) by summing weight / (k + rank) over the rankings of each row
+
+    Args:
+        rankings: Lists or arrays of rows
+        k: Damping of the top ranks, a row ranked first gets weight / (k + 1)
+        weights: Optional weight of each ranking, 1 for all by default
+
+    Returns:
+        [(row, score), ...] best first
+    """
+    fused = {}
+    for ranking, weight in zip(rankings, weights or [1.0] * len(rankings)):
+        for rank, row in enumerate(ranking, 1):
+            row = int(row)
+            fused[row] = fused.get(row, 0.0) + weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])
+
+
+def rerank(query, texts, index, window=12):
+    """Lexical re-ranking scores of candidate texts for query, from 0 to 2
+
+    A text scores the share of the query's term weight (IDF) it contains, plus bonuses for the query's consecutive
+    term pairs it contains within a few words of each other, in order, and for the share of the query's term weight
+    in its first line, the heading path of a chunk (see chunking.py). So a passage of the "Cloud Mining Scams" section
+    beats one that mentions mining and scams in different paragraphs for "how do cloud mining scams work".
+
+    Args:
+        query: The query text
+        texts: The candidates' texts
+        index: The BM25Index the IDF comes from
+        window: Most words between the two terms of a pair
+
+    Returns:
+        A list of scores, one per text
+    """
+    query_terms = list(dict.fromkeys(terms(query)))
+    if not query_terms:
+        return [0.0] * len(texts)
+    weights = {word: index.idf(word) for word in query_terms}
+    total = sum(weights.values())
+    pairs = list(zip(query_terms, query_terms[1:]))
+    results = []
+    for text in texts:
+        positions = {}
+        for position, word in enumerate(terms(text)):
+            if word in weights:
+                positions.setdefault(word, []).append(position)
+        coverage = sum(weights[word] for word in positions) / total
+        near = sum(
+            1 for a, b in pairs
+            if a in positions and b in positions
+            and any(0 < pb - pa <= window for pa in positions[a] for pb in positions[b])
+        )
+        heading = sum(weights[word] for word in set(terms(text.split("\n", 1)[0])) if word in weights) / total
+        results.append(coverage + (0.5 * near / len(pairs) if pairs else 0.0) + 0.5 * heading)
+    return results
@@ -0,0 +1,88 @@
+"""
+Threads running the parts (branches) of fanned out multi-intent prompts
+
+A branch that outlives its request's timeout cannot be stopped: Python threads cannot be killed, and
+Future.cancel() only cancels a branch still queued. A plain ThreadPoolExecutor shared by every session then fills
+up with abandoned branches, and later fan-outs queue behind work whose answers will be dropped. BranchPool counts
+every branch against its workers until the branch actually finishes, abandoned or not, and only accepts a fan-out
+when all its branches can start at once. A fan-out it refuses is answered the usual way instead (the LLM
+orchestrator), so a request never waits on another request's abandoned work.
+
+USAGE:
+    pool = BranchPool(max_workers=16)
+    futures = pool.try_submit([lambda: tool_a(text), lambda: tool_b(text)])
+    if futures is None:
+        ...  # not enough free workers, answer without fanning out
+    done, not_done = wait(futures, timeout=60)
+    pool.abandon(not_done)  # still counted until they finish
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BranchPool:
+    """Runs batches of branches that all start at once, or not at all"""
+
+    def __init__(self, max_workers=16, thread_name_prefix="fan-out"):
+        """
+        Args:
+            max_workers: Threads, ie branches running at once, abandoned ones included
+            thread_name_prefix: Name prefix of the threads
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix=thread_name_prefix)
+        self._lock = threading.Lock()
+        self._running = 0
+        self._abandoned = set()
+        self._stats = {"batches": 0, "refused": 0, "abandoned": 0}
+
+    def try_submit(self, calls):
+        """Start every call (a callable without arguments) on its own thread
+
+        Returns:
+            A Future per call, or None (and nothing is started) when fewer than len(calls) threads are free
+        """
+        with self._lock:
+            if self._running + len(calls) > self.max_workers:
+                self._stats["refused"] += 1
+                return None
+            self._running += len(calls)
+            self._stats["batches"] += 1
+        return [self._executor.submit(self._run, call) for call in calls]
+
+    def abandon(self, futures):
+        """Mark branches whose request stopped waiting, they keep their thread until they finish"""
+        for future in futures:
+            # a branch still queued is cancelled, its _run never starts so its slot is released here
+            if future.cancel():
+                self._finished()
+                continue
+            with self._lock:
+                self._abandoned.add(future)
+                self._stats["abandoned"] += 1
+            future.add_done_callback(self._discard)
+
+    def stats(self):
+        """Branches running (abandoned ones included) and counts since start"""
+        with self._lock:
+            return {"running": self._running, "abandoned_running": len(self._abandoned), **self._stats}
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, call):
+        try:
+            return call()
+        finally:
+            self._finished()
+
+    def _finished(self):
+        with self._lock:
+            self._running -= 1
+
+    def _discard(self, future):
+        with self._lock:
+            self._abandoned.discard(future)
@@ -0,0 +1,235 @@
+"""
+Structure-aware chunking of the knowledge base's markdown documents
+
+The Bedrock Knowledge Bases use FIXED_SIZE chunking (300 tokens, 20% overlap), which cuts through sections, lists
+and sentences, and the lab's S3 Vectors ingestion embeds each whole document as one vector, which is truncated for
+long documents and hands the agent far more text than the answer needs. MarkdownChunker instead:
+
+- splits on headings and keeps the heading path (eg "Types of Cryptocurrency Scams > Phishing") at the top of
+  every chunk of the section, so a chunk says what it is about
+- packs whole blocks (paragraphs, lists, code) into chunks of at most max_tokens, a block too long on its own is
+  split on its rows (a table) or items (a list) or else on sentences, and what is still too long on words
+- starts each further chunk of a section with the last sentences of the previous one, up to overlap_tokens
+- carries the document's metadata (its .metadata.json attributes) onto every chunk
+
+It reads a document line by line and yields each chunk as soon as its section is done, so memory is bounded by
+one section, whatever the corpus size (chunk_documents() streams any number of documents).
+
+Tokens are counted as words and runs of punctuation marks, close to what an embedding model's tokenizer counts for
+English text without loading one.
+
+USAGE:
+    chunker = MarkdownChunker(max_tokens=300, overlap_tokens=45)
+    for chunk in chunker.chunk(text, metadata={"level": "beginner"}):
+        print(chunk.headings, chunk.tokens, chunk.text)
+"""
+
+import re
+from collections import namedtuple
+
+# text includes the heading path, headings is the path as a tuple, tokens the count of text
+Chunk = namedtuple("Chunk", ["text", "headings", "tokens", "metadata"])
+
+TOKEN_RE = re.compile(r"\w+|[^\w\s]+")
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+FENCE_RE = re.compile(r"^\s*(```|~~~)")
+LIST_ITEM_RE = re.compile(r"^\s*([-*+]|\d+[.)])\s+")
+TABLE_ROW_RE = re.compile(r"^\s*\|")
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+(?=\S)")
+
+
+def count_tokens(text):
+    """Approximate tokens of text, its words and runs of punctuation (eg "---" of a table)"""
+    return len(TOKEN_RE.findall(text))
+
+
+def markdown_blocks(lines):
+    """Blocks of markdown lines, as ("heading", level, text) or ("block", None, text)
+
+    A block is a paragraph, a list (its items and their continuation lines) or a fenced code block.
+    """
+    block, fence = [], None
+    for line in lines:
+        line = line.rstrip("\n")
+        if fence is not None:
+            block.append(line)
+            if line.strip().startswith(fence):
+                yield "block", None, "\n".join(block)
+                block, fence = [], None
+            continue
+        fence_match = FENCE_RE.match(line)
+        heading = HEADING_RE.match(line)
+        if fence_match or heading or not line.strip():
+            if block:
+                yield "block", None, "\n".join(block).strip()
+                block = []
+            if fence_match:
+                fence = fence_match.group(1)
+                block.append(line)
+            elif heading:
+                yield "heading", len(heading.group(1)), heading.group(2)
+            continue
+        # a list item after a paragraph line starts a new block, items of one list stay together
+        if block and LIST_ITEM_RE.match(line) and not LIST_ITEM_RE.match(block[0]):
+            yield "block", None, "\n".join(block).strip()
+            block = []
+        block.append(line)
+    if block:
+        yield "block", None, "\n".join(block).strip()
+
+
+class MarkdownChunker:
+    """Splits markdown on headings and blocks into chunks of at most max_tokens, with overlap inside a section"""
+
+    def __init__(self, max_tokens=300, overlap_tokens=45):
+        """
+        Args:
+            max_tokens: Most tokens per chunk, heading path included
+            overlap_tokens: Tokens of the previous chunk's last sentences repeated at the start of the next chunk
+                            of the same section, 0 for none
+        """
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    @property
+    def name(self):
+        """Identifies the chunking, chunks of another name must be embedded again"""
+        return f"markdown-{self.max_tokens}-{self.overlap_tokens}"
+
+    def chunk(self, text, metadata=None):
+        """Chunks of a markdown document, see chunk_lines()"""
+        return self.chunk_lines(text.splitlines(), metadata)
+
+    def chunk_lines(self, lines, metadata=None):
+        """Chunks of a markdown document given as lines (eg an open file), yielded section by section
+
+        Args:
+            lines: Iterable of the document's lines
+            metadata: Optional dict carried onto every chunk
+
+        Yields:
+            Chunk
+        """
+        metadata = dict(metadata or {})
+        headings, blocks = [], []
+        for kind, level, text in markdown_blocks(lines):
+            if kind == "heading":
+                yield from self._section(headings, blocks, metadata)
+                # a heading replaces those of its level and below
+                headings = [h for h in headings if h[0] < level] + [(level, text)]
+                blocks = []
+            else:
+                blocks.append(text)
+        yield from self._section(headings, blocks, metadata)
+
+    def _section(self, headings, blocks, metadata):
+        if not blocks:
+            return
+        path = tuple(text for _, text in headings)
+        prefix = " > ".join(path)
+        prefix_tokens = count_tokens(prefix)
+        if self.max_tokens - prefix_tokens < self.max_tokens // 4:
+            # a very long heading path, keep only the section's own heading
+            prefix = path[-1]
+            prefix_tokens = count_tokens(prefix)
+        budget = max(self.max_tokens - prefix_tokens, self.max_tokens // 4)
+
+        # NOTE tokens never span whitespace, so the count of a chunk is the sum of the counts of its parts
+        for body, tokens in self._pack(blocks, budget):
+            yield Chunk(f"{prefix}\n{body}" if prefix else body, path, prefix_tokens + tokens, metadata)
+
+    def _pack(self, blocks, budget):
+        """(body, tokens) of at most budget tokens from whole blocks, or sentences and words of the blocks too long"""
+        pieces = []  # (text, tokens, separator before it)
+        for block in blocks:
+            tokens = count_tokens(block)
+            if tokens <= budget:
+                pieces.append((block, tokens, "\n\n"))
+                continue
+            for i, (piece, separator) in enumerate(self._split(block, budget)):
+                pieces.append((piece, count_tokens(piece), "\n\n" if i == 0 else separator))
+
+        current, used = [], 0
+        for piece in pieces:
+            if current and used + piece[1] > budget:
+                yield self._join(current), used
+                current = self._overlap(current, budget - piece[1])
+                used = sum(p[1] for p in current)
+            current.append(piece)
+            used += piece[1]
+        if current:
+            yield self._join(current), used
+
+    def _split(self, block, budget):
+        """(piece, separator) of a block, its rows, items or sentences, those longer than budget split into words"""
+        if TABLE_ROW_RE.match(block) or LIST_ITEM_RE.match(block):
+            # one item per line, or an item and its continuation lines
+            lines = block.split("\n")
+            items = [lines[0]]
+            for line in lines[1:]:
+                if TABLE_ROW_RE.match(line) or LIST_ITEM_RE.match(line):
+                    items.append(line)
+                else:
+                    items[-1] += "\n" + line
+            separator = "\n"
+        else:
+            items, separator = SENTENCE_END_RE.split(block), " "
+        for sentence in items:
+            if count_tokens(sentence) <= budget:
+                yield sentence, separator
+                continue
+            words, run, used = sentence.split(), [], 0
+            for word in words:
+                tokens = count_tokens(word)
+                if run and used + tokens > budget:
+                    yield " ".join(run), " "
+                    run, used = [], 0
+                run.append(word)
+                used += tokens
+            if run:
+                yield " ".join(run), " "
+
+    def _overlap(self, pieces, room):
+        """Last sentences of the previous chunk's pieces, up to overlap_tokens and the room left for the next piece"""
+        limit = min(self.overlap_tokens, room)
+        if limit <= 0:
+            return []
+        sentences = [s for text, _, _ in pieces for s in SENTENCE_END_RE.split(text)]
+        overlap, used = [], 0
+        for sentence in reversed(sentences):
+            tokens = count_tokens(sentence)
+            if used + tokens > limit:
+                break
+            overlap.insert(0, sentence)
+            used += tokens
+        return [(" ".join(overlap), used, "\n\n")] if overlap else []
+
+    @staticmethod
+    def _join(pieces):
+        text = pieces[0][0]
+        for piece, _, separator in pieces[1:]:
+            text += separator + piece
+        return text
+
+
+def chunk_documents(documents, chunker):
+    """Stream (document name, chunk) pairs from an iterable of (document name, lines or text, metadata)"""
+    for document, content, metadata in documents:
+        lines = content.splitlines() if isinstance(content, str) else content
+        for chunk in chunker.chunk_lines(lines, metadata):
+            yield document, chunk
+
+
+def fixed_size_chunks(text, max_tokens=300, overlap_percentage=20):
+    """Chunks of max_tokens consecutive tokens overlapping by overlap_percentage, like Bedrock's FIXED_SIZE"""
+    spans = [match.span() for match in TOKEN_RE.finditer(text)]
+    step = max(1, max_tokens - max_tokens * overlap_percentage // 100)
+    chunks = []
+    for start in range(0, len(spans), step):
+        window = spans[start:start + max_tokens]
+        chunks.append(text[window[0][0]:window[-1][1]])
+        if start + max_tokens >= len(spans):
+            break
+    return chunks
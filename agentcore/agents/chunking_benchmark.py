@@ -0,0 +1,172 @@
+"""
+Offline benchmark of the knowledge base chunking: retrieval quality, context size and chunking throughput
+
+Each chunking of the datasource is embedded into an in-memory LocalKnowledgeBase and searched with the labelled
+queries of kb_eval.json (a query, the document answering it, phrases of the answer and an optional type, "term" for
+queries naming an exact term). A retrieved chunk is relevant when it contains an answer phrase. Per chunking the
+benchmark reports:
+
+- hit@1 and hit@k: queries with a relevant chunk first, or in the top k
+- MRR: mean reciprocal rank of the first relevant chunk
+- precision@k: share of the chunks returned (at most k) that are relevant
+- tokens to answer: tokens of the chunks up to and including the first relevant one (queries answered only), the
+  context the agent reads before the answer
+- context tokens: tokens of the chunks returned, what every retrieve call adds to the agent's prompt
+
+The chunkings compared are MarkdownChunker (chunking.py, what kb_ingestion.py indexes), the Bedrock Knowledge
+Bases' FIXED_SIZE chunking of the notebooks (300 tokens, 20% overlap) and one chunk per document (the lab's
+S3 Vectors ingestion).
+
+The throughput part streams a corpus of copies of the datasource through the chunker, reading each file line by
+line, and reports chunks/s and the peak Python heap (tracemalloc), which stays that of one section whatever the
+number of copies.
+
+USAGE:
+    python chunking_benchmark.py
+    python chunking_benchmark.py --top-k 3 --copies 500 --embedder bedrock
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import time
+import tracemalloc
+import numpy as np
+from chunking import MarkdownChunker, chunk_documents, count_tokens, fixed_size_chunks
+from config import KB_DATASOURCE_DIR, KB_CHUNK_MAX_TOKENS, KB_CHUNK_OVERLAP_TOKENS, REGION
+from local_kb import LocalKnowledgeBase, create_embedder
+
+EVAL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kb_eval.json")
+
+
+def read_datasource(datasource_dir):
+    """(document name, text, metadata attributes) of each markdown document"""
+    for path in sorted(glob.glob(os.path.join(datasource_dir, "*.md"))):
+        metadata = {}
+        if os.path.exists(f"{path}.metadata.json"):
+            with open(f"{path}.metadata.json", encoding="utf-8") as f:
+                metadata = json.load(f).get("metadataAttributes", {})
+        with open(path, encoding="utf-8") as f:
+            yield os.path.basename(path), f.read(), metadata
+
+
+def chunkings(max_tokens, overlap_tokens):
+    """Name -> function of (text, metadata) returning the chunk texts"""
+    chunker = MarkdownChunker(max_tokens, overlap_tokens)
+    return {
+        f"markdown ({max_tokens} tokens, {overlap_tokens} overlap)":
+            lambda text, metadata: [chunk.text for chunk in chunker.chunk(text, metadata)],
+        f"fixed size ({max_tokens} tokens, 20% overlap)":
+            lambda text, metadata: fixed_size_chunks(text, max_tokens, 20),
+        "whole document": lambda text, metadata: [text],
+    }
+
+
+def normalize(text):
+    return re.sub(r"\s+", " ", text).lower()
+
+
+def build(documents, chunk, embedder):
+    """An in-memory LocalKnowledgeBase of the documents chunked by chunk"""
+    chunks = [
+        {"document": document, "text": text, "metadata": metadata}
+        for document, content, metadata in documents for text in chunk(content, metadata)
+    ]
+    vectors = np.concatenate([embedder.embed([c["text"] for c in chunks[i:i + 64]]) for i in range(0, len(chunks), 64)])
+    return LocalKnowledgeBase(vectors, chunks, embedder)
+
+
+def evaluate(search, queries, top_k):
+    """Retrieval metrics of search, a function of (query text, top_k) returning hits, over the labelled queries"""
+    hits_1 = hits_k = reciprocal = relevant = returned = 0
+    answer_tokens, context_tokens = [], []
+    for query in queries:
+        answers = [normalize(answer) for answer in query["answers"]]
+        hits = search(query["query"], top_k)
+        ranks = [
+            rank for rank, hit in enumerate(hits, 1)
+            if hit.document == query["document"] and any(answer in normalize(hit.text) for answer in answers)
+        ]
+        relevant += len(ranks)
+        returned += len(hits)
+        context_tokens.append(sum(count_tokens(hit.text) for hit in hits))
+        if ranks:
+            hits_1 += ranks[0] == 1
+            hits_k += 1
+            reciprocal += 1 / ranks[0]
+            answer_tokens.append(sum(count_tokens(hit.text) for hit in hits[:ranks[0]]))
+    return {
+        "hit@1": round(hits_1 / len(queries), 3),
+        f"hit@{top_k}": round(hits_k / len(queries), 3),
+        "mrr": round(reciprocal / len(queries), 3),
+        f"precision@{top_k}": round(relevant / returned, 3) if returned else 0.0,
+        "tokens_to_answer": round(float(np.mean(answer_tokens)), 1) if answer_tokens else None,
+        "context_tokens": round(float(np.mean(context_tokens)), 1),
+    }
+
+
+def bench_throughput(datasource_dir, chunker, copies):
+    """Chunks per second and peak heap when streaming copies of the datasource through the chunker"""
+    paths = sorted(glob.glob(os.path.join(datasource_dir, "*.md")))
+    corpus_bytes = copies * sum(os.path.getsize(path) for path in paths)
+
+    def documents():
+        for copy in range(copies):
+            for path in paths:
+                # a file object is an iterator of lines, the chunker never holds the whole document
+                with open(path, encoding="utf-8") as f:
+                    yield f"{copy}/{os.path.basename(path)}", f, {}
+
+    started = time.perf_counter()
+    chunks = sum(1 for _ in chunk_documents(documents(), chunker))
+    seconds = time.perf_counter() - started
+    # a second pass for the memory, tracing slows the chunking down
+    tracemalloc.start()
+    for _ in chunk_documents(documents(), chunker):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "documents": copies * len(paths),
+        "corpus_mb": round(corpus_bytes / 2 ** 20, 1),
+        "chunks": chunks,
+        "chunks_per_second": round(chunks / seconds),
+        "mb_per_second": round(corpus_bytes / 2 ** 20 / seconds, 1),
+        "peak_heap_kb": round(peak / 1024),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the knowledge base chunking")
+    parser.add_argument("--datasource", default=KB_DATASOURCE_DIR, help="folder of markdown documents")
+    parser.add_argument("--eval", default=EVAL_FILE, help="labelled queries")
+    parser.add_argument("--top-k", type=int, default=5, help="chunks retrieved per query")
+    parser.add_argument("--max-tokens", type=int, default=KB_CHUNK_MAX_TOKENS)
+    parser.add_argument("--overlap-tokens", type=int, default=KB_CHUNK_OVERLAP_TOKENS)
+    parser.add_argument("--embedder", choices=["hashing", "bedrock"], default="hashing")
+    parser.add_argument("--copies", type=int, nargs="+", default=[10, 100], help="datasource copies for the throughput")
+    args = parser.parse_args()
+
+    with open(args.eval, encoding="utf-8") as f:
+        queries = json.load(f)
+    documents = list(read_datasource(args.datasource))
+    embedder = create_embedder(args.embedder, REGION)
+    print(f"{len(queries)} queries over {len(documents)} documents, {embedder.name} embeddings, top {args.top_k}")
+    for name, chunk in chunkings(args.max_tokens, args.overlap_tokens).items():
+        knowledge_base = build(documents, chunk, embedder)
+        results = {
+            "chunks": len(knowledge_base.chunks),
+            "tokens_per_chunk": round(float(np.mean([count_tokens(c["text"]) for c in knowledge_base.chunks])), 1),
+            **evaluate(knowledge_base.search, queries, args.top_k),
+        }
+        print(f"{name:>36}: {json.dumps(results)}")
+
+    chunker = MarkdownChunker(args.max_tokens, args.overlap_tokens)
+    for copies in args.copies:
+        print(f"{'streaming ' + chunker.name:>36}: {json.dumps(bench_throughput(args.datasource, chunker, copies))}")
+
+
+if __name__ == "__main__":
+    main()
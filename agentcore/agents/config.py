@@ -1,3 +1,4 @@
+import os
 import warnings
 # ===== MODEL SELECTION STRATEGY PER AGENT =====
 # Different agents perform distinct tasks, each with unique requirements.
@@ -40,6 +41,197 @@ INFERENCE_MODEL = "amazon.nova-pro-v1:0"
 # AWS region
 REGION = "us-east-1"
 
+# ===== BEDROCK CLIENT =====
+# All agents share one BedrockModel per model and one boto3 client per region (see model_registry.py)
+# Connections the shared client keeps open to Bedrock, enough for every pooled sub-agent to call at once
+BEDROCK_MAX_POOL_CONNECTIONS = 64
+# Seconds to open a connection to Bedrock
+BEDROCK_CONNECT_TIMEOUT = 5
+# Seconds to wait for data from a (streaming) model call
+BEDROCK_READ_TIMEOUT = 120
+# Retries of a failed model call (after the first attempt), adaptive retries back off when Bedrock throttles
+BEDROCK_MAX_RETRIES = 4
+
+# ===== MCP SESSION POOL =====
+# CoinGecko MCP sessions are opened once when the container boots and leased per request
+# Number of sessions (npx mcp-remote processes) kept open, ie concurrent market data queries
+MCP_POOL_SIZE = 2
+# Seconds an unused session is kept before it is recycled in the background
+MCP_POOL_IDLE_TIMEOUT = 300
+# Seconds between background health checks (dead sessions are reconnected)
+MCP_POOL_HEALTH_CHECK_INTERVAL = 30
+# Seconds a request waits for a free session before failing
+MCP_POOL_LEASE_TIMEOUT = 30
+# Seconds the cached MCP tool catalog is used before the tools are listed from the server again
+MCP_TOOL_CATALOG_TTL = 3600
+# Folder for on-disk tool catalog snapshots (keyed by server URL), None to only cache in memory
+# a snapshot lets a cold container build the agent's tools without listing them from the remote server
+MCP_TOOL_CATALOG_DIR = ".mcp_tool_catalog"
+
+# ===== SUB-AGENT POOLS =====
+# Each sub-agent tool leases a pre-built agent per request, so concurrent sessions never share history
+# Maximum agents per sub-agent, ie concurrent requests each sub-agent can serve
+SUB_AGENT_POOL_SIZE = 8
+# Seconds a request waits for a free sub-agent before failing
+SUB_AGENT_POOL_LEASE_TIMEOUT = 60
+
+# ===== STARTUP =====
+# Import and build each sub-agent on first use instead of before the runtime can accept traffic
+LAZY_SUB_AGENTS = True
+# Build the sub-agents (and open the CoinGecko MCP sessions) in a background thread once the app is serving
+SUB_AGENT_WARMUP = True
+
+# ===== INTENT ROUTER =====
+# Route confident prompts straight to a sub-agent tool, skipping the orchestrator's LLM call
+ROUTER_ENABLED = True
+# Confidence (0-1) at or above which the pre-router's choice is used, below it the LLM orchestrator routes
+ROUTER_CONFIDENCE_THRESHOLD = 0.75
+
+# ===== FAN-OUT =====
+# Prompts asking for more than one sub-agent (eg a concept and a token check) are split by the pre-router and
+# the parts run on their sub-agents concurrently, instead of the orchestrator asking the user to clarify
+FAN_OUT_ENABLED = True
+# Seconds each part may take, a part still running after this is reported as timed out
+FAN_OUT_BRANCH_TIMEOUT = 60
+# Threads running the parts, shared by all requests. A timed out part keeps its thread until it finishes, a prompt
+# whose parts cannot all start at once is answered by the LLM orchestrator instead (see branch_pool.py)
+FAN_OUT_MAX_WORKERS = 16
+
+# ===== CONVERSATION MEMORY =====
+# Each AgentCore runtime session (runtimeSessionId) gets its own orchestrator and conversation history
+# Sessions kept in memory, the least recently used beyond this are dropped
+ORCHESTRATOR_MAX_SESSIONS = 256
+# Seconds a session is kept without requests (AgentCore ends idle runtime sessions after 15 minutes by default)
+ORCHESTRATOR_SESSION_IDLE_TIMEOUT = 900
+# Most recent turns (a prompt and its answer) sent to the orchestrator's model
+CONVERSATION_MAX_TURNS = 10
+# Estimated tokens those turns may use, older turns are dropped beyond it
+CONVERSATION_MAX_TOKENS = 6000
+# Summarize dropped turns in the background (one extra model call per eviction) instead of forgetting them
+CONVERSATION_SUMMARIZE = True
+# Words the running summary is kept to
+CONVERSATION_SUMMARY_MAX_WORDS = 200
+
+# ===== SESSION STORE =====
+# Session histories are saved so a session resumes where it left off after its container is recycled
+# "none" (not saved), "dynamodb" (the production choice, needs the table below) or "sqlite" (a local file for local
+# runs, lost with the container and not writable in the AgentCore image)
+# NOTE a store that cannot be opened is logged and the sessions are not saved
+SESSION_STORE_BACKEND = os.environ.get("SESSION_STORE_BACKEND", "none")
+# SQLite file of the "sqlite" store
+SESSION_STORE_SQLITE_PATH = ".sessions/sessions.db"
+# Table of the "dynamodb" store, partition key "session_id" and sort key "item" (strings), TTL on "expires_at"
+SESSION_STORE_DYNAMODB_TABLE = os.environ.get("SESSION_STORE_DYNAMODB_TABLE", "crypto-orchestrator-sessions")
+# Turns appended between compacted snapshots, a resume reads one snapshot and at most this many turns
+SESSION_STORE_SNAPSHOT_EVERY = 8
+# Seconds a session is kept after its last turn
+SESSION_STORE_TTL = 7 * 24 * 3600
+
+# ===== RESPONSE CACHE =====
+# Sub-agent answers are reused for repeated (or, for some tools, similarly worded) prompts
+RESPONSE_CACHE_ENABLED = True
+# Seconds an answer is reused per sub-agent tool, 0 means the tool is never cached
+RESPONSE_CACHE_TTLS = {
+    "crypto_educator": 86400,  # static knowledge base
+    "general_knowledge": 3600,
+    "crypto_market_analyst": 15,  # live prices, only absorbs bursts of the same question
+    "crypto_security_analyzer": 0,  # a stale risk assessment is dangerous, enable explicitly
+}
+# Cosine similarity (0-1) at or above which a differently worded prompt reuses a cached answer
+# tools not listed here only reuse answers to the exact same prompt
+RESPONSE_CACHE_SIMILARITY = {
+    "crypto_educator": 0.9,
+    "general_knowledge": 0.95,
+}
+# Memory cap of the cache in MB, least recently used answers are evicted beyond it
+RESPONSE_CACHE_MAX_MB = 64
+
+# ===== GOPLUS TOKEN SECURITY API =====
+# Base URL of the API, set GOPLUS_API_URL to use the local stub (stub_goplus_server.py) instead
+GOPLUS_API_URL = os.environ.get("GOPLUS_API_URL", "https://api.gopluslabs.io/api/v1")
+# Seconds a token's security result is reused (token security answers themselves are never cached)
+GOPLUS_CACHE_TTL = 60
+# Maximum contract addresses sent in one request
+GOPLUS_MAX_BATCH = 20
+# Keep-alive connections kept open to the API
+GOPLUS_POOL_SIZE = 10
+# Seconds to wait for the API
+GOPLUS_TIMEOUT = 10
+
+# ===== TELEMETRY =====
+# Every query is traced with OpenTelemetry, a span per request and per sub-agent tool call (see tool_metrics.py)
+# On AgentCore the runtime exports them, locally set OTEL_CONSOLE_EXPORTER=1 to print the spans
+OTEL_CONSOLE_EXPORTER = os.environ.get("OTEL_CONSOLE_EXPORTER", "0") == "1"
+# or set OTEL_EXPORTER_OTLP_ENDPOINT (eg http://localhost:4318) to send them to an OTLP collector
+OTEL_OTLP_EXPORTER = bool(os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT"))
+
+# ===== LOCAL KNOWLEDGE BASE =====
+# Where crypto_educator searches: "bedrock" (the Bedrock Knowledge Base, KB_ID below), or set KB_RETRIEVAL_BACKEND
+# to opt in to "local" (an in-process index of the knowledge base documents, see local_kb.py) or "s3vectors" (the
+# lab's S3 Vectors index queried by the agent, see s3_vectors_kb.py)
+KB_RETRIEVAL_BACKEND = os.environ.get("KB_RETRIEVAL_BACKEND", "bedrock")
+# Index folder of the "local" backend, build it before deploying with: python kb_ingestion.py
+# NOTE without it the agent queries the Bedrock Knowledge Base
+KB_LOCAL_INDEX_DIR = os.environ.get("KB_LOCAL_INDEX_DIR", "kb_index")
+# Markdown documents of the knowledge base, indexed by kb_ingestion.py
+KB_DATASOURCE_DIR = "../resources/kb-datasource"
+# "bedrock" (Titan embeddings as the Bedrock Knowledge Base, one Bedrock call per query) or "hashing" (in-process,
+# no network call, for offline tests and benchmarks only, it finds far fewer relevant chunks)
+KB_LOCAL_EMBEDDER = os.environ.get("KB_LOCAL_EMBEDDER", "bedrock")
+# Chunks of the indexed documents (see chunking.py): most tokens per chunk, as the Bedrock Knowledge Bases' FIXED_SIZE
+# chunking, and tokens of a section's previous chunk repeated at the start of the next (15%)
+KB_CHUNK_MAX_TOKENS = 300
+KB_CHUNK_OVERLAP_TOKENS = 45
+# Documents read at once, embedding batches in flight at once and chunks per batch when ingesting (kb_ingestion.py)
+KB_INGEST_READ_WORKERS = 16
+KB_INGEST_EMBED_WORKERS = 8
+KB_INGEST_BATCH_SIZE = 8
+# Retries of a throttled embedding batch, with exponential backoff, before the ingestion fails
+KB_INGEST_MAX_RETRIES = 6
+# Results returned per search, and the cosine similarity (0-1) a chunk needs to be returned
+KB_LOCAL_TOP_K = 5
+KB_LOCAL_MIN_SCORE = 0.05
+# Filter searches on the documents' level (their .metadata.json) when the agent passes the student's level, filters
+# read off the query's wording are not used, they send most queries to the wrong documents (see retrieval_benchmark.py)
+KB_METADATA_FILTERS = True
+# Fuse a keyword (BM25) search with the vector search, so exact terms (tickers, "rug pull") are not missed, the
+# keyword ranking weighted up for a query naming one, and re-rank the fused results by how much of the query they
+# cover (see bm25.py)
+# NOTE measured with the hashing embedder only (retrieval_benchmark.py): on the "term" queries MRR 0.94 against 0.89
+# for BM25 alone, the same as BM25 overall. Unmeasured with Titan embeddings, run the benchmark with --embedder
+# bedrock before relying on it
+KB_HYBRID_SEARCH = True
+KB_RERANK = True
+# Most tokens of chunks one search returns to the agent, the worst of the top results are dropped to fit
+KB_CONTEXT_TOKEN_BUDGET = 600
+# Quantized copy of the local index's vectors the searches scan (see quantization.py): "" for none (the float32
+# vectors, exact, best for the few thousand chunks of a small corpus), "int8" (4x smaller) or "pq" (product
+# quantization, one byte per subspace, 64 bytes per chunk instead of 4 KB for Titan's 1024 dimensions); the best
+# candidates of the approximate search are re-scored exactly
+KB_VECTOR_QUANTIZATION = ""
+KB_PQ_SUBSPACES = 64
+KB_QUANTIZED_CANDIDATES = 100
+# Approximate nearest-neighbour index of the local index's vectors for large corpora: "" for none or "hnsw" (see
+# hnsw.py, a search scores a few hundred chunks instead of all of them, and takes precedence over the quantized
+# copy). Its parameters are those of the pgvector index of the Aurora notebooks: links per chunk (pgvector's m),
+# candidates searched when linking a chunk (ef_construction) and candidates kept by a search (hnsw.ef_search)
+KB_ANN_INDEX = ""
+KB_HNSW_M = 16
+KB_HNSW_EF_CONSTRUCTION = 256
+KB_HNSW_EF_SEARCH = 40
+# Query embeddings kept in memory, and the SQLite file they are persisted to ("" for none), so repeated questions
+# are not embedded again (see embedding_cache.py), it only matters for Bedrock embeddings
+# NOTE memory only by default, the AgentCore image's working directory is not writable, set
+# KB_QUERY_EMBEDDING_CACHE_PATH (eg .cache/query_embeddings.db) for local runs or a writable volume
+KB_QUERY_EMBEDDING_CACHE_SIZE = 10000
+KB_QUERY_EMBEDDING_CACHE_PATH = os.environ.get("KB_QUERY_EMBEDDING_CACHE_PATH", "")
+# S3 Vectors index of the "s3vectors" backend (created in lab 1), and the dimension of its Titan embeddings
+KB_S3_VECTOR_BUCKET = os.environ.get("KB_S3_VECTOR_BUCKET", "")
+KB_S3_VECTOR_INDEX = os.environ.get("KB_S3_VECTOR_INDEX", "doit-agentcore-kb-embeddings-index")
+KB_S3_VECTORS_DIM = 1024
+# Query the Bedrock Knowledge Base (KB_ID below) when the local index has no result above the minimum score
+KB_REMOTE_FALLBACK = os.environ.get("KB_REMOTE_FALLBACK", "1") == "1"
+
 # Your Bedrock Knowledge Base ID
 # REPLACE THIS WITH YOURS
 KB_ID = "DK3E2NETXL"
@@ -0,0 +1,219 @@
+"""
+Bounded conversation memory for the orchestrator agent
+
+A strands Agent keeps every message of its conversation, so a long running session sends its whole history with
+every model call and the input tokens (and latency) of each turn keep growing. BoundedConversationManager keeps:
+
+- a sliding window of the most recent whole turns (a user prompt and everything up to the next one, so tool
+  use/result pairs are never split), bounded by a number of turns and by an estimated number of tokens
+- optionally, a running summary of the evicted turns, written by the model in a background thread so no turn
+  waits for it, and sent as the first message pair of the conversation
+
+So the history sent per turn stays roughly flat however long the session runs: at most the window plus a summary
+of bounded size. strands' own SummarizingConversationManager summarizes in the middle of the turn that overflows.
+
+USAGE:
+    manager = BoundedConversationManager(max_turns=10, max_tokens=6000, summarizer=model_summarizer(bedrock_model))
+    agent = Agent(model=bedrock_model, conversation_manager=manager)
+"""
+
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from strands import Agent
+from strands.agent.conversation_manager import ConversationManager
+from strands.hooks import BeforeInvocationEvent
+from strands.types.exceptions import ContextWindowOverflowException
+
+logger = logging.getLogger(__name__)
+
+# rough characters per token of English text, used to estimate the tokens of a turn
+CHARS_PER_TOKEN = 4
+# start of the user message carrying the summary, how the summary pair is found in the history
+SUMMARY_PREFIX = "Summary of our conversation so far:"
+SUMMARY_ACK = "Understood, I will keep this earlier context in mind."
+
+SUMMARY_SYSTEM_PROMPT = """
+You maintain a running summary of a conversation between a user and a crypto assistant.
+You are given the current summary and the turns that are being dropped from the conversation.
+Return an updated summary of at most {max_words} words that keeps what later turns may refer to: the user's goals
+and preferences, tokens, contract addresses and chain ids mentioned, and the key facts and figures given.
+Return only the summary text.
+"""
+
+# summaries are written off the request path, one shared pool for all sessions
+_summary_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="conversation-summary")
+
+
+def shutdown():
+    """Wait for the summaries being written, at process shutdown"""
+    _summary_pool.shutdown(wait=True)
+
+
+def estimate_tokens(messages):
+    """Rough token count of messages, text, tool inputs and tool results included"""
+    return sum(len(json.dumps(m["content"], default=str)) for m in messages) // CHARS_PER_TOKEN
+
+
+def transcript(messages):
+    """Plain text of messages for the summarizer, tool use and results shortened"""
+    lines = []
+    for message in messages:
+        for block in message["content"]:
+            if "text" in block:
+                lines.append(f"{message['role']}: {block['text']}")
+            elif "toolUse" in block:
+                lines.append(f"{message['role']} called {block['toolUse']['name']}")
+            elif "toolResult" in block:
+                texts = [c["text"] for c in block["toolResult"].get("content", []) if "text" in c]
+                lines.append(f"tool result: {' '.join(texts)[:2000]}")
+    return "\n".join(lines)
+
+
+def model_summarizer(model, max_words=200):
+    """Summarizer that asks the model to fold dropped turns into the running summary
+
+    Args:
+        model: Model to summarize with, eg the shared BedrockModel
+        max_words: Words the summary is kept to
+
+    Returns:
+        A callable (summary, transcript) returning the new summary
+    """
+    system_prompt = SUMMARY_SYSTEM_PROMPT.format(max_words=max_words)
+
+    def summarize(summary, dropped):
+        # a new agent each time, nothing is kept between summaries apart from the summary itself
+        agent = Agent(model=model, system_prompt=system_prompt, callback_handler=None)
+        return str(agent(f"Current summary:\n{summary or '(none yet)'}\n\nTurns being dropped:\n{dropped}")).strip()
+
+    return summarize
+
+
+def is_turn_start(message):
+    """A user message with text starts a turn, a user message with tool results continues one"""
+    return message["role"] == "user" and not any("toolResult" in block for block in message["content"])
+
+
+def _is_summary_pair(messages):
+    if len(messages) < 2 or messages[0]["role"] != "user" or not messages[0]["content"]:
+        return False
+    return messages[0]["content"][0].get("text", "").startswith(SUMMARY_PREFIX)
+
+
+class BoundedConversationManager(ConversationManager):
+    """Sliding window of whole turns, bounded by turns and tokens, with a background summary of evicted turns"""
+
+    def __init__(self, max_turns=10, max_tokens=6000, summarizer=None, summary_max_chars=2000):
+        """
+        Args:
+            max_turns: Most recent turns kept
+            max_tokens: Estimated tokens the kept turns may use, the most recent turn is always kept
+            summarizer: Optional callable (summary, transcript) returning a new summary, see model_summarizer,
+                        without one evicted turns are dropped
+            summary_max_chars: The summary is cut to this length whatever the summarizer returns
+        """
+        super().__init__()
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.summary_max_chars = summary_max_chars
+        self.summary = ""
+        self._pending = []  # transcripts of evicted turns waiting to be summarized
+        self._summarizing = False
+        self._lock = threading.Lock()
+
+    def register_hooks(self, registry, **kwargs):
+        super().register_hooks(registry, **kwargs)
+        # a summary finished in the background since the last turn is put in place before the next one
+        registry.add_callback(BeforeInvocationEvent, lambda event: self._sync_summary(event.agent.messages))
+
+    def apply_management(self, agent, **kwargs):
+        """Evict the oldest turns beyond max_turns or max_tokens, called by strands after every invocation"""
+        self._sync_summary(agent.messages)
+        turns = self._turns(agent.messages)
+        tokens = [estimate_tokens(turn) for turn in turns]
+        evict = 0
+        while len(turns) - evict > 1 and (len(turns) - evict > self.max_turns or sum(tokens[evict:]) > self.max_tokens):
+            evict += 1
+        if evict:
+            self._evict(agent, turns[:evict])
+
+    def reduce_context(self, agent, e=None, **kwargs):
+        """Evict the oldest turn, the model's context window overflowed (or is about to)"""
+        turns = self._turns(agent.messages)
+        if len(turns) <= 1:
+            if e is not None:
+                raise ContextWindowOverflowException("the current turn alone is too large for the model") from e
+            return
+        self._evict(agent, turns[:1])
+
+    def get_state(self):
+        with self._lock:
+            return {**super().get_state(), "summary": self.summary}
+
+    def restore_from_session(self, state):
+        super().restore_from_session(state)
+        self.summary = state.get("summary", "")
+        return self._summary_messages(self.summary) if self.summary else None
+
+    def _turns(self, messages):
+        """The turns of the history, without the summary pair"""
+        start = 2 if _is_summary_pair(messages) else 0
+        turns = []
+        for message in messages[start:]:
+            if is_turn_start(message) or not turns:
+                turns.append([])
+            turns[-1].append(message)
+        return turns
+
+    def _evict(self, agent, turns):
+        evicted = [message for turn in turns for message in turn]
+        start = 2 if _is_summary_pair(agent.messages) else 0
+        del agent.messages[start:start + len(evicted)]
+        self.removed_message_count += len(evicted)
+        if self.summarizer is None:
+            return
+        with self._lock:
+            self._pending.append(transcript(evicted))
+            if self._summarizing:
+                return
+            self._summarizing = True
+        _summary_pool.submit(self._summarize)
+
+    def _summarize(self):
+        """Fold the pending transcripts into the summary, until none are left"""
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._summarizing = False
+                    return
+                dropped, self._pending = "\n".join(self._pending), []
+                summary = self.summary
+            try:
+                summary = self.summarizer(summary, dropped)[: self.summary_max_chars]
+            except Exception:
+                # the turns are lost from the summary, the conversation carries on without them
+                logger.exception("conversation summary failed")
+                continue
+            with self._lock:
+                self.summary = summary
+
+    @staticmethod
+    def _summary_messages(summary):
+        return [
+            {"role": "user", "content": [{"text": f"{SUMMARY_PREFIX}\n{summary}"}]},
+            {"role": "assistant", "content": [{"text": SUMMARY_ACK}]},
+        ]
+
+    def _sync_summary(self, messages):
+        """Put the current summary at the start of the history, replacing an older one"""
+        with self._lock:
+            summary = self.summary
+        if not summary:
+            return
+        has_pair = _is_summary_pair(messages)
+        if has_pair and messages[0]["content"][0]["text"] == f"{SUMMARY_PREFIX}\n{summary}":
+            return
+        messages[: 2 if has_pair else 0] = self._summary_messages(summary)
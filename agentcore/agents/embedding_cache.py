@@ -0,0 +1,173 @@
+"""
+Query embedding cache for the knowledge base lookups
+
+Every knowledge base lookup embeds its query first, with Titan that is one invoke_model round trip per query,
+though students ask the same education questions over and over ("what is a rug pull?"). CachedEmbedder wraps an
+embedder (see embeddings.py) and remembers the vectors of the texts it embedded:
+
+- keyed by the normalized text (case, whitespace and trailing punctuation ignored, as the response cache), so
+  "What is a rug pull?" and "what is a rug pull" are embedded once
+- in memory, LRU evicted beyond max_entries
+- optionally persisted to a SQLite file, shared by the processes of a container and kept across restarts, so a
+  popular question is embedded once per deployment rather than once per process; the newest vectors are loaded
+  into memory on start and the texts are only stored hashed. A file that cannot be opened (eg a read-only
+  working directory) is logged and the cache is memory only
+- per model, the vectors of another embedder (or dimension) are never returned
+
+It has the embed(), dim and name of the embedder it wraps, so it can be used wherever that embedder is, eg as
+the query embedder of a LocalKnowledgeBase or an S3VectorsKnowledgeBase.
+
+USAGE:
+    embedder = CachedEmbedder(BedrockEmbedder(region="us-east-1"), max_entries=10000, path=".cache/embeddings.db")
+    vector = embedder.embed(["What is a rug pull?"])[0]  # invoke_model the first time only
+    print(embedder.stats())  # {"hits": 0, "disk_hits": 0, "misses": 1, "entries": 1}
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from response_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(text):
+    """Key of a text, the hash of its normalized form"""
+    return hashlib.sha256(normalize_query(text).encode("utf-8")).hexdigest()
+
+
+class CachedEmbedder:
+    """An embedder that embeds each distinct (normalized) text once, see the module docstring"""
+
+    def __init__(self, embedder, max_entries=10000, path=None):
+        """
+        Args:
+            embedder: The embedder of the texts not cached yet
+            max_entries: Vectors kept in memory, the least recently used are evicted
+            path: Optional SQLite file the vectors are persisted to, its newest max_entries are loaded on start
+        """
+        self.embedder = embedder
+        self.dim = embedder.dim
+        self.max_batch = getattr(embedder, "max_batch", None)
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = self.disk_hits = self.misses = 0
+        self._entries = OrderedDict()  # key -> vector, least recently used first
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            try:
+                self._open(path)
+            except (OSError, sqlite3.Error):
+                logger.warning("cannot open the embedding cache %s, caching in memory only", path, exc_info=True)
+                self.close()
+
+    def _open(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, key TEXT NOT NULL, vector BLOB NOT NULL, created_at REAL NOT NULL, "
+            "PRIMARY KEY (model, key))"
+        )
+        self._db.commit()
+        self._warm()
+
+    @property
+    def name(self):
+        """That of the wrapped embedder, cached vectors are its vectors"""
+        return self.embedder.name
+
+    def embed(self, texts):
+        """Embed texts into a (len(texts), dim) float32 matrix, only the texts not cached call the embedder"""
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        missing = OrderedDict()  # key -> rows, the rows of a key repeated in texts are embedded once
+        with self._lock:
+            for row, key in enumerate(map(cache_key, texts)):
+                vector = self._entries.get(key)
+                if vector is None:
+                    missing.setdefault(key, []).append(row)
+                    continue
+                self._entries.move_to_end(key)
+                vectors[row] = vector
+                self.hits += 1
+        if not missing:
+            return vectors
+
+        if self._db is not None:
+            # eg evicted from memory, or embedded by another process
+            for key, vector in self._load(list(missing)).items():
+                self._fill(vectors, missing.pop(key), key, vector)
+                self.disk_hits += 1
+        if missing:
+            # the first text of each key, the embedder is called without holding the lock
+            embedded = self.embedder.embed([texts[rows[0]] for rows in missing.values()])
+            for (key, rows), vector in zip(missing.items(), embedded):
+                self._fill(vectors, rows, key, vector)
+                self.misses += 1
+            if self._db is not None:
+                self._save(list(missing), embedded)
+        return vectors
+
+    def stats(self):
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def clear(self):
+        """Forget the vectors in memory, the persisted ones stay"""
+        with self._lock:
+            self._entries.clear()
+
+    def close(self):
+        """Close the SQLite file, the vectors in memory are still served"""
+        with self._lock:
+            db, self._db = self._db, None
+        if db is not None:
+            db.close()
+
+    def _fill(self, vectors, rows, key, vector):
+        for row in rows:
+            vectors[row] = vector
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _warm(self):
+        rows = self._db.execute(
+            "SELECT key, vector FROM embeddings WHERE model = ? ORDER BY created_at DESC LIMIT ?",
+            (self.name, self.max_entries),
+        ).fetchall()
+        # oldest first, so the newest are the last evicted
+        for key, blob in reversed(rows):
+            self._entries[key] = np.frombuffer(blob, dtype=np.float32)
+
+    def _load(self, keys):
+        """Persisted vectors of keys, key -> vector"""
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+                    (self.name, *batch),
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def _save(self, keys, vectors):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, vector, created_at) VALUES (?, ?, ?, ?)",
+                [(self.name, key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in zip(keys, vectors)],
+            )
+            self._db.commit()
@@ -0,0 +1,94 @@
+"""
+Local text embedders
+
+An embedder turns a list of texts into a float32 matrix with one L2 normalized row per text, so the dot product
+of two rows is their cosine similarity. Anything with that embed(texts) method and a dim attribute can be used.
+
+- HashingEmbedder: feature hashing of word unigrams and bigrams, no model and no network call, deterministic
+  across processes. Good at spotting near-identical wording, it knows nothing about synonyms.
+- BedrockEmbedder: a Bedrock embedding model (Amazon Titan Text Embeddings V2), one Bedrock call per text.
+
+Embedders also have a name, which tells whether vectors stored by one (eg a local knowledge base index) can be
+compared with the vectors of another.
+
+USAGE:
+    embedder = HashingEmbedder(dim=512)
+    vectors = embedder.embed(["What is Bitcoin?", "what's bitcoin"])
+    similarity = float(vectors[0] @ vectors[1])
+"""
+
+import hashlib
+import json
+from functools import lru_cache
+import boto3
+import numpy as np
+from intent_router import tokenize
+from model_registry import bedrock_client_config
+
+
+@lru_cache(maxsize=65536)
+def _feature(token, dim):
+    """Bucket and sign of a token, from a stable hash (python's hash() is salted per process)"""
+    digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dim, 1.0 if (digest >> 63) & 1 else -1.0
+
+
+class HashingEmbedder:
+    """Embeds texts by hashing their word unigrams and bigrams into a fixed number of buckets"""
+
+    def __init__(self, dim=512):
+        """
+        Args:
+            dim: Vector dimensions, more buckets means fewer unrelated words colliding
+        """
+        self.dim = dim
+
+    @property
+    def name(self):
+        return f"hashing-{self.dim}"
+
+    def embed(self, texts):
+        """Embed texts into a (len(texts), dim) float32 matrix of unit length rows (all zero for empty texts)"""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                bucket, sign = _feature(token, self.dim)
+                vectors[row, bucket] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+class BedrockEmbedder:
+    """Embeds texts with a Bedrock embedding model, eg to build a knowledge base index that knows about synonyms"""
+
+    # texts per model call, Titan embeds one text per invoke_model
+    max_batch = 1
+
+    def __init__(self, model_id="amazon.titan-embed-text-v2:0", region="us-east-1", dim=512, client=None):
+        """
+        Args:
+            model_id: Bedrock embedding model, Titan Text Embeddings V2 accepts dim 256, 512 or 1024
+            region: AWS region of the model
+            dim: Vector dimensions
+            client: Optional bedrock-runtime client
+        """
+        self.model_id = model_id
+        self.dim = dim
+        self.client = client or boto3.client("bedrock-runtime", region_name=region, config=bedrock_client_config())
+
+    @property
+    def name(self):
+        return f"{self.model_id}-{self.dim}"
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            if not text.strip():
+                continue
+            response = self.client.invoke_model(
+                modelId=self.model_id,
+                body=json.dumps({"inputText": text, "dimensions": self.dim, "normalize": True}),
+            )
+            vectors[row] = json.loads(response["body"].read())["embedding"]
+        return vectors
@@ -0,0 +1,249 @@
+"""
+Batched, cached client for the GoPlus Labs token security API
+
+The security sub-agent used to have the LLM build GoPlus URLs for the generic http_request tool, one token per
+call, and then read the raw JSON, which for a single token includes holder and dex lists thousands of tokens
+long. This client:
+
+- checks every address for a chain in one request (the API takes comma-separated contract_addresses)
+- caches each (chain_id, address) result for a short TTL, so repeat questions make no request at all
+- reuses pooled keep-alive HTTP connections, with retries and backoff on 429 and 5xx responses
+- reduces each token record to the security fields the sub-agent reports on, flags as booleans, taxes as
+  percentages and a list of red flags, so the model reads a few hundred characters instead of the raw record
+- takes partial answers (code 2, GoPlus had no data yet on some of the batch): the tokens present are returned,
+  the others are None and not cached, so a later question fetches them again
+
+USAGE:
+    client = GoPlusClient("https://api.gopluslabs.io/api/v1", cache_ttl=60)
+    summaries = client.token_security("1", ["0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48", "0x6982..."])
+
+    # local stub, see stub_goplus_server.py
+    client = GoPlusClient("http://localhost:8091/api/v1")
+"""
+
+import threading
+import time
+from collections import Counter
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# fields copied into the summary, in the order the sub-agent's system prompt lists them
+SUMMARY_FIELDS = [
+    "token_name",
+    "token_symbol",
+    "is_honeypot",
+    "buy_tax",
+    "sell_tax",
+    "owner_address",
+    "holder_count",
+    "can_take_back_ownership",
+    "slippage_modifiable",
+    "is_blacklisted",
+    "is_whitelisted",
+    "is_open_source",
+    "is_proxy",
+    "external_call",
+    "is_mintable",
+    "hidden_owner",
+    "selfdestruct",
+    "transfer_pausable",
+    "cannot_sell_all",
+    "owner_change_balance",
+]
+TAX_FIELDS = {"buy_tax", "sell_tax"}
+TEXT_FIELDS = {"token_name", "token_symbol", "owner_address"}
+
+# flags that are a risk when set, with the wording used in the summary
+RED_FLAGS = {
+    "is_honeypot": "honeypot, tokens cannot be sold",
+    "cannot_sell_all": "holders cannot sell all their tokens",
+    "can_take_back_ownership": "ownership can be taken back",
+    "hidden_owner": "hidden owner",
+    "owner_change_balance": "owner can change balances",
+    "slippage_modifiable": "tax/slippage can be modified",
+    "is_blacklisted": "has a blacklist function",
+    "transfer_pausable": "transfers can be paused",
+    "selfdestruct": "contract can self destruct",
+    "external_call": "calls external contracts",
+    "is_proxy": "proxy contract, the code can be changed",
+    "is_mintable": "new tokens can be minted",
+}
+# tax above which it is reported as a red flag
+HIGH_TAX = 0.1
+
+# answer codes: the whole batch, or only some of its tokens (the rest can be asked again a little later)
+CODE_OK = 1
+CODE_PARTIAL = 2
+
+
+class GoPlusError(Exception):
+    """Raised when the GoPlus API answers with an error code"""
+
+
+def _number(value, kind=float):
+    """value (a string in GoPlus records) as a number, None when it is not one"""
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def summarize_token(record):
+    """Compact security summary of a raw GoPlus token_security record
+
+    Args:
+        record: One value of the API's result dict
+
+    Returns:
+        Dict of the SUMMARY_FIELDS present in the record plus "red_flags", a list of plain text risks
+    """
+    summary = {}
+    for field in SUMMARY_FIELDS:
+        value = record.get(field)
+        if value in (None, ""):
+            continue
+        if field in TAX_FIELDS:
+            tax = _number(value)
+            # an unparsable value is reported as is, eg "unknown"
+            summary[field] = value if tax is None else f"{tax * 100:g}%"
+        elif field == "holder_count":
+            count = _number(value, int)
+            summary[field] = value if count is None else count
+        elif field in TEXT_FIELDS:
+            summary[field] = value
+        else:
+            summary[field] = str(value) == "1"
+
+    red_flags = [text for field, text in RED_FLAGS.items() if summary.get(field) is True]
+    if summary.get("is_open_source") is False:
+        red_flags.append("contract source code is not verified")
+    for field in ("buy_tax", "sell_tax"):
+        tax = _number(record.get(field))
+        if tax is not None and tax > HIGH_TAX:
+            red_flags.append(f"high {field.replace('_', ' ')} of {summary[field]}")
+    summary["red_flags"] = red_flags
+    return summary
+
+
+class GoPlusClient:
+    """Thread safe GoPlus token security client with batching, a TTL cache and pooled connections"""
+
+    def __init__(self, base_url, cache_ttl=60, max_batch=20, pool_size=10, timeout=10, retries=2, max_entries=10000):
+        """
+        Args:
+            base_url: API base URL, eg "https://api.gopluslabs.io/api/v1"
+            cache_ttl: Seconds a token's result is reused, 0 disables the cache
+            max_batch: Maximum addresses per request
+            pool_size: Keep-alive connections kept open, ie concurrent requests without a new TLS handshake
+            timeout: Seconds to wait for the API
+            retries: Retries (with backoff) of failed connections and 429/5xx responses
+            max_entries: Cached tokens kept, the oldest are dropped beyond it
+        """
+        self.base_url = base_url.rstrip("/")
+        self.cache_ttl = cache_ttl
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.max_entries = max_entries
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._cache = {}  # (chain_id, address) -> (expires_at, summary or None when GoPlus has no data)
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def token_security(self, chain_id, addresses):
+        """Security summaries of tokens on one chain
+
+        Args:
+            chain_id: Chain id, eg "1" for Ethereum or "56" for BNB Chain
+            addresses: Token contract addresses, case and duplicates are ignored
+
+        Returns:
+            Dict of lowercased address to its summary (see summarize_token), None for tokens GoPlus has no data on
+            (yet, for a partial answer)
+
+        Raises:
+            GoPlusError: If the API answers with an error code
+            requests.RequestException: If the API cannot be reached
+        """
+        chain_id = str(chain_id).strip()
+        addresses = list(dict.fromkeys(a.strip().lower() for a in addresses if a and a.strip()))
+        results = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for address in addresses:
+                cached = self._cache.get((chain_id, address))
+                if cached is not None and cached[0] > now:
+                    results[address] = cached[1]
+                    self._stats["cache_hits"] += 1
+                else:
+                    missing.append(address)
+            self._stats["cache_misses"] += len(missing)
+
+        for i in range(0, len(missing), self.max_batch):
+            batch = missing[i:i + self.max_batch]
+            records, complete = self._fetch(chain_id, batch)
+            summaries = {a: summarize_token(records[a]) if a in records else None for a in batch}
+            results.update(summaries)
+            # a partial answer's missing tokens may have data on the next request, only the found ones are cached
+            self._store(chain_id, summaries if complete else {a: summaries[a] for a in records if a in summaries})
+
+        return {a: results[a] for a in addresses}
+
+    def _fetch(self, chain_id, addresses):
+        """One API request for a batch of addresses
+
+        Returns:
+            (raw records keyed by lowercased address, whether the answer covers the whole batch)
+        """
+        response = self.session.get(
+            f"{self.base_url}/token_security/{chain_id}",
+            params={"contract_addresses": ",".join(addresses)},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        body = response.json()
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["addresses_fetched"] += len(addresses)
+            self._stats["response_bytes"] += len(response.content)
+        code = body.get("code")
+        if code not in (CODE_OK, CODE_PARTIAL):
+            raise GoPlusError(f"GoPlus error {code}: {body.get('message')}")
+        records = {address.lower(): record for address, record in (body.get("result") or {}).items()}
+        return records, code == CODE_OK
+
+    def _store(self, chain_id, summaries):
+        if not self.cache_ttl:
+            return
+        expires_at = time.monotonic() + self.cache_ttl
+        with self._lock:
+            for address, summary in summaries.items():
+                self._cache.pop((chain_id, address), None)
+                self._cache[(chain_id, address)] = (expires_at, summary)
+            # entries are in insertion order, so the oldest are dropped first
+            while len(self._cache) > self.max_entries:
+                del self._cache[next(iter(self._cache))]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def close(self):
+        """Close the pooled connections"""
+        self.session.close()
+
+    def stats(self):
+        """Requests made, addresses fetched, cache hits/misses, raw response bytes and cached entries"""
+        with self._lock:
+            return {**self._stats, "cached_tokens": len(self._cache)}
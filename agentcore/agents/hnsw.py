@@ -0,0 +1,339 @@
+"""
+HNSW approximate nearest-neighbour index of the local knowledge base
+
+A local search scores every chunk (or every quantized code, see quantization.py), its cost grows with the corpus.
+An HNSW graph (hierarchical navigable small world, Malkov and Yashunin) links each chunk to its nearest neighbours,
+on a base layer holding every chunk and sparser upper layers holding fewer and fewer; a search walks greedily from
+the top layer's entry point down to the base layer, keeping the ef_search best chunks found, so it scores a few
+hundred chunks whatever the size of the corpus.
+
+The build parameters are those of the pgvector index of the lab's Aurora notebooks,
+"CREATE INDEX ... USING hnsw (embedding vector_cosine_ops) WITH (ef_construction=256)":
+
+- m = 16 links per chunk on the upper layers, 2 * m on the base layer (pgvector's default)
+- ef_construction = 256 candidates searched when linking a new chunk
+- ef_search = 40 candidates kept by a search (pgvector's hnsw.ef_search default), at least top_k
+- cosine similarity, the dot product of the unit length rows of the index's vectors
+
+Neighbours are chosen with the paper's heuristic (a candidate is linked only if it is closer to the chunk than to
+the neighbours already chosen, as pgvector and hnswlib do), so the links span clusters instead of crowding one.
+
+Chunks are inserted one at a time, so an index grows incrementally: remap() follows the chunks of an updated
+vectors matrix (kb_ingestion.py rewrites it ordered by document) and unlinks the deleted ones, a chunk that lost
+neighbours choosing new ones among its other neighbours and those of the deleted ones (the paths that went through
+them, as FreshDiskANN repairs deletions; pgvector's vacuum searches them again), then add() inserts the new rows.
+
+The graph is saved as .npy files next to the vectors.npy of the index, memory-mapped when opened:
+
+- hnsw_levels.npy: top layer of each chunk (int8)
+- hnsw_base.npy: (chunks, 2 * m) int32 base layer links, -1 padded
+- hnsw_upper.npy: (rows, m) int32 upper layer links, a row per layer of each chunk above the base layer, in chunk
+  order
+
+A filtered search (filter_rows()) scores the candidate rows exactly instead, they are few.
+
+USAGE:
+    index = HNSWIndex(vectors, m=16, ef_construction=256)
+    index.add(range(len(vectors)))
+    rows, scores = index.search(query_vector, top_k=5)
+    arrays = index.arrays()  # name -> array, written by kb_ingestion.LocalIndexSink
+    index = HNSWIndex.open("kb_index", {"m": 16, "ef_construction": 256}, vectors, ef_search=40)
+"""
+
+import heapq
+import math
+import os
+import random
+import numpy as np
+
+M = 16
+EF_CONSTRUCTION = 256
+EF_SEARCH = 40
+
+FILES = ("hnsw_levels.npy", "hnsw_base.npy", "hnsw_upper.npy")
+
+# candidates whose similarities to each other are computed at once when choosing neighbours
+SELECT_BLOCK = 32
+
+
+class HNSWIndex:
+    """HNSW graph over the rows of a vectors matrix, see the module docstring"""
+
+    def __init__(self, vectors, m=M, ef_construction=EF_CONSTRUCTION, ef_search=EF_SEARCH, seed=0):
+        """
+        Args:
+            vectors: (chunks, dim) float32 matrix of unit length rows, eg memory-mapped, rows are the graph's nodes
+            m: Links per node on the upper layers, 2 * m on the base layer
+            ef_construction: Candidates searched when linking a node
+            ef_search: Candidates kept by a search
+            seed: Seed of the nodes' layers
+        """
+        self.vectors = vectors
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.levels = np.full(len(vectors), -1, dtype=np.int8)  # -1 for rows not in the graph
+        self.base = np.full((len(vectors), 2 * m), -1, dtype=np.int32)
+        self.upper = {}  # node -> (level, m) links of layers 1 to level
+        self.entry = -1
+        self._random = random.Random(seed)
+
+    @classmethod
+    def open(cls, index_dir, spec, vectors, ef_search=EF_SEARCH, mmap=True):
+        """The graph saved in an index folder
+
+        Args:
+            index_dir: The index folder
+            spec: Build parameters of the graph, the manifest's "hnsw" entry
+            vectors: The vectors of the graph's rows
+            ef_search: Candidates kept by a search
+            mmap: Memory-map the graph (read only) rather than read it
+        """
+        index = cls(vectors[:0], spec["m"], spec["ef_construction"], ef_search)
+        arrays = {name: np.load(os.path.join(index_dir, name), mmap_mode="r" if mmap else None) for name in FILES}
+        index._load(vectors, arrays)
+        return index
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def spec(self):
+        """Build parameters, as stored in the manifest"""
+        return {"m": self.m, "ef_construction": self.ef_construction}
+
+    def arrays(self):
+        """The files of the graph, name -> array"""
+        nodes = sorted(self.upper)
+        upper = np.empty((0, self.m), dtype=np.int32)
+        if nodes:
+            upper = np.concatenate([self.upper[node] for node in nodes])
+        return {"hnsw_levels.npy": self.levels, "hnsw_base.npy": self.base, "hnsw_upper.npy": upper}
+
+    def add(self, rows):
+        """Insert rows of the vectors matrix into the graph, rows already in it are skipped"""
+        self._grow()
+        for row in rows:
+            if self.levels[row] < 0:
+                self._insert(int(row))
+
+    def remap(self, mapping, vectors):
+        """Follow the rows of a new vectors matrix
+
+        Args:
+            mapping: New row of each current row, -1 for a deleted one
+            vectors: The new vectors matrix, its rows missing from mapping are not in the graph until add()ed
+
+        Returns:
+            Number of nodes repaired, those that lost neighbours
+        """
+        mapping = np.asarray(mapping, dtype=np.int64)
+        kept = np.flatnonzero((mapping >= 0) & (self.levels[:len(mapping)] >= 0))
+        target = mapping[kept]
+        lookup = np.append(mapping, -1).astype(np.int32)  # link -1 stays -1
+
+        levels = np.full(len(vectors), -1, dtype=np.int8)
+        levels[target] = self.levels[kept]
+        base = np.full((len(vectors), 2 * self.m), -1, dtype=np.int32)
+        links, lost = _relink(self.base[kept], lookup)
+        base[target] = links
+        # (new node, layer, candidate neighbours) of the links to deleted nodes, from the current graph
+        damaged = [(int(target[i]), 0, self._bypass(int(kept[i]), 0, lookup)) for i in np.flatnonzero(lost).tolist()]
+        upper = {}
+        for node, new in zip(kept.tolist(), target.tolist()):
+            if node in self.upper:
+                upper[new], lost = _relink(self.upper[node], lookup)
+                damaged.extend((new, level, self._bypass(node, level, lookup)) for level in (np.flatnonzero(lost) + 1).tolist())
+
+        self.vectors, self.levels, self.base, self.upper = vectors, levels, base, upper
+        self.entry = int(np.argmax(levels)) if len(levels) and levels.max() >= 0 else -1
+        for node, level, candidates in damaged:
+            if candidates:
+                self._relink_node(node, level, candidates)
+            else:
+                self._repair(node)
+        return len({node for node, _, _ in damaged})
+
+    def search(self, vector, top_k=5, ef=None):
+        """(rows, scores) of the approximate top_k rows by cosine similarity, best first"""
+        vector = np.asarray(vector, dtype=np.float32)
+        if self.entry < 0 or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        entries = self._descend(vector, 0)
+        found = self._search_layer(vector, entries, max(ef or self.ef_search, top_k), 0)[:top_k]
+        rows = np.array([node for _, node in found], dtype=np.int64)
+        return rows, np.array([score for score, _ in found], dtype=np.float32)
+
+    def top(self, vector, top_k, rows=None):
+        """(rows, scores) of the top_k rows, among rows if not None (scored exactly), best first"""
+        if rows is None:
+            return self.search(vector, top_k)
+        rows = np.asarray(rows, dtype=np.int64)
+        scores = np.asarray(self.vectors[rows], dtype=np.float32) @ np.asarray(vector, dtype=np.float32)
+        top = np.argsort(-scores, kind="stable")[:top_k]
+        return rows[top], scores[top]
+
+    def _load(self, vectors, arrays):
+        self.vectors = vectors
+        self.levels = arrays["hnsw_levels.npy"]
+        self.base = arrays["hnsw_base.npy"]
+        self.upper = {}
+        start = 0
+        for node in np.flatnonzero(self.levels > 0).tolist():
+            level = int(self.levels[node])
+            self.upper[node] = arrays["hnsw_upper.npy"][start:start + level]
+            start += level
+        self.entry = int(np.argmax(self.levels)) if len(self.levels) and self.levels.max() >= 0 else -1
+
+    def _grow(self):
+        """Size the graph's arrays to the vectors matrix, writable"""
+        missing = len(self.vectors) - len(self.levels)
+        if missing > 0 or not self.base.flags.writeable:
+            self.levels = np.concatenate([self.levels, np.full(max(missing, 0), -1, dtype=np.int8)])
+            self.base = np.concatenate([self.base, np.full((max(missing, 0), 2 * self.m), -1, dtype=np.int32)])
+            self.upper = {node: np.array(links) for node, links in self.upper.items()}
+
+    def _vector(self, node):
+        return np.asarray(self.vectors[node], dtype=np.float32)
+
+    def _scores(self, nodes, vector):
+        """Similarities of nodes to vector, a list"""
+        return (np.asarray(self.vectors[nodes], dtype=np.float32) @ vector).tolist()
+
+    def _links(self, node, level):
+        links = self.base[node] if level == 0 else self.upper[node][level - 1]
+        return links[links >= 0]
+
+    def _descend(self, vector, level):
+        """Entry points of level, the nearest node found greedily on each layer above it"""
+        entries = [self.entry]
+        for layer in range(int(self.levels[self.entry]), level, -1):
+            entries = [self._search_layer(vector, entries, 1, layer)[0][1]]
+        return entries
+
+    def _search_layer(self, vector, entries, ef, level):
+        """[(similarity, node)] of the ef nodes most similar to vector found from entries on a layer, best first"""
+        visited = set(entries)
+        scores = self._scores(entries, vector)
+        candidates = [(-score, node) for score, node in zip(scores, entries)]  # best first
+        heapq.heapify(candidates)
+        found = sorted(zip(scores, entries))[-ef:]  # worst first
+        heapq.heapify(found)
+        while candidates:
+            score, node = heapq.heappop(candidates)
+            if -score < found[0][0] and len(found) >= ef:
+                break
+            links = self.base[node] if level == 0 else self.upper[node][level - 1]
+            new = [link for link in links.tolist() if link >= 0 and link not in visited]
+            if not new:
+                continue
+            visited.update(new)
+            worst = found[0][0]
+            for score, link in zip(self._scores(new, vector), new):
+                if score > worst or len(found) < ef:
+                    heapq.heappush(candidates, (-score, link))
+                    heapq.heappush(found, (score, link))
+                    if len(found) > ef:
+                        heapq.heappop(found)
+                    worst = found[0][0]
+        return sorted(found, reverse=True)
+
+    def _select(self, found, count):
+        """Neighbours among found ([(similarity, node)], best first), each closer to the node than to the others"""
+        selected, vectors = [], []
+        for start in range(0, len(found), SELECT_BLOCK):
+            block = found[start:start + SELECT_BLOCK]
+            block_vectors = np.asarray(self.vectors[[node for _, node in block]], dtype=np.float32)
+            # similarities to the neighbours selected before the block, and within the block
+            before = (block_vectors @ np.array(vectors).T).max(axis=1).tolist() if vectors else [-2.0] * len(block)
+            within = (block_vectors @ block_vectors.T).tolist()
+            chosen = []
+            for i, (score, node) in enumerate(block):
+                if before[i] < score and all(within[i][j] < score for j in chosen):
+                    chosen.append(i)
+                    selected.append(node)
+                    if len(selected) == count:
+                        return selected
+            vectors.extend(block_vectors[chosen])
+        return selected
+
+    def _connect(self, node, found, level):
+        """Link node to the best of found on a layer, and them back to node"""
+        neighbours = self._select(found, self.m)
+        links = self.base[node] if level == 0 else self.upper[node][level - 1]
+        links[:] = -1
+        links[:len(neighbours)] = neighbours
+        for neighbour in neighbours:
+            links = self.base[neighbour] if level == 0 else self.upper[neighbour][level - 1]
+            if node in links:
+                continue
+            count = int((links >= 0).sum())
+            if count < len(links):
+                links[count] = node
+                continue
+            # full, its best len(links) among them and node are kept
+            candidates = links.tolist() + [node]
+            scores = self._scores(candidates, self._vector(neighbour))
+            kept = self._select(sorted(zip(scores, candidates), reverse=True), len(links))
+            links[:] = -1
+            links[:len(kept)] = kept
+
+    def _insert(self, node):
+        vector = self._vector(node)
+        # layers drawn from an exponential distribution, about 1 node in m reaches each next layer
+        level = min(int(-math.log(1.0 - self._random.random()) / math.log(self.m)), 127)
+        self.levels[node] = level
+        if level:
+            self.upper[node] = np.full((level, self.m), -1, dtype=np.int32)
+        if self.entry < 0:
+            self.entry = node
+            return
+        top = int(self.levels[self.entry])
+        entries = self._descend(vector, level)
+        for layer in range(min(level, top), -1, -1):
+            found = self._search_layer(vector, entries, self.ef_construction, layer)
+            self._connect(node, found, layer)
+            entries = [link for _, link in found]
+        if level > top:
+            self.entry = node
+
+    def _bypass(self, node, level, lookup):
+        """New rows of a node's kept links on a layer and of the kept links of its deleted ones"""
+        rows = set()
+        for link in self._links(node, level).tolist():
+            if lookup[link] >= 0:
+                rows.add(int(lookup[link]))
+            else:
+                # a deleted neighbour's neighbours, the paths through it
+                rows.update(int(lookup[hop]) for hop in self._links(link, level).tolist() if lookup[hop] >= 0)
+        rows.discard(int(lookup[node]))
+        return rows
+
+    def _relink_node(self, node, level, candidates):
+        """Choose a node's links on a layer among candidates (new rows)"""
+        candidates = list(candidates)
+        scores = self._scores(candidates, self._vector(node))
+        links = self.base[node] if level == 0 else self.upper[node][level - 1]
+        kept = self._select(sorted(zip(scores, candidates), reverse=True), len(links))
+        links[:] = -1
+        links[:len(kept)] = kept
+
+    def _repair(self, node):
+        """Search the neighbours of a node cut off from the graph again, on every layer it is on"""
+        if node == self.entry:
+            return
+        vector = self._vector(node)
+        level = int(self.levels[node])
+        entries = self._descend(vector, level)
+        for layer in range(level, -1, -1):
+            found = self._search_layer(vector, entries, self.ef_construction, layer)
+            entries = [link for _, link in found]
+            self._connect(node, [(score, link) for score, link in found if link != node], layer)
+
+
+def _relink(links, lookup):
+    """Links renumbered by lookup, the -1s of deleted nodes moved to the end, and whether each row lost one"""
+    renumbered = lookup[links]
+    lost = (renumbered < 0).sum(axis=1) > (links < 0).sum(axis=1)
+    order = np.argsort(renumbered < 0, axis=1, kind="stable")
+    return np.take_along_axis(renumbered, order, axis=1), lost
@@ -0,0 +1,394 @@
+"""
+Fast-path intent router for the crypto orchestration agent
+
+The orchestrator spends a full LLM round trip just to pick one of its four sub-agent tools and forward the
+prompt unchanged. This pre-router makes that choice locally in well under a millisecond:
+
+- RuleRouter: keyword/regex rules with high precision (eg a contract address means token security)
+- TfidfRouter: a small TF-IDF nearest-centroid classifier trained on the routing examples in the
+  orchestrator's own system prompt (the sub-agent "Handles" and "Example Prompts" lists and the routing table)
+
+IntentRouter combines both. When the result is confident the orchestrator calls the sub-agent tool directly,
+otherwise it falls back to the LLM orchestrator. Every decision is timed and counted, see stats() and evaluate().
+
+Two kinds of prompts never take the fast path, whatever the classifier says:
+
+- opinion and advice questions (eg "Is Bitcoin a good investment?"), the orchestrator's prompt makes the LLM answer
+  those with the risk caveats a sub-agent tool called directly would skip
+- market questions without a price or market cue (a MARKET rule), the classifier alone is too eager to send any
+  prompt naming a coin to the market analyst
+- follow ups in a session with history (eg "What about its price?", "What did you just say?"), the sub-agents do
+  not see the conversation, only the LLM orchestrator can tell what "it" or "that" refers to
+
+IntentRouter.split_intents() also spots prompts that ask for more than one sub-agent (eg "What is a honeypot
+and is 0xabc... on chain 1 one?"), so the orchestrator can run each part on its own sub-agent concurrently.
+
+USAGE:
+    router = IntentRouter.from_system_prompt(CRYPTO_SYSTEM_PROMPT, threshold=0.75)
+    decision = router.route("What is the price of Bitcoin?", has_history=bool(agent.messages))
+    if decision.confident:
+        answer = tools[decision.tool](prompt)
+"""
+
+import math
+import re
+import statistics
+import time
+from collections import Counter, defaultdict, deque, namedtuple
+
+EDUCATION = "crypto_educator"
+MARKET = "crypto_market_analyst"
+SECURITY = "crypto_security_analyzer"
+GENERAL = "general_knowledge"
+
+RouteDecision = namedtuple("RouteDecision", ["tool", "confidence", "source", "confident", "latency_ms"])
+# one part of a multi-intent prompt, the clauses for the same tool are joined
+IntentPart = namedtuple("IntentPart", ["tool", "text", "confidence"])
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "to", "of", "in", "on", "for", "and", "or", "me", "my", "i", "it",
+    "this", "that", "do", "does", "can", "you", "your", "with", "be", "by", "at", "as", "any", "right", "now",
+}
+
+# words that make a prompt crypto related, a prompt without any of them goes to the general assistant
+CRYPTO_TERMS_RE = re.compile(
+    r"\b(crypto\w*|bitcoin|btc|ethereum|eth|solana|sol|bnb|xrp|doge\w*|usdt|usdc|stablecoins?|altcoins?|tokens?|"
+    r"coins?|blockchains?|wallets?|nfts?|defi|dex|staking|stake|mining|miners?|ledger|satoshi|web3|dapps?|"
+    r"smart contracts?|contract address|honeypot|rug ?pulls?|airdrops?|memecoins?|exchanges?|binance|coinbase|"
+    r"coingecko|market cap|seed phrase|private key|gas fees?|layer ?[12]|halving|hodl|dca)\b",
+    re.IGNORECASE,
+)
+
+# clause boundaries: end of a sentence, or a conjunction followed by a new question
+CLAUSE_SPLIT_RE = re.compile(
+    r"(?<=[?!;.])\s+(?=\S)"
+    r"|,?\s+(?:and also|and then|and|also|plus)\s+"
+    r"(?=(?:what|how|is|are|can|could|does|do|show|give|check|tell|explain|which|who|why|when)\b)",
+    re.IGNORECASE,
+)
+LEADING_FILLER_RE = re.compile(r"^(also|and|plus|then)\b[,\s]*", re.IGNORECASE)
+PRONOUN_RE = re.compile(r"\b(it|its|them|they|their|this|that|these|those|one)\b", re.IGNORECASE)
+ADDRESS_RE = re.compile(r"\b0x[0-9a-f]{6,}", re.IGNORECASE)
+# refers to the conversation itself, eg "what you just said" or "the first thing I asked"
+META_REFERENCE_RE = re.compile(
+    r"\b(you|i|we) (just |already |first |last )?(said|say|asked|ask|told|mentioned|wrote|answered|suggested)\b"
+    r"|\b(your|my|the) (last|previous|earlier|first) (answer|response|reply|message|question)\b"
+    r"|\b(earlier|above|so far)\b",
+    re.IGNORECASE,
+)
+# asks what something is or means, ie a concept to teach even when the concept is a risk like "honeypot"
+DEFINITION_RE = re.compile(
+    r"^\s*(what (is|are) (a |an |the )?[\w\s-]{1,30}\??$|what does\b.*\bmean\b|explain\b)",
+    re.IGNORECASE,
+)
+
+# asks for an opinion or advice on buying, selling or holding, answered by the LLM orchestrator with its caveats
+ADVICE_RE = re.compile(
+    r"\b(good|bad|safe|smart|wise|right) (investment|buy|bet|time to (buy|sell|invest))\b"
+    r"|\bshould (i|we|you) (buy|sell|hold|invest|trade|get into|stake)\b"
+    r"|\b(worth|recommend) (buying|investing|holding)\b"
+    r"|\b(under|over)valued\b"
+    r"|\bpredictions?\b|\bforecast\b"
+    r"|\bwill \w+ (go|move) (up|down)\b|\b(go|going) to the moon\b",
+    re.IGNORECASE,
+)
+
+# high precision patterns per sub-agent tool
+ROUTING_RULES = {
+    SECURITY: [
+        r"\b0x[0-9a-f]{6,}",
+        r"\bhoneypot\b",
+        r"\b(buy|sell)\s*(/\s*sell\s*)?tax(es)?\b",
+        r"\bownership (is )?renounced\b",
+        r"\bowner (privileges|permissions)\b",
+        r"\bslippage\b",
+        r"\bbackdoors?\b",
+        r"\bblacklist(ed)?\b",
+        r"\bchain ?id\b",
+        r"\bcontract risks?\b",
+        r"\bis (this|the|that) (token|coin|contract) (safe|secure|legit|a scam)\b",
+    ],
+    MARKET: [
+        r"\bprices?\b",
+        r"\bhow much is\b",
+        r"\bworth (right )?now\b",
+        r"\bmarket ?caps?\b",
+        r"\b(trading )?volume\b",
+        r"\btrending\b",
+        r"\bfloor price\b",
+        r"\bcharts?\b",
+        r"\b(24h|7d|30d|24 hour|7 day|30 day)\b",
+        r"\btop \d+\b",
+        r"\b(gainers|losers|all[- ]time high|ath)\b",
+    ],
+    EDUCATION: [
+        r"^\s*(what|who) (is|are|was) (a |an |the )?\w+",
+        r"\bexplain\b",
+        r"\bhow (do|does|can|should) (i|you|it|they|\w+) (buy|store|trade|create|set up|keep|work|choose|start)\b",
+        r"\bhow does\b.*\bwork\b",
+        r"\bdifference between\b",
+        r"\bwhat does\b.*\bmean\b",
+        r"\b(teach|beginners?|learn|basics)\b",
+        r"\b(scams?|risks?|safely|safe)\b",
+    ],
+}
+
+
+def tokenize(text):
+    """Lowercase word unigrams and bigrams without stop words"""
+    words = [w for w in TOKEN_RE.findall(text.lower()) if w not in STOP_WORDS]
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def is_follow_up(prompt):
+    """Whether the prompt refers to earlier turns, a pronoun (without a contract address naming its subject) or the
+    conversation itself"""
+    return bool(META_REFERENCE_RE.search(prompt) or (PRONOUN_RE.search(prompt) and not ADDRESS_RE.search(prompt)))
+
+
+def parse_routing_examples(system_prompt):
+    """Extract (text, tool) training examples from the orchestrator system prompt
+
+    Uses each sub-agent section's Purpose, Handles and Example Prompts, plus the routing table rows.
+    """
+    examples = []
+    section_tools = {}
+    for section in re.split(r"^### ", system_prompt, flags=re.MULTILINE)[1:]:
+        title = section.splitlines()[0]
+        tool_match = re.search(r"Tool:\**\s*(\w+)", section)
+        if not tool_match:
+            continue
+        tool_name = tool_match.group(1)
+        section_tools[title.lower()] = tool_name
+        purpose = re.search(r"\*\*Purpose\*\*:\s*(.+)", section)
+        if purpose:
+            examples.append((purpose.group(1), tool_name))
+        for line in section.splitlines():
+            bullet = re.match(r"^\s{2,}-\s+(.+)$", line)
+            if bullet:
+                examples.append((bullet.group(1).strip().strip('"'), tool_name))
+
+    # routing table rows look like | "Explain blockchain to me" | Education |
+    for prompt, label in re.findall(r'^\|\s*"([^"]+)"\s*\|\s*([^|]+?)\s*\|', system_prompt, flags=re.MULTILINE):
+        for title, tool_name in section_tools.items():
+            if label.lower() in title:
+                examples.append((prompt, tool_name))
+                break
+    return examples
+
+
+class RuleRouter:
+    """Keyword/regex rules, returns the tools whose rules match"""
+
+    def __init__(self, rules=None):
+        rules = ROUTING_RULES if rules is None else rules
+        self.rules = {tool: [re.compile(p, re.IGNORECASE) for p in patterns] for tool, patterns in rules.items()}
+
+    def match(self, prompt):
+        hits = {tool for tool, patterns in self.rules.items() if any(p.search(prompt) for p in patterns)}
+        if not CRYPTO_TERMS_RE.search(prompt):
+            # nothing crypto about the prompt, price or "what is" alone does not make it a crypto question
+            hits = {GENERAL} if not hits & {SECURITY} else hits
+        return hits
+
+
+class TfidfRouter:
+    """Nearest-centroid TF-IDF classifier"""
+
+    def __init__(self, examples, min_similarity=0.05):
+        """
+        Args:
+            examples: List of (text, tool) training examples
+            min_similarity: Best cosine similarity below which the classifier abstains
+        """
+        self.min_similarity = min_similarity
+        documents = [(Counter(tokenize(text)), tool) for text, tool in examples]
+        doc_freq = Counter(term for counts, _ in documents for term in counts)
+        n_docs = len(documents)
+        self.idf = {term: math.log((1 + n_docs) / (1 + df)) + 1 for term, df in doc_freq.items()}
+
+        centroids = defaultdict(Counter)
+        for counts, tool in documents:
+            for term, weight in self._vectorize(counts).items():
+                centroids[tool][term] += weight
+        self.centroids = {tool: self._normalize(vector) for tool, vector in centroids.items()}
+
+    def classify(self, prompt):
+        """Return (tool, confidence, scores), confidence being the margin of the best score over the runner up"""
+        query = self._vectorize(Counter(tokenize(prompt)))
+        scores = {
+            tool: sum(weight * centroid.get(term, 0.0) for term, weight in query.items())
+            for tool, centroid in self.centroids.items()
+        }
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best_tool, best = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if best < self.min_similarity:
+            return None, 0.0, scores
+        return best_tool, (best - runner_up) / best, scores
+
+    def _vectorize(self, counts):
+        vector = {term: (1 + math.log(count)) * self.idf[term] for term, count in counts.items() if term in self.idf}
+        return self._normalize(vector)
+
+    @staticmethod
+    def _normalize(vector):
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        return {term: w / norm for term, w in vector.items()} if norm else {}
+
+
+class IntentRouter:
+    """Combines the rules and the classifier into one routing decision with a confidence"""
+
+    def __init__(self, rule_router, classifier, threshold=0.75):
+        """
+        Args:
+            rule_router: A RuleRouter, or None to only use the classifier
+            classifier: A TfidfRouter, or None to only use the rules
+            threshold: Confidence at or above which a decision is used instead of the LLM orchestrator
+        """
+        self.rule_router = rule_router
+        self.classifier = classifier
+        self.threshold = threshold
+        # recent routing latencies, bounded so a long running container does not grow it forever
+        self._latencies = deque(maxlen=10000)
+        self._counts = Counter()
+
+    @classmethod
+    def from_system_prompt(cls, system_prompt, threshold=0.75, extra_examples=None):
+        """Build a router whose classifier is trained on the routing examples in the system prompt"""
+        examples = parse_routing_examples(system_prompt) + list(extra_examples or [])
+        return cls(RuleRouter(), TfidfRouter(examples), threshold=threshold)
+
+    def route(self, prompt, has_history=False):
+        """Pick a sub-agent tool for the prompt
+
+        Args:
+            prompt: The user's prompt
+            has_history: Whether the session has earlier turns the prompt may refer to
+
+        Returns:
+            A RouteDecision, its `confident` flag says whether it can skip the LLM orchestrator
+        """
+        start = time.perf_counter()
+        if has_history and is_follow_up(prompt):
+            tool, confidence, source = None, 0.0, "follow_up"
+        else:
+            tool, confidence, source = self._decide(prompt)
+        latency_ms = (time.perf_counter() - start) * 1000
+        confident = tool is not None and confidence >= self.threshold
+
+        self._latencies.append(latency_ms)
+        self._counts["fast_path" if confident else "fallback"] += 1
+        if confident:
+            self._counts[f"tool:{tool}"] += 1
+        return RouteDecision(tool, round(confidence, 3), source, confident, round(latency_ms, 3))
+
+    def split_intents(self, prompt, has_history=False):
+        """Split a prompt asking for more than one sub-agent into one part per sub-agent tool
+
+        Args:
+            prompt: The user's prompt
+            has_history: Whether the session has earlier turns the prompt may refer to
+
+        Returns:
+            A list of at least two IntentParts in prompt order, or None when the prompt has a single intent or
+            any of its clauses cannot be routed confidently (the orchestrator then handles it as usual)
+        """
+        if has_history and is_follow_up(prompt):
+            return None
+        clauses = [LEADING_FILLER_RE.sub("", c.strip()) for c in CLAUSE_SPLIT_RE.split(prompt)]
+        clauses = [c for c in clauses if c]
+        if len(clauses) < 2:
+            return None
+
+        parts = {}
+        for clause in clauses:
+            tool, confidence, _ = self._decide_clause(clause, prompt)
+            if tool is None or confidence < self.threshold:
+                return None
+            if tool in parts:
+                text, best = parts[tool]
+                parts[tool] = (f"{text} {clause}", min(best, confidence))
+            else:
+                parts[tool] = (clause, confidence)
+        if len(parts) < 2:
+            return None
+        self._counts["fan_out"] += 1
+        return [IntentPart(tool, text, round(confidence, 3)) for tool, (text, confidence) in parts.items()]
+
+    def _decide_clause(self, clause, prompt):
+        """Route one clause of a multi-intent prompt, using the rest of the prompt as context"""
+        if (
+            not ADDRESS_RE.search(clause)
+            and DEFINITION_RE.search(clause)
+            and not (self.rule_router and MARKET in self.rule_router.match(clause))
+        ):
+            return EDUCATION, 0.9, "definition"
+        if PRONOUN_RE.search(clause) and not CRYPTO_TERMS_RE.search(clause) and CRYPTO_TERMS_RE.search(prompt):
+            # eg "how do I store it safely?" is about the coin named in another clause
+            terms = ", ".join(dict.fromkeys(m.group(0).lower() for m in CRYPTO_TERMS_RE.finditer(prompt)))
+            clause = f"{clause} ({terms})"
+        return self._decide(clause)
+
+    def _decide(self, prompt):
+        if ADVICE_RE.search(prompt):
+            return None, 0.0, "advice"
+        hits = self.rule_router.match(prompt) if self.rule_router else set()
+        clf_tool, clf_conf = None, 0.0
+        if self.classifier:
+            clf_tool, clf_conf, _ = self.classifier.classify(prompt)
+        if clf_tool == MARKET and MARKET not in hits:
+            # no price or market cue, eg a coin name alone, the classifier's choice is not trusted on its own
+            clf_conf = 0.0
+
+        if len(hits) == 1:
+            (rule_tool,) = hits
+            if clf_tool in (None, rule_tool):
+                return rule_tool, 0.9 + 0.1 * clf_conf, "rules"
+            # the classifier disagrees, only trust the rule if the classifier is unsure
+            return rule_tool, 0.9 - 0.5 * clf_conf, "rules"
+        if len(hits) > 1:
+            # several rules matched (eg "what is a honeypot"), the classifier breaks the tie
+            if clf_tool in hits:
+                return clf_tool, clf_conf, "rules+classifier"
+            return None, 0.0, "ambiguous"
+        return clf_tool, clf_conf, "classifier"
+
+    def stats(self):
+        """Routing counts and latency for reporting"""
+        latencies = sorted(self._latencies)
+        total = len(latencies)
+        return {
+            "routed": total,
+            "fast_path": self._counts["fast_path"],
+            "fallback": self._counts["fallback"],
+            "fan_out": self._counts["fan_out"],
+            "fast_path_rate": round(self._counts["fast_path"] / total, 3) if total else 0.0,
+            "by_tool": {k[5:]: v for k, v in self._counts.items() if k.startswith("tool:")},
+            "mean_latency_ms": round(statistics.fmean(latencies), 3) if total else 0.0,
+            "p95_latency_ms": round(latencies[int(0.95 * (total - 1))], 3) if total else 0.0,
+        }
+
+    def evaluate(self, labelled_prompts):
+        """Measure routing quality on (prompt, expected_tool) pairs
+
+        Returns:
+            Accuracy of the fast-path decisions, how many prompts took the fast path, and routing latency
+        """
+        decisions = [(self.route(prompt), expected) for prompt, expected in labelled_prompts]
+        fast = [(d, expected) for d, expected in decisions if d.confident]
+        errors = [(p, d.tool, expected) for (p, _), (d, expected) in zip(labelled_prompts, decisions)
+                  if d.confident and d.tool != expected]
+        latencies = sorted(d.latency_ms for d, _ in decisions)
+        return {
+            "prompts": len(decisions),
+            "fast_path": len(fast),
+            "coverage": round(len(fast) / len(decisions), 3) if decisions else 0.0,
+            "fast_path_accuracy": round(sum(d.tool == e for d, e in fast) / len(fast), 3) if fast else 0.0,
+            "top1_accuracy": round(sum(d.tool == e for d, e in decisions) / len(decisions), 3) if decisions else 0.0,
+            "mean_latency_ms": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+            "max_latency_ms": round(latencies[-1], 3) if latencies else 0.0,
+            "errors": errors,
+        }
@@ -0,0 +1,593 @@
+"""
+Incremental ingestion of the knowledge base documents into a vector index
+
+The lab 1 ingestion loop downloads every document and its metadata, embeds each one and writes every vector again
+on every run, so re-syncing costs the whole corpus whatever changed. Here a manifest keeps, per document, a version
+(a content hash, or the S3 ETags) and the ids of its chunks, where a chunk id is the hash of the chunk's text and
+metadata. A run then:
+
+- lists the source, documents whose version did not change are not even read
+- chunks the new and changed documents, only chunks whose id is not already indexed are embedded and upserted,
+  the chunks they no longer have are deleted
+- deletes the chunks of removed documents
+- reports what changed (IngestReport)
+
+so its cost is proportional to the diff. A different embedder or chunking re-embeds everything. Documents are
+chunked by chunking.MarkdownChunker, along their headings and paragraphs.
+
+Sources list and read documents: FolderSource (a local folder, eg resources/kb-datasource) and S3Source (the lab's
+bucket). Sinks store the vectors: LocalIndexSink (the index of local_kb.py) and S3VectorsSink (an S3 Vectors index).
+
+A run is a pipeline rather than a loop: documents are read by a bounded pool of threads, their new chunks are
+embedded in batches by an EmbeddingPool (backing off when the model throttles) while the next documents are read,
+and vectors are written to the sink as batches complete, in put_vectors batches of 500 for S3 Vectors. The report
+includes the throughput (docs/s, chunks/s). stub_aws.py has local stand-ins for S3, Bedrock and S3 Vectors, see
+Test_KB_Ingestion.py.
+
+USAGE:
+    # the local index of crypto_educator
+    python kb_ingestion.py --datasource ../resources/kb-datasource --index kb_index
+
+    # the lab's S3 Vectors index
+    python kb_ingestion.py --s3-bucket my-bucket --s3-prefix crypto --vector-bucket my-vectors \
+        --vector-index my-index --manifest s3_vectors_manifest.json --embedder bedrock
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+import numpy as np
+from botocore.exceptions import ClientError
+from chunking import MarkdownChunker
+from local_kb import CHUNKS_FILE, MANIFEST_FILE, VECTORS_FILE, create_embedder
+from hnsw import FILES as HNSW_FILES, HNSWIndex
+from quantization import FILES as QUANTIZED_FILES, quantize
+from config import (
+    REGION,
+    KB_DATASOURCE_DIR,
+    KB_LOCAL_INDEX_DIR,
+    KB_LOCAL_EMBEDDER,
+    KB_CHUNK_MAX_TOKENS,
+    KB_CHUNK_OVERLAP_TOKENS,
+    KB_INGEST_READ_WORKERS,
+    KB_INGEST_EMBED_WORKERS,
+    KB_INGEST_BATCH_SIZE,
+    KB_INGEST_MAX_RETRIES,
+    KB_VECTOR_QUANTIZATION,
+    KB_PQ_SUBSPACES,
+    KB_ANN_INDEX,
+    KB_HNSW_M,
+    KB_HNSW_EF_CONSTRUCTION,
+)
+
+# manifest of a local index, next to its vectors
+INGEST_MANIFEST_FILE = "ingest_manifest.json"
+
+# documents by name, chunks by count, throttled is the number of embedding calls retried after throttling and the
+# throughput counts the documents read and chunks embedded
+IngestReport = namedtuple(
+    "IngestReport",
+    ["added", "changed", "removed", "unchanged", "embedded", "deleted", "kept", "throttled", "seconds",
+     "documents_per_second", "chunks_per_second"],
+)
+
+# error codes of a throttled (or momentarily unavailable) Bedrock call, worth retrying after a pause
+THROTTLING_ERRORS = {
+    "ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException", "ModelNotReadyException",
+}
+
+
+def chunk_ids(document, chunks, metadata):
+    """Stable id of each chunk of a document, from its text and the document's metadata"""
+    ids = []
+    seen = {}
+    metadata_json = json.dumps(metadata, sort_keys=True)
+    for chunk in chunks:
+        digest = hashlib.sha256(f"{chunk}\0{metadata_json}".encode("utf-8")).hexdigest()[:16]
+        # a repeated paragraph gets its own id
+        seen[digest] = seen.get(digest, 0) + 1
+        ids.append(f"{document}#{digest}" + (f"-{seen[digest]}" if seen[digest] > 1 else ""))
+    return ids
+
+
+def format_report(report):
+    return (
+        f"{len(report.added)} added, {len(report.changed)} changed, {len(report.removed)} removed, "
+        f"{len(report.unchanged)} unchanged documents: {report.embedded} chunks embedded, "
+        f"{report.deleted} deleted, {report.kept} kept in {report.seconds:.2f}s "
+        f"({report.documents_per_second:.1f} docs/s, {report.chunks_per_second:.1f} chunks/s, "
+        f"{report.throttled} throttled)"
+    )
+
+
+class EmbeddingPool:
+    """Embeds batches of texts on a thread pool, adapting to the model's rate limit
+
+    Calls in flight are capped by a limit that halves whenever a call is throttled and grows back by about one
+    call per round of successes (AIMD, like TCP congestion control), so the pool settles just under the quota
+    instead of every worker hitting it in turn. A throttled call is retried after an exponential backoff with jitter.
+    Embedders with a max_batch (eg 1 for Bedrock, one text per invoke_model) are called max_batch texts at a
+    time, so a retry only repeats the throttled call.
+    """
+
+    def __init__(self, embedder, workers=8, max_retries=6, base_delay=0.2, max_delay=20.0):
+        """
+        Args:
+            embedder: Embeds a list of texts, see embeddings.py
+            workers: Batches embedded at once, the most calls in flight
+            max_retries: Retries of a throttled call before its error is raised
+            base_delay: Seconds of the first backoff, doubled with every retry (with jitter)
+            max_delay: Longest backoff in seconds
+        """
+        self.embedder = embedder
+        self.workers = workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.throttled = 0
+        self._limit = float(workers)
+        self._in_flight = 0
+        self._epoch = 0  # bumped whenever the limit is halved
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="kb-embed")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._executor.shutdown(wait=True)
+
+    @property
+    def limit(self):
+        """Calls currently allowed in flight"""
+        return max(1, int(self._limit))
+
+    def submit(self, items):
+        """Embed the texts of items (dicts with a "text"), a future of (items, vectors)"""
+        return self._executor.submit(self._embed, items)
+
+    def _embed(self, items):
+        texts = [item["text"] for item in items]
+        step = getattr(self.embedder, "max_batch", None) or len(texts)
+        vectors = [self._call(texts[i:i + step]) for i in range(0, len(texts), step)]
+        return items, np.concatenate(vectors)
+
+    def _call(self, texts):
+        for attempt in range(self.max_retries + 1):
+            with self._condition:
+                while self._in_flight >= self.limit:
+                    self._condition.wait()
+                self._in_flight += 1
+                epoch = self._epoch
+            throttled = False
+            try:
+                return self.embedder.embed(texts)
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in THROTTLING_ERRORS or attempt == self.max_retries:
+                    raise
+                throttled = True
+            finally:
+                with self._condition:
+                    self._in_flight -= 1
+                    if throttled:
+                        self.throttled += 1
+                        # calls started before the last decrease were throttled at the old limit, halve once per round
+                        if epoch == self._epoch:
+                            self._limit = max(1.0, self._limit / 2)
+                            self._epoch += 1
+                    else:
+                        self._limit = min(float(self.workers), self._limit + 1 / self._limit)
+                    self._condition.notify_all()
+            # full jitter, so the throttled calls do not all retry at the same moment
+            time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+
+
+class FolderSource:
+    """Markdown documents (and their .metadata.json) in a local folder"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def list(self):
+        """Dict of document name to version, a hash of the document and its metadata file"""
+        versions = {}
+        for path in sorted(glob.glob(os.path.join(self.path, "*.md"))):
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                digest.update(f.read())
+            if os.path.exists(f"{path}.metadata.json"):
+                with open(f"{path}.metadata.json", "rb") as f:
+                    digest.update(b"\0" + f.read())
+            versions[os.path.basename(path)] = digest.hexdigest()
+        return versions
+
+    def read(self, document):
+        """The document's text and metadata attributes"""
+        path = os.path.join(self.path, document)
+        metadata = {}
+        if os.path.exists(f"{path}.metadata.json"):
+            with open(f"{path}.metadata.json", encoding="utf-8") as f:
+                metadata = json.load(f).get("metadataAttributes", {})
+        with open(path, encoding="utf-8") as f:
+            return f.read(), metadata
+
+
+class S3Source:
+    """Markdown documents (and their .metadata.json) under an S3 prefix, unchanged documents are never downloaded"""
+
+    def __init__(self, bucket, prefix="", client=None, region=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client or boto3.client("s3", region_name=region)
+        self._with_metadata = set()  # documents the listing found a metadata object for
+
+    def list(self):
+        """Dict of object key to version, the ETags of the document and its metadata object"""
+        etags = {}
+        for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                etags[obj["Key"]] = obj["ETag"].strip('"')
+        self._with_metadata = {key[:-len(".metadata.json")] for key in etags if key.endswith(".md.metadata.json")}
+        return {
+            key: f"{etag}:{etags.get(f'{key}.metadata.json', '')}"
+            for key, etag in sorted(etags.items()) if key.endswith(".md")
+        }
+
+    def read(self, document):
+        text = self.client.get_object(Bucket=self.bucket, Key=document)["Body"].read().decode("utf-8")
+        metadata = {}
+        # no request for a metadata object the listing did not have
+        if document in self._with_metadata:
+            body = self.client.get_object(Bucket=self.bucket, Key=f"{document}.metadata.json")["Body"].read()
+            metadata = json.loads(body).get("metadataAttributes", {})
+        return text, metadata
+
+
+class LocalIndexSink:
+    """The index folder of local_kb.LocalKnowledgeBase, rewritten (atomically) when a run changes it"""
+
+    def __init__(self, index_dir, quantization=None, subspaces=64, hnsw=None):
+        """
+        Args:
+            index_dir: The index folder
+            quantization: Optional quantized copy of the vectors the searches scan, "int8" or "pq" (see
+                          quantization.py), changing it rewrites the index
+            subspaces: Subspaces of the "pq" quantization, a code is one byte per subspace
+            hnsw: Optional build parameters of an HNSW graph of the vectors (see hnsw.py), eg {"m": 16,
+                  "ef_construction": 256}, the graph of the index is updated rather than rebuilt
+        """
+        self.index_dir = index_dir
+        self.manifest_path = os.path.join(index_dir, INGEST_MANIFEST_FILE)
+        self.quantization = None
+        if quantization == "pq":
+            self.quantization = {"kind": "pq", "subspaces": subspaces}
+        elif quantization:
+            self.quantization = {"kind": quantization}
+        self.hnsw = dict(hnsw) if hnsw else None
+        self._chunks = {}  # id -> chunk dict
+        self._vectors = {}  # id -> vector
+        self._changed = False
+        self._graph = None  # the HNSW graph of the index and the chunk id of each of its rows
+        self._graph_ids = []
+        self._upserted = set()
+        if os.path.exists(os.path.join(index_dir, MANIFEST_FILE)):
+            with open(os.path.join(index_dir, MANIFEST_FILE), encoding="utf-8") as f:
+                manifest = json.load(f)
+            self._changed = manifest.get("quantization") != self.quantization or manifest.get("hnsw") != self.hnsw
+            with open(os.path.join(index_dir, CHUNKS_FILE), encoding="utf-8") as f:
+                chunks = json.load(f)
+            vectors = np.load(os.path.join(index_dir, VECTORS_FILE))
+            for chunk, vector in zip(chunks, vectors):
+                if "id" in chunk:
+                    self._chunks[chunk["id"]] = chunk
+                    self._vectors[chunk["id"]] = vector
+            if self.hnsw and manifest.get("hnsw") == self.hnsw and all("id" in chunk for chunk in chunks):
+                self._graph = HNSWIndex.open(index_dir, self.hnsw, vectors, mmap=False)
+                self._graph_ids = [chunk["id"] for chunk in chunks]
+        else:
+            self._changed = True
+
+    def upsert(self, items):
+        """Add or replace chunks, dicts with the id, vector, document, text and metadata"""
+        for item in items:
+            self._chunks[item["id"]] = {k: item[k] for k in ("id", "document", "text", "metadata")}
+            self._vectors[item["id"]] = item["vector"]
+            self._upserted.add(item["id"])
+            self._changed = True
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            if self._chunks.pop(chunk_id, None) is not None:
+                del self._vectors[chunk_id]
+                self._changed = True
+
+    def commit(self, embedder_name, dim, chunker_name):
+        """Write the index if the run changed it"""
+        if not self._changed:
+            return
+        os.makedirs(self.index_dir, exist_ok=True)
+        # ordered by document then chunk id, so an unchanged corpus always gives the same files
+        ids = sorted(self._chunks, key=lambda chunk_id: (self._chunks[chunk_id]["document"], chunk_id))
+        vectors = np.array([self._vectors[i] for i in ids], dtype=np.float32).reshape(len(ids), dim)
+        chunks = [self._chunks[i] for i in ids]
+        manifest = {
+            "embedder": embedder_name,
+            "dim": dim,
+            "chunks": len(chunks),
+            "documents": len({chunk["document"] for chunk in chunks}),
+            "chunker": chunker_name,
+            "quantization": self.quantization if chunks else None,
+            "hnsw": self.hnsw if chunks else None,
+            "built_at": time.time(),
+        }
+        # replaced, not overwritten, so a process with the old vectors memory-mapped keeps reading the old file
+        self._replace(VECTORS_FILE, lambda f: np.save(f, vectors), binary=True)
+        if manifest["quantization"]:
+            for name, array in quantize(vectors, **self.quantization).items():
+                self._replace(name, lambda f: np.save(f, array), binary=True)
+        if manifest["hnsw"]:
+            for name, array in self._update_graph(ids, vectors).arrays().items():
+                self._replace(name, lambda f: np.save(f, array), binary=True)
+        self._replace(CHUNKS_FILE, lambda f: json.dump(chunks, f))
+        # written last, an index without a manifest is incomplete
+        self._replace(MANIFEST_FILE, lambda f: json.dump(manifest, f, indent=2))
+        # the files of a quantization or graph the index no longer has
+        kind = (manifest["quantization"] or {}).get("kind")
+        stale = [name for other, names in QUANTIZED_FILES.items() if other != kind for name in names]
+        for name in stale + ([] if manifest["hnsw"] else list(HNSW_FILES)):
+            if os.path.exists(os.path.join(self.index_dir, name)):
+                os.remove(os.path.join(self.index_dir, name))
+        self._changed = False
+        self._upserted.clear()
+
+    def _update_graph(self, ids, vectors):
+        """The HNSW graph of the committed vectors, the previous one's rows followed and the new rows inserted"""
+        graph = self._graph
+        row = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        # a replaced chunk (eg embedded again) is deleted and inserted
+        mapping = [-1 if chunk_id in self._upserted else row.get(chunk_id, -1) for chunk_id in self._graph_ids]
+        if graph is not None and sum(new >= 0 for new in mapping) >= len(ids) / 2:
+            graph.remap(mapping, vectors)
+        else:
+            # mostly new rows, a new graph is as fast to build and better
+            graph = HNSWIndex(vectors, **self.hnsw)
+        graph.add(range(len(ids)))
+        self._graph, self._graph_ids = graph, ids
+        return graph
+
+    def _replace(self, name, write, binary=False):
+        path = os.path.join(self.index_dir, name)
+        with open(f"{path}.tmp", "wb" if binary else "w", **({} if binary else {"encoding": "utf-8"})) as f:
+            write(f)
+        os.replace(f"{path}.tmp", path)
+
+
+class S3VectorsSink:
+    """An S3 Vectors index, eg the one the lab's Bedrock Knowledge Base reads
+
+    Upserted vectors are buffered and written BATCH_SIZE at a time (the most put_vectors takes), commit() writes
+    the rest.
+    """
+
+    # most vectors per put_vectors or delete_vectors call
+    BATCH_SIZE = 500
+
+    def __init__(self, vector_bucket, index_name, client=None, region=None):
+        self.vector_bucket = vector_bucket
+        self.index_name = index_name
+        self.client = client or boto3.client("s3vectors", region_name=region)
+        self._pending = []
+
+    def upsert(self, items):
+        self._pending.extend(
+            {
+                "key": item["id"],
+                "data": {"float32": [float(x) for x in item["vector"]]},
+                "metadata": {"source_text": item["text"], "document": item["document"], **item["metadata"]},
+            }
+            for item in items
+        )
+        while len(self._pending) >= self.BATCH_SIZE:
+            self._flush()
+
+    def delete(self, ids):
+        ids = list(ids)
+        for i in range(0, len(ids), self.BATCH_SIZE):
+            self.client.delete_vectors(
+                vectorBucketName=self.vector_bucket, indexName=self.index_name, keys=ids[i:i + self.BATCH_SIZE]
+            )
+
+    def commit(self, embedder_name, dim, chunker_name):
+        """Write the buffered vectors"""
+        while self._pending:
+            self._flush()
+
+    def _flush(self):
+        vectors, self._pending = self._pending[:self.BATCH_SIZE], self._pending[self.BATCH_SIZE:]
+        self.client.put_vectors(vectorBucketName=self.vector_bucket, indexName=self.index_name, vectors=vectors)
+
+
+def load_manifest(path):
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {"documents": {}}
+
+
+def save_manifest(path, manifest):
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def _bounded_map(executor, fn, items, window):
+    """executor.map that keeps at most window calls in flight, so results are not all held at once"""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def ingest(source, sink, embedder, manifest_path, chunker=None, read_workers=16, embed_workers=8, batch_size=16,
+           max_retries=6):
+    """Bring the sink in line with the source, embedding only the chunks it does not have
+
+    Documents are read by read_workers threads and their new chunks embedded in batches of batch_size by
+    embed_workers threads (see EmbeddingPool) while the next documents are read, every embedded batch is written
+    to the sink as it completes.
+
+    Args:
+        source: FolderSource or S3Source
+        sink: LocalIndexSink or S3VectorsSink
+        embedder: Embeds the chunks (see embeddings.py)
+        manifest_path: JSON file of the versions and chunk ids already in the sink, written at the end of the run
+        chunker: Splits the documents into chunks, a chunking.MarkdownChunker by default
+        read_workers: Documents read at once
+        embed_workers: Embedding batches in flight at once
+        batch_size: Chunks per embedding batch
+        max_retries: Retries of a throttled embedding batch
+
+    Returns:
+        An IngestReport
+    """
+    started = time.perf_counter()
+    chunker = chunker or MarkdownChunker()
+    manifest = load_manifest(manifest_path)
+    indexed = manifest["documents"]
+    if manifest.get("embedder") != embedder.name or manifest.get("chunker") != chunker.name:
+        # vectors of another embedder, or other chunks, cannot be reused
+        sink.delete(chunk_id for entry in indexed.values() for chunk_id in entry["chunks"])
+        indexed = {}
+
+    versions = source.list()
+    added = [document for document in versions if document not in indexed]
+    changed = [document for document in versions if document in indexed and indexed[document]["version"] != versions[document]]
+    removed = [document for document in indexed if document not in versions]
+    unchanged = [document for document in versions if document in indexed and document not in changed]
+
+    stale_ids, documents = [], {document: indexed[document] for document in unchanged}
+    for document in removed:
+        stale_ids.extend(indexed[document]["chunks"])
+    dim = manifest.get("dim") if manifest.get("embedder") == embedder.name else None
+    embedded = 0
+    batch = []
+    pool = EmbeddingPool(embedder, workers=embed_workers, max_retries=max_retries)
+    in_flight = deque()
+
+    def write(future):
+        nonlocal dim, embedded
+        items, vectors = future.result()
+        dim = int(vectors.shape[1])
+        for item, vector in zip(items, vectors):
+            item["vector"] = vector
+        # only this thread writes to the sink
+        sink.upsert(items)
+        embedded += len(items)
+
+    def read(document):
+        return document, source.read(document)
+
+    with pool, ThreadPoolExecutor(read_workers, thread_name_prefix="kb-read") as readers:
+        for document, (text, metadata) in _bounded_map(readers, read, added + changed, read_workers * 2):
+            chunks = list(chunker.chunk(text, metadata))
+            ids = chunk_ids(document, [chunk.text for chunk in chunks], metadata)
+            old_ids = set(indexed.get(document, {}).get("chunks", []))
+            batch.extend(
+                {"id": chunk_id, "document": document, "text": chunk.text, "metadata": chunk.metadata}
+                for chunk_id, chunk in zip(ids, chunks) if chunk_id not in old_ids
+            )
+            stale_ids.extend(old_ids - set(ids))
+            documents[document] = {"version": versions[document], "chunks": ids}
+            while len(batch) >= batch_size:
+                in_flight.append(pool.submit(batch[:batch_size]))
+                del batch[:batch_size]
+                # bounded, reading waits for the embeddings instead of piling up chunks
+                while len(in_flight) > embed_workers * 2:
+                    write(in_flight.popleft())
+        if batch:
+            in_flight.append(pool.submit(batch))
+        while in_flight:
+            write(in_flight.popleft())
+
+    sink.delete(stale_ids)
+    sink.commit(embedder.name, dim if dim is not None else embedder.dim, chunker.name)
+    save_manifest(manifest_path, {"embedder": embedder.name, "dim": dim, "chunker": chunker.name, "documents": documents})
+
+    seconds = time.perf_counter() - started
+    return IngestReport(
+        added=added,
+        changed=changed,
+        removed=removed,
+        unchanged=unchanged,
+        embedded=embedded,
+        deleted=len(stale_ids),
+        kept=sum(len(entry["chunks"]) for entry in documents.values()) - embedded,
+        throttled=pool.throttled,
+        seconds=seconds,
+        documents_per_second=(len(added) + len(changed)) / seconds if seconds else 0.0,
+        chunks_per_second=embedded / seconds if seconds else 0.0,
+    )
+
+
+def sync_local_index(datasource_dir, index_dir, embedder, chunker=None, quantization=None, subspaces=64, hnsw=None,
+                     **kwargs):
+    """Bring a local_kb index folder in line with a datasource folder, kwargs are passed to ingest()"""
+    sink = LocalIndexSink(index_dir, quantization, subspaces, hnsw)
+    return ingest(FolderSource(datasource_dir), sink, embedder, sink.manifest_path, chunker, **kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally ingest the knowledge base documents into a vector index")
+    parser.add_argument("--datasource", default=KB_DATASOURCE_DIR, help="folder of markdown documents")
+    parser.add_argument("--index", default=KB_LOCAL_INDEX_DIR, help="local index folder to write")
+    parser.add_argument("--s3-bucket", help="read the documents from this S3 bucket instead of --datasource")
+    parser.add_argument("--s3-prefix", default="", help="prefix of the documents in --s3-bucket")
+    parser.add_argument("--vector-bucket", help="write to this S3 Vectors bucket instead of --index")
+    parser.add_argument("--vector-index", help="index in --vector-bucket")
+    parser.add_argument("--manifest", help="manifest file, required with --vector-bucket")
+    parser.add_argument("--max-tokens", type=int, default=KB_CHUNK_MAX_TOKENS, help="maximum tokens per chunk")
+    parser.add_argument("--overlap-tokens", type=int, default=KB_CHUNK_OVERLAP_TOKENS, help="tokens repeated between chunks")
+    parser.add_argument("--embedder", choices=["hashing", "bedrock"], default=KB_LOCAL_EMBEDDER)
+    parser.add_argument("--quantization", choices=["", "int8", "pq"], default=KB_VECTOR_QUANTIZATION,
+                        help="quantized copy of the local index's vectors")
+    parser.add_argument("--subspaces", type=int, default=KB_PQ_SUBSPACES, help="subspaces of the pq quantization")
+    parser.add_argument("--ann", choices=["", "hnsw"], default=KB_ANN_INDEX, help="approximate nearest-neighbour index")
+    parser.add_argument("--hnsw-m", type=int, default=KB_HNSW_M, help="links per chunk of the hnsw graph")
+    parser.add_argument("--hnsw-ef-construction", type=int, default=KB_HNSW_EF_CONSTRUCTION,
+                        help="candidates searched when linking a chunk")
+    parser.add_argument("--read-workers", type=int, default=KB_INGEST_READ_WORKERS, help="documents read at once")
+    parser.add_argument("--embed-workers", type=int, default=KB_INGEST_EMBED_WORKERS, help="embedding batches at once")
+    parser.add_argument("--batch-size", type=int, default=KB_INGEST_BATCH_SIZE, help="chunks per embedding batch")
+    args = parser.parse_args()
+
+    if args.vector_bucket and not (args.vector_index and args.manifest):
+        parser.error("--vector-bucket needs --vector-index and --manifest")
+    document_source = S3Source(args.s3_bucket, args.s3_prefix, region=REGION) if args.s3_bucket else FolderSource(args.datasource)
+    if args.vector_bucket:
+        vector_sink = S3VectorsSink(args.vector_bucket, args.vector_index, region=REGION)
+        manifest_file = args.manifest
+    else:
+        hnsw_params = {"m": args.hnsw_m, "ef_construction": args.hnsw_ef_construction} if args.ann == "hnsw" else None
+        vector_sink = LocalIndexSink(args.index, args.quantization, args.subspaces, hnsw_params)
+        manifest_file = args.manifest or vector_sink.manifest_path
+    result = ingest(
+        document_source, vector_sink, create_embedder(args.embedder, REGION), manifest_file,
+        MarkdownChunker(args.max_tokens, args.overlap_tokens),
+        read_workers=args.read_workers, embed_workers=args.embed_workers, batch_size=args.batch_size,
+        max_retries=KB_INGEST_MAX_RETRIES,
+    )
+    for name in ("added", "changed", "removed"):
+        for document in getattr(result, name):
+            print(f"{name:>8}: {document}")
+    print(format_report(result))
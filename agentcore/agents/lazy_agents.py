@@ -0,0 +1,197 @@
+"""
+Lazy loading of the sub-agent tools, and a report of where container start up time goes
+
+Importing a sub-agent module builds its BedrockModel and pools, and the CoinGecko module pulls in the whole MCP
+client stack, so importing all four before the runtime can accept traffic adds seconds to every cold start.
+LazyAgentTool stands in for a sub-agent @tool:
+
+- its tool spec is built from the module's source without importing it, identical to the real tool's spec,
+  so the orchestrator agent can be created straight away
+- the module is imported on first use, by the first request routed to it or by the background warm-up
+- a module level warm_up() function, if the module has one, is run by the warm-up thread (eg to open the
+  CoinGecko MCP sessions) so the first request does not pay for it
+- a module level shutdown() function, if the module has one and was imported, releases what it holds (pooled
+  agents, MCP server processes) when the process is done
+
+Every import and warm-up is timed into startup_report, next to the phases the orchestrator records itself.
+
+USAGE:
+    educator = LazyAgentTool("crypto_educator", "Strands_Agent_KB_Bedrock")
+    agent = Agent(tools=[educator])   # nothing imported yet
+    start_warm_up([educator])         # or educator("What is Bitcoin?") on first use
+    print(startup_report.format())
+"""
+
+import ast
+import asyncio
+import copy
+import importlib.util
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from strands import tool
+from strands.types.tools import AgentTool
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """Durations of the named start up phases, in the order they finished"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []  # (name, seconds, thread name)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.phases.append((name, seconds, threading.current_thread().name))
+
+    def report(self):
+        with self._lock:
+            return {
+                "since_start_s": round(time.perf_counter() - self.started, 3),
+                "phases": [{"phase": n, "seconds": round(s, 3), "thread": t} for n, s, t in self.phases],
+            }
+
+    def format(self):
+        report = self.report()
+        width = max([len(p["phase"]) for p in report["phases"]] + [5])
+        lines = ["Startup time report"]
+        lines += [f"  {p['phase']:<{width}}  {p['seconds']:7.3f}s  ({p['thread']})" for p in report["phases"]]
+        lines.append(f"  {'total':<{width}}  {report['since_start_s']:7.3f}s since the report was created")
+        return "\n".join(lines)
+
+
+# NOTE one report for the process, created when this module is first imported
+startup_report = StartupReport()
+
+
+def spec_from_source(module_name, tool_name):
+    """Tool spec of an @tool function, built from the module's source file without importing the module
+
+    The function's signature and docstring are compiled into an empty stand-in and passed through strands'
+    @tool, so the spec is exactly the one the real tool would have.
+    """
+    spec = importlib.util.find_spec(module_name)
+    if spec is None or spec.origin is None:
+        raise ImportError(f"module {module_name} not found")
+    with open(spec.origin, encoding="utf-8") as f:
+        module = ast.parse(f.read(), filename=spec.origin)
+    for node in module.body:
+        if isinstance(node, ast.FunctionDef) and node.name == tool_name:
+            break
+    else:
+        raise ValueError(f"{module_name} has no function {tool_name}")
+
+    docstring = ast.get_docstring(node, clean=False)
+    stand_in = copy.copy(node)
+    stand_in.decorator_list = []
+    stand_in.body = ([ast.Expr(ast.Constant(docstring))] if docstring else []) + [ast.Pass()]
+    stand_in_module = ast.fix_missing_locations(ast.Module(body=[stand_in], type_ignores=[]))
+    namespace = {}
+    exec(compile(stand_in_module, spec.origin, "exec"), namespace)
+    return tool(namespace[tool_name]).tool_spec
+
+
+class LazyAgentTool(AgentTool):
+    """A sub-agent @tool whose module is only imported when the tool is first used"""
+
+    def __init__(self, tool_name, module_name, report=startup_report):
+        """
+        Args:
+            tool_name: Name of the @tool function in the module
+            module_name: Module defining the tool, eg "Strands_Agent_KB_Bedrock"
+            report: StartupReport the import and warm-up times are recorded in
+        """
+        super().__init__()
+        self._tool_name = tool_name
+        self.module_name = module_name
+        self.report = report
+        self._tool_spec = spec_from_source(module_name, tool_name)
+        self._module = None
+        self._tool = None
+        self._lock = threading.Lock()
+
+    @property
+    def tool_name(self):
+        return self._tool_name
+
+    @property
+    def tool_spec(self):
+        return self._tool_spec
+
+    @property
+    def tool_type(self):
+        return "function"
+
+    @property
+    def loaded(self):
+        return self._tool is not None
+
+    def load(self):
+        """Import the module (once) and return the real tool"""
+        if self._tool is None:
+            with self._lock:
+                if self._tool is None:
+                    with self.report.phase(f"import {self.module_name}"):
+                        self._module = importlib.import_module(self.module_name)
+                    self._tool = getattr(self._module, self._tool_name)
+        return self._tool
+
+    def warm_up(self):
+        """Load the tool and run its module's warm_up() function, if it has one"""
+        self.load()
+        warm_up = getattr(self._module, "warm_up", None)
+        if warm_up is not None:
+            with self.report.phase(f"warm up {self.module_name}"):
+                warm_up()
+
+    def shutdown(self):
+        """Run the module's shutdown() function, if the module was imported and has one"""
+        shutdown = getattr(self._module, "shutdown", None)
+        if shutdown is not None:
+            shutdown()
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    async def stream(self, tool_use, invocation_state, **kwargs):
+        # the import can take a second, do it off the event loop other tools may be streaming on
+        real_tool = self.load() if self.loaded else await asyncio.to_thread(self.load)
+        async for event in real_tool.stream(tool_use, invocation_state, **kwargs):
+            yield event
+
+
+def start_warm_up(tools, on_done=None):
+    """Warm up the tools one after the other in a background thread
+
+    Args:
+        tools: LazyAgentTools, a failure is logged and the tool is left to load on first use
+        on_done: Optional callable run once all tools are done, eg to print the startup report
+
+    Returns:
+        The started daemon thread
+    """
+
+    def run():
+        for lazy_tool in tools:
+            try:
+                lazy_tool.warm_up()
+            except Exception:
+                logger.exception("warm up of %s failed", lazy_tool.tool_name)
+        if on_done is not None:
+            on_done()
+
+    thread = threading.Thread(target=run, name="sub-agent-warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,369 @@
+"""
+Local knowledge base for the crypto_educator agent, an in-process alternative to the Bedrock Knowledge Base
+
+The knowledge base is only the handful of markdown files in resources/kb-datasource, yet every education query
+makes the agent's retrieve tool call the remote Bedrock Knowledge Base. Here the datasource is chunked and embedded
+once, at build time, into an index folder:
+
+- vectors.npy: float32 matrix with one unit length row per chunk, memory-mapped when the index is opened so the
+  pages are shared by every process of the container and only read from disk when first used
+- chunks.json: text, document and metadata (from the .metadata.json files) of each row
+- manifest.json: the embedder that wrote the vectors (queries must be embedded by the same one) and counts
+
+A search embeds the query and scores every chunk with one matrix-vector product, the top k are found with
+argpartition. For this corpus that is a few microseconds instead of a network round trip. A large corpus can be
+indexed with a quantized copy of the vectors (quantization.py, eg product quantization, 64 bytes per chunk instead of
+4 KB): searches then scan the compact codes and re-score the best candidates exactly. Or with an HNSW graph
+(hnsw.py): searches then walk the graph and score a few hundred chunks whatever the size of the corpus.
+
+Searches can also be hybrid (hybrid_search()): the vector search and a BM25 keyword search over an inverted index
+built when the index is opened (bm25.py) are fused by reciprocal rank, so queries for exact terms (tickers,
+"rug pull") find the chunks naming them, and the fused results can be re-ranked. The retrieve tool then returns the
+best of them that fit a token budget, fewer but better chunks for the agent to read.
+
+Searches can be filtered on the documents' metadata attributes (FILTER_FIELDS, eg level "beginner" or category
+"scam"). An inverted index of value -> rows is built when the index is opened, a filter picks the candidate rows
+from it and only those are scored, so chunks of unrelated documents never reach the agent. The retrieve tool only
+filters on a level the agent passes (it knows the student), filters read off the query's wording (derive_filters()
+with from_query, eg "in depth" -> level intermediate) send most queries to the wrong documents, see
+retrieval_benchmark.py.
+
+The index is written by kb_ingestion.py, incrementally, build it before deploying (the container does not ship
+the markdown files):
+    python kb_ingestion.py --datasource ../resources/kb-datasource --index kb_index
+
+The agent is given retrieve_tool(knowledge_base), a tool with the name and inputs of strands' retrieve tool, so
+its prompt does not change. With a fallback, queries the local search finds nothing for go to the remote knowledge base.
+
+USAGE:
+    knowledge_base = LocalKnowledgeBase.open("kb_index", HashingEmbedder())
+    hits = knowledge_base.search("What is a rug pull?", top_k=5)  # [Hit(score, document, text, metadata), ...]
+    hits = knowledge_base.hybrid_search("What is a rug pull?", top_k=5, rerank_hits=True)
+    agent = Agent(model=bedrock_model, tools=[retrieve_tool(knowledge_base)])
+"""
+
+import json
+import os
+import re
+from collections import namedtuple
+import numpy as np
+from strands import tool
+from bm25 import EXACT_TERM_WEIGHT, RRF_K, BM25Index, has_exact_term, reciprocal_rank_fusion, rerank
+from chunking import count_tokens
+from embeddings import BedrockEmbedder, HashingEmbedder
+from hnsw import EF_SEARCH, HNSWIndex
+from quantization import QuantizedVectors
+
+Hit = namedtuple("Hit", ["score", "document", "text", "metadata"])
+
+# metadata attributes searches can be filtered on, values are comma separated lists (eg "crypto, token, supply")
+FILTER_FIELDS = ("level", "category")
+
+# words of a query that ask for a level, only read with derive_filters(from_query=True)
+LEVEL_PATTERNS = {
+    "beginner": re.compile(r"\b(beginners?|new to|newbie|basics?|simple terms|simply|eli5|like i'?m five|start(ing)? out)\b"),
+    "intermediate": re.compile(r"\b(intermediate|advanced|in depth|in-depth|deep dive|technical(ly)?|detailed)\b"),
+}
+
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "chunks.json"
+MANIFEST_FILE = "manifest.json"
+
+
+def create_embedder(kind, region=None):
+    """The embedder of a local index, "hashing" (in-process) or "bedrock" (Titan Text Embeddings V2)"""
+    if kind == "bedrock":
+        return BedrockEmbedder(region=region)
+    if kind == "hashing":
+        return HashingEmbedder()
+    raise ValueError(f"unknown embedder {kind!r}")
+
+
+def metadata_values(value):
+    """Normalized values of a metadata attribute, lowercase and singular ("Scams, Security" -> ["scam", "security"])"""
+    values = []
+    for item in str(value).split(","):
+        item = item.strip().lower()
+        if len(item) > 3 and item.endswith("s") and not item.endswith("ss"):
+            item = item[:-1]
+        if item:
+            values.append(item)
+    return values
+
+
+class LocalKnowledgeBase:
+    """Top-k cosine search over a memory-mapped index written by kb_ingestion.py"""
+
+    def __init__(self, vectors, chunks, embedder, manifest=None):
+        """
+        Args:
+            vectors: (chunks, dim) float32 matrix of unit length rows, eg memory-mapped, or a store with a top() of
+                     (vector, top_k, rows), eg a quantization.QuantizedVectors or an hnsw.HNSWIndex
+            chunks: Dicts with the document, text and metadata of each row
+            embedder: Embeds the queries, must be the embedder that wrote the vectors
+            manifest: Optional manifest of the index
+        """
+        if len(vectors) != len(chunks):
+            raise ValueError(f"index has {len(vectors)} vectors for {len(chunks)} chunks")
+        self.vectors = vectors
+        self.chunks = chunks
+        self.embedder = embedder
+        self.manifest = manifest or {}
+        self._postings = self._build_postings()
+        self._filter_cache = {}  # normalized filters -> rows
+        # built in memory rather than stored, it takes milliseconds per thousand chunks
+        self.keyword_index = BM25Index([chunk["text"] for chunk in chunks])
+
+    @classmethod
+    def open(cls, index_dir, embedder, candidates=100, ef_search=EF_SEARCH):
+        """Open an index folder, its vectors are memory-mapped rather than read
+
+        Args:
+            index_dir: The index folder
+            embedder: Embeds the queries, must be the embedder that wrote the vectors
+            candidates: With a quantized index, the rows of the approximate search re-scored exactly
+            ef_search: With an HNSW graph, the candidates kept by a search
+        """
+        manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"no local knowledge base index in {index_dir}, build it with kb_ingestion.py")
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["embedder"] != embedder.name:
+            raise ValueError(f"index {index_dir} was embedded by {manifest['embedder']}, not {embedder.name}")
+        with open(os.path.join(index_dir, CHUNKS_FILE), encoding="utf-8") as f:
+            chunks = json.load(f)
+        vectors = np.load(os.path.join(index_dir, VECTORS_FILE), mmap_mode="r")
+        if manifest.get("hnsw"):
+            vectors = HNSWIndex.open(index_dir, manifest["hnsw"], vectors, ef_search)
+        elif manifest.get("quantization"):
+            vectors = QuantizedVectors.open(index_dir, manifest["quantization"], candidates)
+        return cls(vectors, chunks, embedder, manifest)
+
+    def search(self, query, top_k=5, min_score=0.0, filters=None):
+        """The top_k chunks most similar to query, best first, scoring at least min_score
+
+        Args:
+            query: The query text
+            top_k: Most chunks returned
+            min_score: Chunks scoring less are not returned
+            filters: Optional dict of metadata field to a value or list of values, a chunk must have one of the
+                     values of every field, see filter_rows()
+        """
+        return self.search_vector(self.embedder.embed([query])[0], top_k, min_score, filters)
+
+    def search_vector(self, vector, top_k=5, min_score=0.0, filters=None):
+        rows, scores = self._vector_top(vector, top_k, min_score, self.filter_rows(filters))
+        return [self._hit(row, score) for row, score in zip(rows, scores)]
+
+    def hybrid_search(self, query, top_k=5, min_score=0.0, filters=None, candidates=20, rerank_hits=False,
+                      exact_term_weight=EXACT_TERM_WEIGHT):
+        """The top_k chunks of the vector and the keyword (BM25) searches fused by reciprocal rank, best first
+
+        Args:
+            query: The query text
+            top_k: Most chunks returned
+            min_score: Chunks with a lower cosine similarity are left out of the vector search's ranking
+            filters: Optional metadata filters, see filter_rows()
+            candidates: Chunks taken from each search and fused
+            rerank_hits: Order the fused candidates by bm25.rerank(), the fused order breaking ties
+            exact_term_weight: Weight of the keyword ranking when the query names an exact term (eg a ticker)
+
+        Returns:
+            Hits scored from 0 to 1, 1 for a chunk ranked first by both searches (with rerank_hits, the mean of that
+            and the re-ranking score)
+        """
+        rows = self.filter_rows(filters)
+        vector_rows, _ = self._vector_top(self.embedder.embed([query])[0], candidates, min_score, rows)
+        keyword_rows, _ = self.keyword_index.search(query, candidates, rows)
+        keyword_weight = exact_term_weight if has_exact_term(query, self.keyword_index) else 1.0
+        # the best fused score, first in both rankings
+        best = (1 + keyword_weight) / (RRF_K + 1)
+        fused = [
+            (row, score / best)
+            for row, score in reciprocal_rank_fusion([vector_rows, keyword_rows], weights=[1.0, keyword_weight])
+        ]
+        if rerank_hits and fused:
+            fused = fused[:candidates]
+            scores = rerank(query, [self.chunks[row]["text"] for row, _ in fused], self.keyword_index)
+            # rerank() scores up to 2
+            fused = sorted(
+                ((row, (score + reranked / 2) / 2) for (row, score), reranked in zip(fused, scores)),
+                key=lambda item: -item[1],
+            )
+        return [self._hit(row, score) for row, score in fused[:top_k]]
+
+    def _vector_top(self, vector, top_k, min_score, rows):
+        """(rows, scores) of the top_k rows by cosine similarity, among rows if not None, scoring at least min_score"""
+        if hasattr(self.vectors, "top"):
+            # a store searching its own vectors, eg quantized or through a graph
+            top, scores = self.vectors.top(vector, top_k, rows)
+            keep = scores >= min_score
+            return top[keep], scores[keep]
+        if rows is None:
+            scores = self.vectors @ vector
+        else:
+            # only the candidate rows are read from the memory-mapped matrix and scored
+            scores = self.vectors[rows] @ vector
+        top_k = min(top_k, len(scores))
+        if top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        # argpartition finds the top k without sorting every score, only those k are sorted
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        top = top[scores[top] >= min_score]
+        return (top if rows is None else rows[top]), scores[top]
+
+    def _hit(self, row, score):
+        chunk = self.chunks[row]
+        return Hit(float(score), chunk["document"], chunk["text"], chunk["metadata"])
+
+    def filter_rows(self, filters):
+        """Rows matching filters, from the inverted index, or None without filters
+
+        Values of the same field are alternatives (any of them matches), different fields must all match.
+        """
+        if not filters:
+            return None
+        key = tuple(sorted(
+            (field, tuple(sorted({v for value in ([values] if isinstance(values, str) else values) for v in metadata_values(value)})))
+            for field, values in filters.items()
+        ))
+        rows = self._filter_cache.get(key)
+        if rows is None:
+            rows = self._match_rows(key)
+            # few distinct filters are derived from queries, bounded anyway
+            if len(self._filter_cache) < 1024:
+                self._filter_cache[key] = rows
+        return rows
+
+    def _match_rows(self, key):
+        rows = None
+        for field, values in key:
+            postings = self._postings.get(field, {})
+            matches = [postings[value] for value in values if value in postings]
+            if len(matches) == 1:
+                field_rows = matches[0]
+            else:
+                field_rows = np.unique(np.concatenate(matches)) if matches else np.empty(0, dtype=np.int32)
+            rows = field_rows if rows is None else np.intersect1d(rows, field_rows, assume_unique=True)
+        return rows
+
+    def metadata_counts(self, field):
+        """Chunks per value of a metadata field"""
+        return {value: len(rows) for value, rows in self._postings.get(field, {}).items()}
+
+    def _build_postings(self):
+        """Inverted index of the FILTER_FIELDS, field -> value -> sorted rows"""
+        postings = {field: {} for field in FILTER_FIELDS}
+        for row, chunk in enumerate(self.chunks):
+            for field in FILTER_FIELDS:
+                for value in metadata_values(chunk["metadata"].get(field, "")):
+                    postings[field].setdefault(value, []).append(row)
+        return {field: {value: np.array(rows, dtype=np.int32) for value, rows in values.items()}
+                for field, values in postings.items()}
+
+
+def derive_filters(query, knowledge_base, level=None, from_query=False, max_coverage=0.5):
+    """Metadata filters for a query, from the caller's level and optionally its wording
+
+    Args:
+        query: The query text
+        knowledge_base: The LocalKnowledgeBase, whose category values are looked for in the query
+        level: Level asked for by the caller (eg the agent knows the student is a beginner)
+        from_query: Also read the level and categories off the query's wording, eg "detailed" -> intermediate, for
+                    benchmarks only, filler words then become hard filters (see retrieval_benchmark.py)
+        max_coverage: Category values on more than this share of the chunks (eg "crypto") are too broad to filter on
+
+    Returns:
+        A dict of field to a list of values, empty when nothing narrows the search
+    """
+    filters = {}
+    levels = knowledge_base.metadata_counts("level")
+    if not level and from_query:
+        level = next((name for name, pattern in LEVEL_PATTERNS.items() if pattern.search(query.lower())), None)
+    if level:
+        level_values = [value for value in metadata_values(level) if value in levels]
+        if level_values:
+            filters["level"] = level_values
+    if not from_query:
+        return filters
+    words = set(metadata_values(",".join(re.findall(r"[a-z0-9]+", query.lower()))))
+    total = len(knowledge_base.chunks)
+    categories = [
+        value for value, count in knowledge_base.metadata_counts("category").items()
+        if value in words and count <= max_coverage * total
+    ]
+    if categories:
+        filters["category"] = categories
+    return filters
+
+
+def trim_hits(hits, max_tokens):
+    """The best hits whose texts fit in max_tokens together, at least the first one"""
+    kept, used = [], 0
+    for hit in hits:
+        tokens = count_tokens(hit.text)
+        if kept and used + tokens > max_tokens:
+            break
+        kept.append(hit)
+        used += tokens
+    return kept
+
+
+def format_hits(hits):
+    """Hits as text for the agent, in the same layout as the results of strands' retrieve tool"""
+    if not hits:
+        return "No results found above score threshold."
+    return "\n".join(f"\nScore: {hit.score:.4f}\nDocument ID: {hit.document}\nContent: {hit.text}\n" for hit in hits)
+
+
+def retrieve_tool(knowledge_base, top_k=5, min_score=0.0, fallback=None, metadata_filters=True, hybrid=True,
+                  rerank_hits=False, token_budget=None):
+    """A "retrieve" tool searching the local knowledge base
+
+    Args:
+        knowledge_base: The LocalKnowledgeBase
+        top_k: Results returned when the agent does not ask for a number
+        min_score: Chunks scoring less are not returned
+        fallback: Optional callable (query, number of results, filters) returning the remote knowledge base's
+                  results, used when no chunk scores at least min_score
+        metadata_filters: Filter searches on the level given by the agent
+        hybrid: Fuse a keyword (BM25) search with the vector search, see LocalKnowledgeBase.hybrid_search()
+        rerank_hits: Re-rank the fused results (hybrid only)
+        token_budget: Most tokens of chunks returned, the worst of the top results are dropped to fit
+
+    Returns:
+        The strands tool
+    """
+
+    def search(text, number_of_results, min_score, filters=None):
+        if hybrid:
+            return knowledge_base.hybrid_search(text, number_of_results, min_score, filters, rerank_hits=rerank_hits)
+        return knowledge_base.search(text, number_of_results, min_score, filters)
+
+    @tool(name="retrieve")
+    def local_retrieve(text: str, numberOfResults: int = top_k, level: str = "") -> str:
+        """
+        Retrieves knowledge based on the provided text from the crypto education knowledge base.
+
+        Args:
+            text: The query to retrieve relevant knowledge.
+            numberOfResults: The maximum number of results to return.
+            level: Optional level of the student, "beginner" or "intermediate", when known from the conversation.
+
+        Returns:
+            The most relevant passages with their score and document
+        """
+        filters = derive_filters(text, knowledge_base, level or None) if metadata_filters else {}
+        hits = search(text, numberOfResults, min_score, filters)
+        if not hits and filters:
+            # the derived filters can be wrong, an unfiltered search is better than no answer
+            filters = {}
+            hits = search(text, numberOfResults, min_score)
+        if not hits and fallback is not None:
+            return fallback(text, numberOfResults, filters)
+        return format_hits(trim_hits(hits, token_budget) if token_budget else hits)
+
+    return local_retrieve
+
@@ -0,0 +1,293 @@
+"""
+Pool of long-lived MCP client sessions
+
+Entering an MCPClient context spawns the MCP server process (eg `npx mcp-remote ...`), performs the
+MCP handshake and lists its tools, which costs seconds before the first token. The pool does this
+once when the container boots and then leases the already connected sessions out per request,
+so warm requests only pay model latency.
+
+- size: number of sessions (and server processes) kept open, ie the number of concurrent leases
+- idle_timeout: sessions unused for this long are recycled in the background, so a connection the
+  remote server silently dropped is replaced before a request needs it (None disables)
+- health_check_interval: how often the background monitor health checks idle sessions (an MCP round trip), one
+  at a time so the others stay available; returning a session never waits on a health check
+- dead sessions (eg the server process exited) are reconnected by the monitor, or on the next lease
+- stop() closes the idle sessions at once and the leased ones when they are returned
+- catalog: optional MCPToolCatalog, sessions then take their tools from the cached catalog instead of listing
+  them on every connect, and the monitor refreshes the catalog when its TTL expires
+
+USAGE:
+    pool = MCPSessionPool(lambda: MCPClient(...), size=2)
+    pool.start()  # once, at container boot
+
+    with pool.lease() as session:
+        agent = Agent(model=model, tools=session.tools)
+        agent("What is the price of Bitcoin?")
+
+LINKS:
+- MCP Tool: https://strandsagents.com/latest/documentation/docs/user-guide/concepts/tools/mcp-tools/
+"""
+
+import atexit
+import bisect
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PooledMCPSession:
+    """One MCP client session owned by the pool"""
+
+    def __init__(self, client_factory, catalog=None):
+        self.client_factory = client_factory
+        self.catalog = catalog
+        self.catalog_version = None
+        self.client = None
+        self.tools = []
+        self.last_used = time.monotonic()
+        self.connects = 0
+
+    def connect(self):
+        """Start a fresh client (and server process) and load its tools"""
+        self.close()
+        client = self.client_factory()
+        client.start()
+        self.client = client
+        self.load_tools()
+        self.last_used = time.monotonic()
+        self.connects += 1
+
+    def load_tools(self, force_refresh=False):
+        """Bind the tools to this session's client, from the catalog when there is one"""
+        if self.catalog is None:
+            self.tools = self.client.list_tools_sync()
+            return
+        self.tools = self.catalog.load_tools(self.client, force_refresh=force_refresh)
+        self.catalog_version = self.catalog.version
+
+    def close(self):
+        """Stop the client, ignoring errors from a server that has already gone away"""
+        client, self.client, self.tools = self.client, None, []
+        if client is None:
+            return
+        try:
+            client.stop(None, None, None)
+        except Exception as e:
+            logger.debug("error stopping MCP client: %s", e)
+
+    def is_alive(self):
+        # NOTE MCPClient has no public liveness check, this only tells us its background thread is still running
+        return self.client is not None and self.client._is_session_active()
+
+    def is_healthy(self, timeout=10):
+        """Ping the server, this catches a server process that died under a still running client"""
+        if not self.is_alive():
+            return False
+        try:
+            # NOTE MCPClient has no public ping either, so send one over its session on the client's event loop
+            ping = self.client._background_thread_session.send_ping()
+            self.client._invoke_on_background_thread(ping).result(timeout=timeout)
+            return True
+        except Exception as e:
+            logger.info("MCP session health check failed: %s", e)
+            return False
+
+
+class MCPSessionPool:
+    """Bounded pool of connected MCP sessions that are leased per request"""
+
+    def __init__(
+        self, client_factory, size=1, idle_timeout=300, health_check_interval=30, lease_timeout=30, catalog=None
+    ):
+        """
+        Args:
+            client_factory: Callable returning a new, not yet started, MCPClient
+            size: Number of sessions to keep open
+            idle_timeout: Seconds an unused session is kept before being recycled, None to disable
+            health_check_interval: Seconds between background health checks
+            lease_timeout: Default seconds to wait for a free session before raising TimeoutError
+            catalog: Optional MCPToolCatalog the sessions take their tools from
+        """
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.client_factory = client_factory
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.lease_timeout = lease_timeout
+        self.catalog = catalog
+
+        # sessions ordered by last use, popped from the end so the warmest session is handed out first
+        self._idle = []
+        self._leased = set()
+        self._sessions = []
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._stop_event = threading.Event()
+        self._monitor = None
+        self._started = False
+        self._stats = {"leases": 0, "reconnects": 0, "recycled": 0, "failed_connects": 0, "lease_wait_time": 0.0}
+        # stop the server processes when the interpreter exits
+        atexit.register(self.stop)
+
+    def start(self):
+        """Open all sessions and start the background monitor, safe to call more than once"""
+        with self._lock:
+            if self._started:
+                return self
+            self._started = True
+            self._stop_event.clear()
+            sessions = [PooledMCPSession(self.client_factory, self.catalog) for _ in range(self.size)]
+            self._sessions = sessions
+        # connect in parallel outside the lock, each session spawns its own server process; leases wait meanwhile
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            list(executor.map(self._connect, sessions))
+        for session in sessions:
+            self._release(session)
+        with self._lock:
+            if self._sessions is sessions:
+                self._monitor = threading.Thread(target=self._monitor_loop, name="mcp-session-pool-monitor", daemon=True)
+                self._monitor.start()
+        return self
+
+    def stop(self):
+        """Stop the monitor and close every session, a leased session is closed when it is returned"""
+        with self._lock:
+            if not self._started:
+                return
+            self._started = False
+            self._stop_event.set()
+            idle, self._idle, self._sessions = self._idle, [], []
+            monitor = self._monitor
+        if monitor is not None and monitor is not threading.current_thread():
+            monitor.join(timeout=5)
+        for session in idle:
+            session.close()
+
+    @contextmanager
+    def lease(self, timeout=None):
+        """Borrow a connected session for the duration of the with block
+
+        Args:
+            timeout: Seconds to wait for a free session, defaults to the pool's lease_timeout
+
+        Raises:
+            TimeoutError: If no session becomes free in time
+        """
+        if not self._started:
+            self.start()
+
+        timeout = self.lease_timeout if timeout is None else timeout
+        wait_start = time.monotonic()
+        with self._available:
+            if not self._available.wait_for(lambda: self._idle, timeout=timeout):
+                raise TimeoutError(f"no MCP session became free within {timeout}s")
+            session = self._idle.pop()
+            self._leased.add(session)
+            self._stats["leases"] += 1
+            self._stats["lease_wait_time"] += time.monotonic() - wait_start
+
+        try:
+            if not session.is_alive():
+                self._reconnect(session, raise_errors=True)
+            elif self.catalog is not None and session.catalog_version != self.catalog.version:
+                # the catalog changed since this session bound its tools
+                session.load_tools()
+            yield session
+        except Exception:
+            # a dead server process is dropped so the session is reconnected on its next lease; one that only
+            # stopped answering is left to the monitor's health check, the release does not wait on a ping
+            if session.client is not None and not session.is_alive():
+                session.close()
+            raise
+        finally:
+            session.last_used = time.monotonic()
+            self._release(session)
+
+    def stats(self):
+        """Return pool counters for reporting"""
+        with self._lock:
+            stats = {**self._stats, "size": self.size, "idle": len(self._idle), "leased": len(self._leased)}
+            sessions = list(self._sessions)
+        return {**stats, "alive": sum(1 for s in sessions if s.is_alive())}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _release(self, session):
+        """Put a session back in the idle list, or close it if the pool was stopped since it was taken"""
+        with self._available:
+            self._leased.discard(session)
+            current = self._started and session in self._sessions
+            if current:
+                bisect.insort(self._idle, session, key=lambda s: s.last_used)
+                self._available.notify()
+        if not current:
+            session.close()
+
+    def _connect(self, session):
+        try:
+            session.connect()
+            return True
+        except Exception as e:
+            # leave the session disconnected, it is retried by the monitor or the next lease
+            self._count("failed_connects")
+            logger.warning("failed to connect MCP session: %s", e)
+            session.close()
+            return False
+
+    def _reconnect(self, session, raise_errors=False):
+        self._count("reconnects")
+        if raise_errors:
+            try:
+                session.connect()
+            except Exception:
+                self._count("failed_connects")
+                session.close()
+                raise
+            return True
+        return self._connect(session)
+
+    def _monitor_loop(self):
+        while not self._stop_event.wait(self.health_check_interval):
+            self.check_idle_sessions()
+
+    def check_idle_sessions(self):
+        """Reconnect dead sessions and recycle expired ones, without blocking leased sessions"""
+        # only sessions sitting idle right now are checked, one at a time so a lease can take any of the others
+        # while a check waits on its ping; leased ones are checked on a later pass
+        with self._lock:
+            due = list(self._idle)
+        for session in due:
+            if self._stop_event.is_set():
+                break
+            with self._lock:
+                if session not in self._idle:
+                    continue
+                self._idle.remove(session)
+                self._leased.add(session)
+            try:
+                if not session.is_healthy():
+                    logger.info("MCP session is not healthy, reconnecting")
+                    self._reconnect(session)
+                elif self.idle_timeout is not None and time.monotonic() - session.last_used > self.idle_timeout:
+                    logger.info("MCP session idle for more than %ss, recycling", self.idle_timeout)
+                    self._count("recycled")
+                    self._connect(session)
+                elif self.catalog is not None and self.catalog.is_expired():
+                    # one healthy session is enough to re-list the tools, the others rebind on their next lease
+                    self._refresh_catalog(session)
+            finally:
+                self._release(session)
+
+    def _refresh_catalog(self, session):
+        try:
+            session.load_tools(force_refresh=True)
+        except Exception as e:
+            # keep serving the cached tools, the refresh is retried on the next health check
+            logger.warning("failed to refresh MCP tool catalog: %s", e)
@@ -0,0 +1,163 @@
+"""
+Cache of an MCP server's tool catalog
+
+The CoinGecko tool schemas almost never change, so listing them from the remote server every time a
+session connects is wasted time. The catalog keeps the tool definitions in memory, and optionally as an
+on-disk snapshot keyed by server URL, so sessions can be given their tools straight from the cache,
+including at cold start when a snapshot already exists.
+
+- ttl: seconds before the cached definitions are considered stale and listed again from the server
+- fingerprint: sha256 of the canonical tool definitions, a refresh only replaces the cached tools (and bumps
+  the version) when the fingerprint actually changes
+
+USAGE:
+    catalog = MCPToolCatalog("https://mcp.api.coingecko.com/sse", ttl=3600, snapshot_dir=".mcp_tool_catalog")
+    with client:
+        tools = catalog.load_tools(client)  # cached tools bound to this client, listed from the server if stale
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from mcp.types import Tool
+from strands.tools.mcp.mcp_agent_tool import MCPAgentTool
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint_tools(tool_definitions):
+    """Return a stable hash of a list of MCP tool definitions (dicts)"""
+    canonical = json.dumps(sorted(tool_definitions, key=lambda t: t["name"]), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class MCPToolCatalog:
+    """In-memory (plus optional on-disk) cache of one MCP server's tool definitions"""
+
+    def __init__(self, server_url, ttl=3600, snapshot_dir=None):
+        """
+        Args:
+            server_url: URL of the MCP server, used as the cache key
+            ttl: Seconds the cached definitions are used before being listed again, None to never expire
+            snapshot_dir: Folder for the on-disk snapshot, None to keep the catalog in memory only
+        """
+        self.server_url = server_url
+        self.ttl = ttl
+        self.snapshot_dir = snapshot_dir
+        self.version = 0
+        self._definitions = None
+        self._fingerprint = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "refreshes": 0, "changes": 0, "snapshot_loads": 0}
+        self._load_snapshot()
+
+    @property
+    def fingerprint(self):
+        return self._fingerprint
+
+    @property
+    def snapshot_path(self):
+        if not self.snapshot_dir:
+            return None
+        key = hashlib.sha256(self.server_url.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.snapshot_dir, f"{key}.json")
+
+    def is_expired(self):
+        if self._definitions is None:
+            return True
+        if self.ttl is None:
+            return False
+        return time.time() - self._fetched_at > self.ttl
+
+    def get_tools(self, client):
+        """Build agent tools bound to client from the cached definitions
+
+        Returns:
+            A list of MCPAgentTool, or None if nothing is cached
+        """
+        definitions = self._definitions
+        if definitions is None:
+            return None
+        self._stats["hits"] += 1
+        return [MCPAgentTool(Tool.model_validate(d), client) for d in definitions]
+
+    def refresh(self, client):
+        """List the tools from the server and update the cache
+
+        Returns:
+            True if the catalog changed
+        """
+        tools = client.list_tools_sync()
+        return self.update([t.mcp_tool.model_dump(mode="json", by_alias=True, exclude_none=True) for t in tools])
+
+    def load_tools(self, client, force_refresh=False):
+        """Return tools bound to client, only listing them from the server when the cache is stale"""
+        if force_refresh or self.is_expired():
+            self.refresh(client)
+        return self.get_tools(client)
+
+    def update(self, tool_definitions):
+        """Store freshly listed tool definitions
+
+        Returns:
+            True if the fingerprint changed, False if the catalog was only marked fresh again
+        """
+        fingerprint = fingerprint_tools(tool_definitions)
+        with self._lock:
+            self._stats["refreshes"] += 1
+            self._fetched_at = time.time()
+            changed = fingerprint != self._fingerprint
+            if changed:
+                if self._fingerprint is not None:
+                    logger.info("MCP tool catalog for %s changed", self.server_url)
+                self._stats["changes"] += 1
+                self._definitions = tool_definitions
+                self._fingerprint = fingerprint
+                self.version += 1
+            self._save_snapshot()
+        return changed
+
+    def stats(self):
+        return {**self._stats, "version": self.version, "fingerprint": self._fingerprint, "expired": self.is_expired()}
+
+    def _load_snapshot(self):
+        path = self.snapshot_path
+        if not path or not os.path.exists(path):
+            return
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            if snapshot.get("server_url") != self.server_url:
+                return
+            self._definitions = snapshot["tools"]
+            self._fingerprint = snapshot["fingerprint"]
+            self._fetched_at = snapshot["fetched_at"]
+            self.version += 1
+            self._stats["snapshot_loads"] += 1
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("ignoring unreadable MCP tool catalog snapshot %s: %s", path, e)
+
+    def _save_snapshot(self):
+        path = self.snapshot_path
+        if not path:
+            return
+        snapshot = {
+            "server_url": self.server_url,
+            "fingerprint": self._fingerprint,
+            "fetched_at": self._fetched_at,
+            "tools": self._definitions,
+        }
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            # write then rename so a reader never sees a half written snapshot
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # eg a read-only container filesystem, the in-memory catalog still works
+            logger.warning("could not write MCP tool catalog snapshot %s: %s", path, e)
@@ -0,0 +1,104 @@
+"""
+Process wide registry of Bedrock models and the boto3 client behind them
+
+Every agent module used to create its own BedrockModel, and with it its own boto3 session (credential resolution)
+and bedrock-runtime client (connection pool), so five agents in one container held five pools and opened new
+TLS connections to Bedrock that one shared pool would have kept warm. get_bedrock_model() instead returns:
+
+- one BedrockModel per (model_id, region, model params), shared by every agent asking for the same model
+- built on one boto3 session per region, so credentials are resolved once
+- all models in a region share one bedrock-runtime client, whose connection pool is sized for every pooled
+  sub-agent calling at once, with TCP keep-alive and adaptive retries for throttling
+
+BedrockModel keeps no per-request state, so sharing one between agents (and threads) is safe.
+NOTE do not call update_config() on a shared model, it would change the model for every agent using it.
+
+USAGE:
+    bedrock_model = get_bedrock_model(INFERENCE_MODEL, REGION)
+    agent = Agent(model=bedrock_model, ...)
+"""
+
+import json
+import threading
+import boto3
+from botocore.config import Config
+from strands.models import BedrockModel
+from config import (
+    BEDROCK_MAX_POOL_CONNECTIONS,
+    BEDROCK_CONNECT_TIMEOUT,
+    BEDROCK_READ_TIMEOUT,
+    BEDROCK_MAX_RETRIES,
+)
+
+_lock = threading.Lock()
+_sessions = {}  # region -> boto3.Session
+_clients = {}  # region -> bedrock-runtime client shared by the models in that region
+_models = {}  # (model_id, region, frozen params) -> BedrockModel
+
+
+def bedrock_client_config():
+    """boto3 client config of the shared bedrock-runtime clients"""
+    return Config(
+        max_pool_connections=BEDROCK_MAX_POOL_CONNECTIONS,
+        tcp_keepalive=True,
+        connect_timeout=BEDROCK_CONNECT_TIMEOUT,
+        read_timeout=BEDROCK_READ_TIMEOUT,
+        retries={"max_attempts": BEDROCK_MAX_RETRIES, "mode": "adaptive"},
+    )
+
+
+def _freeze(params):
+    return tuple(sorted((k, json.dumps(v, sort_keys=True, default=str)) for k, v in params.items()))
+
+
+def get_bedrock_model(model_id, region, **params):
+    """The shared BedrockModel for a model id, region and model params (eg temperature, max_tokens)
+
+    Args:
+        model_id: Bedrock model or inference profile id
+        region: AWS region
+        **params: BedrockModel config, models with different params are separate registry entries
+
+    Returns:
+        A BedrockModel, the same instance for the same arguments
+    """
+    key = (model_id, region, _freeze(params))
+    with _lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+        if region not in _sessions:
+            _sessions[region] = boto3.Session(region_name=region)
+        model = BedrockModel(
+            model_id=model_id,
+            boto_session=_sessions[region],
+            boto_client_config=bedrock_client_config(),
+            **params,
+        )
+        # BedrockModel always builds a client, the first one in a region is kept and shared by the rest
+        if region in _clients:
+            model.client = _clients[region]
+        else:
+            _clients[region] = model.client
+        _models[key] = model
+        return model
+
+
+def set_bedrock_model(model, model_id, region, **params):
+    """Register the model get_bedrock_model returns for these arguments, eg a StubModel for offline benchmarks
+
+    NOTE the agent modules get their model when they are imported, so call this before importing them
+    """
+    with _lock:
+        _models[(model_id, region, _freeze(params))] = model
+
+
+def stats():
+    """Models, clients and sessions held by the registry"""
+    with _lock:
+        return {
+            "models": [{"model_id": k[0], "region": k[1], "params": {p: json.loads(v) for p, v in k[2]}} for k in _models],
+            "clients": len(_clients),
+            "sessions": len(_sessions),
+            "max_pool_connections": BEDROCK_MAX_POOL_CONNECTIONS,
+        }
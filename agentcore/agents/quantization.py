@@ -0,0 +1,225 @@
+"""
+Quantized vectors of the local knowledge base, a compact memory-mapped store with exact re-scoring
+
+The float32 matrix of a local index costs 4 bytes per dimension per chunk, 4 KB per chunk for the 1024 dimensions of
+Titan (the lab's S3 Vectors index), 4 GB for a million chunks, and a search reads all of it. The quantized store
+keeps a compact code per chunk, which is all a search scans:
+
+- "int8": each vector scaled to int8 (1 byte per dimension, 4x smaller), converted back to float32 a few rows at a
+  time (in the CPU cache) and scored with BLAS, as fast as the float32 search for a quarter of the memory
+- "pq": product quantization, the dimensions are split into subspaces and each subvector replaced by the id of
+  the nearest of 256 centroids learnt from the vectors (1 byte per subspace, eg 64 bytes per chunk, 64 MB per
+  million chunks); a query precomputes its dot product with every centroid, a chunk's approximate score is then
+  the sum of a table lookup per subspace (asymmetric distance). Two subspaces are looked up at once, in a table
+  of their 256 x 256 sums, so a search makes half as many passes over the codes
+
+The best candidates (candidates, eg 100) of the approximate scores are re-scored exactly against the float32
+vectors, which stay on disk, memory-mapped: only the pages of those few rows are read, so the exact order of the
+top k is kept at the price of a few hundred rows instead of every one.
+
+Every file is a .npy memory-mapped when opened, nothing is copied into the process, the pages are shared by the
+processes of a container. Files, next to the vectors.npy of the index:
+
+- int8: int8_codes.npy (chunks x dim int8), int8_scales.npy (chunks float32)
+- pq: pq_codes.npy (subspaces / 2 x chunks uint16, the codes of two subspaces, each pair's contiguous),
+  pq_centroids.npy (subspaces x 256 x dim / subspaces float32)
+
+USAGE:
+    files = quantize(vectors, "pq", subspaces=64)  # name -> array, written by kb_ingestion.LocalIndexSink
+    store = QuantizedVectors.open("kb_index", {"kind": "pq", "subspaces": 64}, candidates=100)
+    rows, scores = store.top(query_vector, top_k=5)
+"""
+
+import os
+import numpy as np
+
+VECTORS_FILE = "vectors.npy"
+
+# files of each kind of store
+FILES = {
+    "int8": ("int8_codes.npy", "int8_scales.npy"),
+    "pq": ("pq_codes.npy", "pq_centroids.npy"),
+}
+
+# int8 rows converted to float32 at once, the block stays in the CPU cache between the conversion and the product
+INT8_BLOCK_ROWS = 256
+
+# rows encoded at once, bounds the (rows, 256) scores an encoding makes
+ENCODE_BLOCK_ROWS = 16384
+
+# centroids per subspace, a code is one byte
+CENTROIDS = 256
+
+
+def quantize_int8(vectors, block_rows=ENCODE_BLOCK_ROWS):
+    """int8 codes and per-row scales of vectors, a row is about codes * scale"""
+    codes = np.empty(vectors.shape, dtype=np.int8)
+    scales = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), block_rows):
+        block = np.asarray(vectors[start:start + block_rows], dtype=np.float32)
+        scale = np.abs(block).max(axis=1) / 127
+        scale[scale == 0] = 1.0
+        codes[start:start + len(block)] = np.rint(block / scale[:, None])
+        scales[start:start + len(block)] = scale
+    return codes, scales
+
+
+def nearest(points, centroids):
+    """Index of the nearest centroid (euclidean) of each point"""
+    # |x - c|^2 = |x|^2 - 2 x.c + |c|^2, |x|^2 is the same for every centroid, so the centroids are ranked by
+    # 2 x.c - |c|^2, one matrix product with a column of ones appended to the points
+    points = np.hstack([points, np.ones((len(points), 1), dtype=np.float32)])
+    weights = np.hstack([2 * centroids, -(centroids * centroids).sum(axis=1, keepdims=True)])
+    return (points @ weights.T).argmax(axis=1)
+
+
+def train_pq(vectors, subspaces, iterations=10, sample=25600, seed=0):
+    """Centroids of each subspace, k-means of a sample of the vectors
+
+    Args:
+        vectors: (chunks, dim) float32, dim a multiple of subspaces
+        subspaces: Number of subspaces, even
+        iterations: k-means iterations
+        sample: Most vectors the centroids are learnt from, 100 per centroid are plenty
+        seed: Seed of the sampling and initialization, the same vectors give the same centroids
+
+    Returns:
+        (subspaces, centroids, dim / subspaces) float32 array, CENTROIDS centroids or fewer with fewer vectors
+    """
+    chunks, dim = vectors.shape
+    if dim % subspaces or subspaces % 2:
+        raise ValueError(f"{dim} dimensions cannot be split into {subspaces} subspaces, an even divisor")
+    rng = np.random.default_rng(seed)
+    if chunks > sample:
+        vectors = vectors[np.sort(rng.choice(chunks, sample, replace=False))]
+    vectors = np.asarray(vectors, dtype=np.float32)
+    count = min(CENTROIDS, len(vectors))
+    width = dim // subspaces
+    centroids = np.empty((subspaces, count, width), dtype=np.float32)
+    for s in range(subspaces):
+        sub = np.ascontiguousarray(vectors[:, s * width:(s + 1) * width])
+        center = sub[rng.choice(len(sub), count, replace=False)].copy()
+        for _ in range(iterations):
+            assign = nearest(sub, center)
+            counts = np.bincount(assign, minlength=count)
+            sums = np.stack([np.bincount(assign, sub[:, w], minlength=count) for w in range(width)], axis=1)
+            filled = counts > 0
+            # an empty cluster keeps its centroid
+            center[filled] = sums[filled] / counts[filled, None]
+        centroids[s] = center
+    return centroids
+
+
+def encode_pq(vectors, centroids, block_rows=ENCODE_BLOCK_ROWS):
+    """(subspaces / 2, chunks) uint16 codes, the nearest centroids of subspaces 2i (low byte) and 2i + 1"""
+    subspaces, _, width = centroids.shape
+    codes = np.empty((subspaces // 2, len(vectors)), dtype=np.uint16)
+    for start in range(0, len(vectors), block_rows):
+        block = np.asarray(vectors[start:start + block_rows], dtype=np.float32)
+        rows = slice(start, start + len(block))
+        for s in range(0, subspaces, 2):
+            codes[s // 2, rows] = nearest(block[:, s * width:(s + 1) * width], centroids[s])
+            codes[s // 2, rows] |= nearest(block[:, (s + 1) * width:(s + 2) * width], centroids[s + 1]).astype(np.uint16) << 8
+    return codes
+
+
+def quantize(vectors, kind, subspaces=64):
+    """The files of a quantized store of vectors, name -> array, see the module docstring"""
+    if kind == "int8":
+        codes, scales = quantize_int8(vectors)
+        return {"int8_codes.npy": codes, "int8_scales.npy": scales}
+    if kind == "pq":
+        centroids = train_pq(vectors, subspaces)
+        return {"pq_codes.npy": encode_pq(vectors, centroids), "pq_centroids.npy": centroids}
+    raise ValueError(f"unknown quantization {kind!r}")
+
+
+class QuantizedVectors:
+    """Approximate top-k over quantized codes, the best candidates re-scored against the float32 vectors"""
+
+    def __init__(self, kind, arrays, vectors, candidates=100):
+        """
+        Args:
+            kind: "int8" or "pq"
+            arrays: The arrays of quantize(), name -> array (eg memory-mapped)
+            vectors: The (chunks, dim) float32 vectors for the exact re-scoring (eg memory-mapped), None for none
+            candidates: Rows re-scored exactly per search, at least top_k
+        """
+        self.kind = kind
+        self.vectors = vectors
+        self.candidates = candidates
+        if kind == "int8":
+            self.codes, self.scales = arrays["int8_codes.npy"], arrays["int8_scales.npy"]
+            self.size = len(self.codes)
+        elif kind == "pq":
+            self.codes, self.centroids = arrays["pq_codes.npy"], arrays["pq_centroids.npy"]
+            self.size = self.codes.shape[1]
+        else:
+            raise ValueError(f"unknown quantization {kind!r}")
+
+    @classmethod
+    def open(cls, index_dir, spec, candidates=100):
+        """Memory-map the quantized store of an index folder, spec is the manifest's "quantization" entry"""
+        arrays = {name: np.load(os.path.join(index_dir, name), mmap_mode="r") for name in FILES[spec["kind"]]}
+        vectors_path = os.path.join(index_dir, VECTORS_FILE)
+        vectors = np.load(vectors_path, mmap_mode="r") if os.path.exists(vectors_path) else None
+        return cls(spec["kind"], arrays, vectors, candidates)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        """Bytes of the codes a search scans"""
+        if self.kind == "int8":
+            return self.codes.nbytes + self.scales.nbytes
+        return self.codes.nbytes + self.centroids.nbytes
+
+    def scores(self, vector, rows=None):
+        """Approximate scores (dot products) of vector with every row, or with rows"""
+        if self.kind == "int8":
+            return self._int8_scores(vector, rows)
+        return self._pq_scores(vector, rows)
+
+    def top(self, vector, top_k, rows=None):
+        """(rows, scores) of the top_k rows, among rows if not None, best first, exactly scored when possible"""
+        vector = np.asarray(vector, dtype=np.float32)
+        approximate = self.scores(vector, rows)
+        count = min(top_k if self.vectors is None else max(top_k, self.candidates), len(approximate))
+        if count <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        best = np.argpartition(-approximate, count - 1)[:count]
+        candidates = best if rows is None else np.asarray(rows)[best]
+        if self.vectors is None:
+            scores = approximate[best]
+        else:
+            # sorted rows, the memory-mapped pages are read in file order
+            order = np.argsort(candidates)
+            candidates = candidates[order]
+            scores = np.asarray(self.vectors[candidates], dtype=np.float32) @ vector
+        top = np.argsort(-scores, kind="stable")[:top_k]
+        return candidates[top], scores[top]
+
+    def _int8_scores(self, vector, rows):
+        codes = self.codes if rows is None else self.codes[rows]
+        scales = self.scales if rows is None else self.scales[rows]
+        scores = np.empty(len(codes), dtype=np.float32)
+        buffer = np.empty((INT8_BLOCK_ROWS, codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(codes), INT8_BLOCK_ROWS):
+            block = buffer[:min(INT8_BLOCK_ROWS, len(codes) - start)]
+            np.copyto(block, codes[start:start + len(block)], casting="unsafe")
+            scores[start:start + len(block)] = block @ vector
+        return scores * scales
+
+    def _pq_scores(self, vector, rows):
+        subspaces, count, width = self.centroids.shape
+        # dot product of each subvector of the query with each centroid of its subspace, padded to CENTROIDS
+        tables = np.zeros((subspaces, CENTROIDS), dtype=np.float32)
+        tables[:, :count] = np.einsum("skw,sw->sk", self.centroids, vector.reshape(subspaces, width))
+        codes = self.codes if rows is None else self.codes[:, rows]
+        scores = np.zeros(codes.shape[1], dtype=np.float32)
+        for pair in range(subspaces // 2):
+            # the sums of both subspaces' tables, indexed by the pair code
+            table = (tables[2 * pair + 1][:, None] + tables[2 * pair][None, :]).ravel()
+            scores += np.take(table, codes[pair])
+        return scores
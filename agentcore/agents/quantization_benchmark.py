@@ -0,0 +1,138 @@
+"""
+Offline benchmark of the quantized vector stores (quantization.py) against the exact float32 search
+
+A synthetic corpus of unit vectors, clustered as the embeddings of a corpus of related documents are, is written
+to a memory-mapped vectors.npy (a million 1024 dimension vectors is 4 GB, more than is kept in memory) and queried
+with noisy copies of some of its vectors. Per store the benchmark reports the memory a search scans, the build
+time, the median and 95th percentile search latency and the recall@k, the share of the exact top k found.
+
+The datasource part indexes the knowledge base documents (kb_ingestion.py) with each quantization and gives the
+retrieval metrics of chunking_benchmark.py for the labelled queries of kb_eval.json, which the exact re-scoring
+should leave unchanged.
+
+USAGE:
+    python quantization_benchmark.py
+    python quantization_benchmark.py --chunks 1000000 --folder /tmp/kb_bench --candidates 200
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from chunking import MarkdownChunker
+from chunking_benchmark import EVAL_FILE, evaluate
+from config import (
+    KB_DATASOURCE_DIR, KB_CHUNK_MAX_TOKENS, KB_CHUNK_OVERLAP_TOKENS, KB_PQ_SUBSPACES, KB_QUANTIZED_CANDIDATES,
+)
+from kb_ingestion import sync_local_index
+from local_kb import LocalKnowledgeBase, create_embedder
+from quantization import QuantizedVectors, quantize
+
+# rows generated and scored at once
+BLOCK_ROWS = 65536
+
+
+def synthetic_vectors(path, chunks, dim, seed=0):
+    """A memory-mapped (chunks, dim) float32 .npy of unit vectors around chunks / 100 centers, written blockwise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, chunks // 100), dim)).astype(np.float32)
+    vectors = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(chunks, dim))
+    for start in range(0, chunks, BLOCK_ROWS):
+        count = min(BLOCK_ROWS, chunks - start)
+        block = centers[rng.integers(0, len(centers), count)]
+        block += 1.5 * rng.standard_normal((count, dim)).astype(np.float32)
+        vectors[start:start + count] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    vectors.flush()
+    return np.load(path, mmap_mode="r")
+
+
+def exact_top(vectors, vector, top_k):
+    """Rows of the exact top_k, the float32 vectors scored blockwise"""
+    scores = np.concatenate([vectors[start:start + BLOCK_ROWS] @ vector for start in range(0, len(vectors), BLOCK_ROWS)])
+    top = np.argpartition(-scores, top_k - 1)[:top_k]
+    return top[np.argsort(-scores[top])]
+
+
+def measure(search, queries, truth, top_k):
+    """Median and 95th percentile latency (ms) and recall@k of search, a function of (vector, top_k) returning rows"""
+    latencies, found = [], 0
+    for vector, expected in zip(queries, truth):
+        started = time.perf_counter()
+        rows = search(vector, top_k)
+        latencies.append(time.perf_counter() - started)
+        found += len(set(rows.tolist()) & set(expected.tolist()))
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 2),
+        f"recall@{top_k}": round(found / (top_k * len(queries)), 3),
+    }
+
+
+def bench_synthetic(args):
+    with tempfile.TemporaryDirectory(dir=args.folder) as folder:
+        started = time.perf_counter()
+        vectors = synthetic_vectors(os.path.join(folder, "vectors.npy"), args.chunks, args.dim)
+        print(f"{args.chunks} x {args.dim} vectors ({vectors.nbytes / 2**20:.0f} MB float32) "
+              f"written in {time.perf_counter() - started:.1f}s")
+        rng = np.random.default_rng(1)
+        queries = vectors[np.sort(rng.choice(args.chunks, args.queries, replace=False))]
+        queries = queries + rng.standard_normal(queries.shape).astype(np.float32) * (0.5 / args.dim ** 0.5)
+        queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+        truth = [exact_top(vectors, vector, args.top_k) for vector in queries]
+
+        results = {"float32": measure(lambda v, k: exact_top(vectors, v, k), queries, truth, args.top_k)}
+        print(f"{'float32':>8}: {vectors.nbytes / 2**20:.0f} MB scanned, {json.dumps(results['float32'])}")
+        for kind in ("int8", "pq"):
+            started = time.perf_counter()
+            arrays = quantize(vectors, kind, args.subspaces)
+            seconds = time.perf_counter() - started
+            for name, array in arrays.items():
+                np.save(os.path.join(folder, name), array)
+            del arrays
+            spec = {"kind": kind, "subspaces": args.subspaces}
+            store = QuantizedVectors.open(folder, spec, args.candidates)
+            results[kind] = measure(lambda v, k: store.top(v, k)[0], queries, truth, args.top_k)
+            print(f"{kind:>8}: {store.nbytes / 2**20:.0f} MB scanned, built in {seconds:.1f}s, "
+                  f"{json.dumps(results[kind])}")
+            without = QuantizedVectors.open(folder, spec, args.candidates)
+            without.vectors = None
+            print(f"{'':>10}without re-scoring: {json.dumps(measure(lambda v, k: without.top(v, k)[0], queries, truth, args.top_k))}")
+    return results
+
+
+def bench_datasource(args):
+    with open(args.eval, encoding="utf-8") as f:
+        queries = json.load(f)
+    embedder = create_embedder("hashing")
+    chunker = MarkdownChunker(KB_CHUNK_MAX_TOKENS, KB_CHUNK_OVERLAP_TOKENS)
+    for kind in ("", "int8", "pq"):
+        with tempfile.TemporaryDirectory() as folder:
+            sync_local_index(args.datasource, folder, embedder, chunker, kind, args.subspaces)
+            knowledge_base = LocalKnowledgeBase.open(folder, embedder, args.candidates)
+            metrics = evaluate(knowledge_base.search, queries, 5)
+            print(f"{kind or 'float32':>8}: {len(knowledge_base.chunks)} chunks, {json.dumps(metrics)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the quantized vector stores")
+    parser.add_argument("--chunks", type=int, default=200000, help="vectors of the synthetic corpus")
+    parser.add_argument("--dim", type=int, default=1024, help="dimension of the vectors, Titan's by default")
+    parser.add_argument("--queries", type=int, default=100, help="queries of the synthetic corpus")
+    parser.add_argument("--top-k", type=int, default=10, help="rows retrieved per query")
+    parser.add_argument("--subspaces", type=int, default=KB_PQ_SUBSPACES, help="subspaces of the pq quantization")
+    parser.add_argument("--candidates", type=int, default=KB_QUANTIZED_CANDIDATES, help="rows re-scored exactly")
+    parser.add_argument("--folder", help="folder of the synthetic corpus files, the temporary folder by default")
+    parser.add_argument("--datasource", default=KB_DATASOURCE_DIR, help="folder of markdown documents")
+    parser.add_argument("--eval", default=EVAL_FILE, help="labelled queries")
+    args = parser.parse_args()
+
+    print("Datasource")
+    bench_datasource(args)
+    print("Synthetic corpus")
+    bench_synthetic(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Response cache for the sub-agent tools
+
+Education answers come from a static knowledge base and general questions rarely change, yet every identical or
+near-identical prompt costs a full sub-agent run on Bedrock. The cache sits in front of the @tool functions:
+
+- exact match on the normalized query (case, whitespace and trailing punctuation ignored)
+- optional similarity match, the query is embedded locally (see embeddings.py) and compared with the cached
+  queries of the same tool, a cosine similarity at or above the tool's threshold reuses that answer
+- per-tool TTLs, a tool without a TTL is never cached (eg token security, where a stale answer is a risk)
+- LRU eviction once the cached answers use more than max_bytes
+
+Every lookup is counted per tool, see stats(). Lookups made while handling one request are also collected by
+track(), which CryptoOrchestrator.query uses to report the request's hits and misses in its metrics.
+
+USAGE:
+    @tool
+    @response_cache.cached
+    def crypto_educator(query: str) -> str:
+        ...
+"""
+
+import contextvars
+import functools
+import re
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict, namedtuple
+from contextlib import contextmanager
+import numpy as np
+from opentelemetry import trace
+from embeddings import HashingEmbedder
+from streaming import emit
+from config import (
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_TTLS,
+    RESPONSE_CACHE_SIMILARITY,
+    RESPONSE_CACHE_MAX_MB,
+)
+
+# result is "exact", "similar", "miss" or "bypass" (the tool is not cached)
+CacheLookup = namedtuple("CacheLookup", ["tool", "result", "similarity"])
+
+_Entry = namedtuple("_Entry", ["answer", "vector", "expires_at", "size"])
+
+# lookups of the request currently being handled, see track()
+_current_lookups = contextvars.ContextVar("response_cache_lookups", default=None)
+
+# rough per entry overhead of the dict, tuple and key objects
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_query(query):
+    """Cache key of a query, ignores case, repeated whitespace and trailing punctuation"""
+    return re.sub(r"\s+", " ", query.lower()).strip().rstrip("?!. ")
+
+
+class ResponseCache:
+    """Thread safe LRU cache of sub-agent answers with per-tool TTLs and similarity lookup"""
+
+    def __init__(self, ttls, similarity=None, max_bytes=64 * 1024 * 1024, embedder=None):
+        """
+        Args:
+            ttls: Seconds an answer is reused, per tool name, tools not listed (or 0) are not cached
+            similarity: Cosine similarity threshold per tool name, tools not listed only match exactly
+            max_bytes: Approximate memory cap, the least recently used answers are evicted beyond it
+            embedder: Embeds queries for the similarity lookup, defaults to a local HashingEmbedder
+        """
+        self.ttls = dict(ttls)
+        self.similarity = dict(similarity or {})
+        self.max_bytes = max_bytes
+        self.embedder = embedder or HashingEmbedder()
+        self.bytes = 0
+        self._entries = OrderedDict()  # (tool, key) -> _Entry, least recently used first
+        self._matrices = {}  # tool -> (keys, vectors matrix) for the similarity search, rebuilt when stale
+        # reentrant, hits are recorded while the lookup still holds the lock
+        self._lock = threading.RLock()
+        self._stats = defaultdict(Counter)
+
+    def enabled(self, tool):
+        return bool(self.ttls.get(tool))
+
+    def get(self, tool, query):
+        """Look up a cached answer
+
+        Args:
+            tool: Name of the sub-agent tool
+            query: The query passed to the tool
+
+        Returns:
+            (answer or None, CacheLookup, query vector or None), pass the vector on to put() after a miss
+        """
+        if not self.enabled(tool):
+            return None, self._record(CacheLookup(tool, "bypass", None)), None
+
+        key = (tool, normalize_query(query))
+        threshold = self.similarity.get(tool)
+        vector = self.embedder.embed([query])[0] if threshold else None
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                self._remove(key)
+                self._stats[tool]["expired"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry.answer, self._record(CacheLookup(tool, "exact", 1.0)), vector
+
+            if threshold and vector.any():
+                match, score = self._nearest(tool, vector)
+                if match is not None and score >= threshold:
+                    entry = self._entries[match]
+                    if entry.expires_at > now:
+                        self._entries.move_to_end(match)
+                        return entry.answer, self._record(CacheLookup(tool, "similar", round(score, 3))), vector
+                    self._remove(match)
+                    self._stats[tool]["expired"] += 1
+
+        return None, self._record(CacheLookup(tool, "miss", None)), vector
+
+    def put(self, tool, query, answer, vector=None):
+        """Cache an answer for the tool's TTL, does nothing for tools that are not cached"""
+        if not self.enabled(tool) or not answer:
+            return
+        key = (tool, normalize_query(query))
+        if vector is None and self.similarity.get(tool):
+            vector = self.embedder.embed([query])[0]
+        size = sys.getsizeof(answer) + sys.getsizeof(key[1]) + ENTRY_OVERHEAD_BYTES
+        if vector is not None:
+            size += vector.nbytes
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(answer, vector, time.monotonic() + self.ttls[tool], size)
+            self.bytes += size
+            self._matrices.pop(tool, None)
+            self._stats[tool]["stores"] += 1
+            while self.bytes > self.max_bytes:
+                evicted = next(iter(self._entries))
+                self._remove(evicted)
+                self._stats[evicted[0]]["evictions"] += 1
+
+    def cached(self, func):
+        """Decorator caching a sub-agent tool function by its query, apply it below @tool"""
+        tool = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(query, *args, **kwargs):
+            answer, lookup, vector = self.get(tool, query)
+            if answer is not None:
+                # a hit generates no tokens, send the whole answer to a streaming request instead
+                emit({"type": "token", "tool": tool, "data": answer})
+                return answer
+            answer = func(query, *args, **kwargs)
+            if lookup.result == "miss":
+                self.put(tool, query, answer, vector)
+            return answer
+
+        return wrapper
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrices.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Hits, misses, stores, evictions and expiries per tool, plus the cache size"""
+        with self._lock:
+            tools = {}
+            for tool, counts in self._stats.items():
+                hits = counts["exact"] + counts["similar"]
+                lookups = hits + counts["miss"]
+                tools[tool] = {**counts, "hit_rate": round(hits / lookups, 3) if lookups else 0.0}
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "tools": tools,
+            }
+
+    def _record(self, lookup):
+        with self._lock:
+            self._stats[lookup.tool][lookup.result] += 1
+        # the lookup is made inside the tool's "sub_agent <tool>" span, see tool_metrics.measured
+        trace.get_current_span().set_attribute("sub_agent.cache", lookup.result)
+        lookups = _current_lookups.get()
+        if lookups is not None:
+            lookups.append(lookup)
+        return lookup
+
+    def _nearest(self, tool, vector):
+        """Most similar cached query of a tool, (key, cosine similarity) or (None, 0.0), call with the lock held"""
+        if tool not in self._matrices:
+            keys = [k for k, e in self._entries.items() if k[0] == tool and e.vector is not None]
+            matrix = np.stack([self._entries[k].vector for k in keys]) if keys else None
+            self._matrices[tool] = (keys, matrix)
+        keys, matrix = self._matrices[tool]
+        if not keys:
+            return None, 0.0
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        return keys[best], float(scores[best])
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+        self._matrices.pop(key[0], None)
+
+
+@contextmanager
+def track():
+    """Collect the cache lookups made inside the with block, including those of sub-agents on other threads
+
+    Yields:
+        The list the CacheLookups are appended to
+    """
+    lookups = []
+    token = _current_lookups.set(lookups)
+    try:
+        yield lookups
+    finally:
+        _current_lookups.reset(token)
+
+
+def summarize(lookups):
+    """Per-request cache metrics from the lookups collected by track()"""
+    cached = [l for l in lookups if l.result != "bypass"]
+    return {
+        "hits": sum(l.result in ("exact", "similar") for l in cached),
+        "misses": sum(l.result == "miss" for l in cached),
+        "lookups": [l._asdict() for l in lookups],
+    }
+
+
+# NOTE one cache shared by all sub-agent tools, so the memory cap applies to the process as a whole
+response_cache = ResponseCache(
+    RESPONSE_CACHE_TTLS if RESPONSE_CACHE_ENABLED else {},
+    similarity=RESPONSE_CACHE_SIMILARITY,
+    max_bytes=RESPONSE_CACHE_MAX_MB * 1024 * 1024,
+)
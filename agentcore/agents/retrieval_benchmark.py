@@ -0,0 +1,110 @@
+"""
+Offline benchmark of the knowledge base retrieval: vector, keyword (BM25), hybrid and re-ranked searches
+
+The datasource is chunked as kb_ingestion.py indexes it (MarkdownChunker) into an in-memory LocalKnowledgeBase and
+searched with the labelled queries of kb_eval.json, see chunking_benchmark.py for the metrics. Results are given
+for all the queries and for each type of query, "question" (plain questions) and "term" (naming an exact term,
+eg a ticker), along with the median search latency.
+
+The searches compared are the vector search alone, BM25 alone, both fused by reciprocal rank (hybrid, the keyword
+ranking weighted up for queries naming an exact term), hybrid with the lexical re-ranker, the same without the
+weighting, and each hybrid search trimmed to the token budget of the retrieve tool.
+
+The last rows compare the re-ranked hybrid search with and without metadata filters read off the query's wording
+(derive_filters(from_query=True)), for the queries as written and reworded with the filler of a student's prompt
+(eg "In depth, "). A filter narrowing the search to the wrong documents shows up as a lower hit@1 for the filtered
+rows, which is why the retrieve tool only filters on a level the agent passes.
+
+USAGE:
+    python retrieval_benchmark.py
+    python retrieval_benchmark.py --top-k 3 --token-budget 400 --embedder bedrock
+"""
+
+import argparse
+import json
+import time
+from statistics import median
+from chunking import MarkdownChunker
+from chunking_benchmark import EVAL_FILE, build, evaluate, read_datasource
+from config import (
+    KB_DATASOURCE_DIR, KB_CHUNK_MAX_TOKENS, KB_CHUNK_OVERLAP_TOKENS, KB_CONTEXT_TOKEN_BUDGET, REGION,
+)
+from local_kb import create_embedder, derive_filters, trim_hits
+
+# wordings of a query that do not change what it asks for
+QUERY_PREFIXES = ("", "Explain to a beginner: ", "In depth, ", "Give me a detailed explanation: ")
+
+
+def searches(knowledge_base, token_budget):
+    """Name -> function of (query text, top_k) returning hits"""
+
+    def keyword(text, top_k):
+        rows, scores = knowledge_base.keyword_index.search(text, top_k)
+        return [knowledge_base._hit(row, score) for row, score in zip(rows, scores)]
+
+    def hybrid(text, top_k):
+        return knowledge_base.hybrid_search(text, top_k)
+
+    def reranked(text, top_k):
+        return knowledge_base.hybrid_search(text, top_k, rerank_hits=True)
+
+    def unweighted(text, top_k):
+        return knowledge_base.hybrid_search(text, top_k, rerank_hits=True, exact_term_weight=1.0)
+
+    return {
+        "vector": knowledge_base.search,
+        "bm25": keyword,
+        "hybrid": hybrid,
+        "hybrid + rerank": reranked,
+        "hybrid + rerank, unweighted": unweighted,
+        f"hybrid, {token_budget} tokens": lambda text, top_k: trim_hits(hybrid(text, top_k), token_budget),
+        f"hybrid + rerank, {token_budget} tokens": lambda text, top_k: trim_hits(reranked(text, top_k), token_budget),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the knowledge base retrieval")
+    parser.add_argument("--datasource", default=KB_DATASOURCE_DIR, help="folder of markdown documents")
+    parser.add_argument("--eval", default=EVAL_FILE, help="labelled queries")
+    parser.add_argument("--top-k", type=int, default=5, help="chunks retrieved per query")
+    parser.add_argument("--token-budget", type=int, default=KB_CONTEXT_TOKEN_BUDGET, help="most tokens returned")
+    parser.add_argument("--embedder", choices=["hashing", "bedrock"], default="hashing")
+    args = parser.parse_args()
+
+    with open(args.eval, encoding="utf-8") as f:
+        queries = json.load(f)
+    chunker = MarkdownChunker(KB_CHUNK_MAX_TOKENS, KB_CHUNK_OVERLAP_TOKENS)
+    embedder = create_embedder(args.embedder, REGION)
+    knowledge_base = build(
+        list(read_datasource(args.datasource)),
+        lambda text, metadata: [chunk.text for chunk in chunker.chunk(text, metadata)],
+        embedder,
+    )
+    types = sorted({query.get("type", "question") for query in queries})
+    print(f"{len(queries)} queries ({', '.join(types)}) over {len(knowledge_base.chunks)} chunks, "
+          f"{embedder.name} embeddings, top {args.top_k}")
+
+    for name, search in searches(knowledge_base, args.token_budget).items():
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            search(query["query"], args.top_k)
+            latencies.append(time.perf_counter() - started)
+        print(f"{name} ({median(latencies) * 1e6:.0f}us per search)")
+        print(f"{'all':>12}: {json.dumps(evaluate(search, queries, args.top_k))}")
+        for kind in types:
+            subset = [query for query in queries if query.get("type", "question") == kind]
+            print(f"{kind:>12}: {json.dumps(evaluate(search, subset, args.top_k))}")
+
+    print("hybrid + rerank, unfiltered vs filtered on the metadata read off the query")
+    for prefix in QUERY_PREFIXES:
+        reworded = [{**query, "query": prefix + query["query"]} for query in queries]
+        for name, filtered in (("unfiltered", False), ("filtered", True)):
+            def search(text, top_k, filtered=filtered):
+                filters = derive_filters(text, knowledge_base, from_query=True) if filtered else None
+                return knowledge_base.hybrid_search(text, top_k, filters=filters, rerank_hits=True)
+            print(f"{prefix!r:>36} {name:>10}: {json.dumps(evaluate(search, reworded, args.top_k))}")
+
+
+if __name__ == "__main__":
+    main()
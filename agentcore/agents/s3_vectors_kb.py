@@ -0,0 +1,73 @@
+"""
+Client-side retrieval from the lab's S3 Vectors index
+
+The Bedrock Knowledge Base's Retrieve API (strands' retrieve tool) embeds the query on the server on every call,
+nothing of that can be reused. Querying the S3 Vectors index directly moves the embedding to the client, where
+a CachedEmbedder (embedding_cache.py) serves repeated and popular questions without calling the model: a cached
+query costs the query_vectors call only.
+
+S3VectorsKnowledgeBase has the search() of local_kb.LocalKnowledgeBase and returns the same Hits, so the agent is
+given local_kb.retrieve_tool(knowledge_base, metadata_filters=False, hybrid=False). The index is the one written
+by lab 1 or by kb_ingestion.py (S3VectorsSink), whose vectors carry the text as "source_text" metadata.
+
+USAGE:
+    embedder = CachedEmbedder(BedrockEmbedder(region="us-east-1", dim=1024), path=".cache/query_embeddings.db")
+    knowledge_base = S3VectorsKnowledgeBase("my-vectors", "my-index", embedder, region="us-east-1")
+    hits = knowledge_base.search("What is a rug pull?", top_k=5)
+"""
+
+import boto3
+from local_kb import Hit, metadata_values
+
+
+class S3VectorsKnowledgeBase:
+    """Top-k search of an S3 Vectors index (cosine distance), the query embedded on the client"""
+
+    def __init__(self, vector_bucket, index_name, embedder, client=None, region=None):
+        """
+        Args:
+            vector_bucket: The S3 Vectors bucket
+            index_name: The index, its vectors must come from the same model and dimension as the embedder's
+            embedder: Embeds the queries, eg a CachedEmbedder of a BedrockEmbedder
+            client: Optional s3vectors client
+            region: AWS region of the bucket
+        """
+        if not vector_bucket:
+            raise ValueError("no S3 Vectors bucket, set KB_S3_VECTOR_BUCKET to the vector bucket of lab 1")
+        self.vector_bucket = vector_bucket
+        self.index_name = index_name
+        self.embedder = embedder
+        self.client = client or boto3.client("s3vectors", region_name=region)
+
+    def search(self, query, top_k=5, min_score=0.0, filters=None):
+        """The top_k vectors most similar to query, best first, scoring (1 - cosine distance) at least min_score
+
+        Args:
+            query: The query text
+            top_k: Most results returned
+            min_score: Results scoring less are not returned
+            filters: Optional dict of metadata field to values, only "level" is pushed down (the other attributes
+                     are comma separated lists, which the equality filters of S3 Vectors cannot match)
+        """
+        request = {
+            "vectorBucketName": self.vector_bucket,
+            "indexName": self.index_name,
+            "queryVector": {"float32": [float(x) for x in self.embedder.embed([query])[0]]},
+            "topK": top_k,
+            "returnDistance": True,
+            "returnMetadata": True,
+        }
+        levels = (filters or {}).get("level", [])
+        levels = [value for item in ([levels] if isinstance(levels, str) else levels) for value in metadata_values(item)]
+        if levels:
+            request["filter"] = {"level": {"$in": levels}}
+        hits = []
+        for vector in self.client.query_vectors(**request).get("vectors", []):
+            score = 1.0 - float(vector.get("distance", 1.0))
+            if score < min_score:
+                continue
+            metadata = dict(vector.get("metadata", {}))
+            text = metadata.pop("source_text", "")
+            document = metadata.pop("document", vector["key"])
+            hits.append(Hit(score, document, text, metadata))
+        return hits
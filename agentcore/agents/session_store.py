@@ -0,0 +1,323 @@
+"""
+Persistent store of the orchestrator's session histories, so a session survives its container being recycled
+
+The orchestrator of a session keeps its history in memory only, when the runtime container is recycled the
+conversation is lost. Saving the whole history after every turn, or replaying every message ever sent to rebuild
+it, costs more the longer the session runs. A store keeps per session:
+
+- a snapshot: the compacted history (the conversation manager's window and summary) and its state, written every
+  few turns, which replaces everything saved before it
+- the turns added since that snapshot, one small append per turn
+
+Resuming a session is one read (the snapshot and the few turns after it), whatever the session's length.
+
+SessionStore is the interface, SQLiteSessionStore a local file implementation and DynamoDBSessionStore one for a
+DynamoDB table (partition key "session_id", sort key "item", both strings, with TTL on "expires_at"), which
+outlives the containers. A Redis (or other) store implements the same four methods. DynamoDB batch deletes that
+come back unprocessed (throttling) are retried with exponential backoff.
+
+USAGE:
+    store = SQLiteSessionStore(".sessions/sessions.db")
+    store.append("session-1", 1, [user_message, assistant_message])
+    record = store.load("session-1")  # SessionRecord(seq=1, snapshot_seq=0, state=None, messages=[...])
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+import boto3
+from conversation_memory import is_turn_start
+
+logger = logging.getLogger(__name__)
+
+# seq is the number of the last turn saved, snapshot_seq the last turn included in the snapshot (0 if none) and
+# state the conversation manager's state saved with the snapshot (None if none)
+SessionRecord = namedtuple("SessionRecord", ["seq", "snapshot_seq", "state", "messages"])
+
+
+class SessionStore(ABC):
+    """Interface of the session stores, implementations must be thread safe"""
+
+    @abstractmethod
+    def load(self, session_id):
+        """The session's snapshot plus the turns saved after it, a SessionRecord or None for a new session"""
+
+    @abstractmethod
+    def append(self, session_id, seq, messages):
+        """Save the messages of turn seq, added after the last snapshot"""
+
+    @abstractmethod
+    def save_snapshot(self, session_id, seq, state, messages, previous_seq=0):
+        """Replace everything saved for the session with the compacted history as of turn seq
+
+        Args:
+            session_id: The session
+            seq: Number of the last turn included in the snapshot
+            state: JSON serializable conversation manager state
+            messages: The full (compacted) history
+            previous_seq: seq of the previous snapshot, the turns after it up to seq are no longer needed
+        """
+
+    @abstractmethod
+    def delete(self, session_id):
+        """Remove everything saved for the session"""
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store in a local SQLite file, eg for local runs or a container with a persistent volume"""
+
+    def __init__(self, path, ttl=None):
+        """
+        Args:
+            path: SQLite database file, its folder is created if needed
+            ttl: Optional seconds a session is kept after its last write, older ones are removed by expire()
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        # one connection for all threads, serialized by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots "
+                "(session_id TEXT PRIMARY KEY, seq INTEGER, state TEXT, messages TEXT, updated_at REAL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS turns "
+                "(session_id TEXT, seq INTEGER, messages TEXT, updated_at REAL, PRIMARY KEY (session_id, seq))"
+            )
+
+    def load(self, session_id):
+        with self._lock:
+            snapshot = self._conn.execute(
+                "SELECT seq, state, messages FROM snapshots WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            seq = snapshot[0] if snapshot else 0
+            turns = self._conn.execute(
+                "SELECT seq, messages FROM turns WHERE session_id = ? AND seq > ? ORDER BY seq", (session_id, seq)
+            ).fetchall()
+        if snapshot is None and not turns:
+            return None
+        messages = json.loads(snapshot[2]) if snapshot else []
+        for _, turn in turns:
+            messages.extend(json.loads(turn))
+        return SessionRecord(
+            seq=turns[-1][0] if turns else seq,
+            snapshot_seq=seq,
+            state=json.loads(snapshot[1]) if snapshot else None,
+            messages=messages,
+        )
+
+    def append(self, session_id, seq, messages):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO turns VALUES (?, ?, ?, ?)", (session_id, seq, json.dumps(messages), time.time())
+            )
+
+    def save_snapshot(self, session_id, seq, state, messages, previous_seq=0):
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)",
+                (session_id, seq, json.dumps(state), json.dumps(messages), time.time()),
+            )
+            self._conn.execute("DELETE FROM turns WHERE session_id = ? AND seq <= ?", (session_id, seq))
+
+    def delete(self, session_id):
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM snapshots WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+
+    def expire(self):
+        """Remove the sessions not written to for longer than the ttl, returns how many were removed"""
+        if self.ttl is None:
+            return 0
+        cutoff = time.time() - self.ttl
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            # a session is expired when neither its snapshot nor any of its turns is newer than the cutoff
+            expired = [row[0] for row in self._conn.execute(
+                "SELECT session_id FROM (SELECT session_id, updated_at FROM snapshots "
+                "UNION ALL SELECT session_id, updated_at FROM turns) GROUP BY session_id HAVING MAX(updated_at) < ?",
+                (cutoff,),
+            )]
+            for session_id in expired:
+                self._conn.execute("DELETE FROM snapshots WHERE session_id = ?", (session_id,))
+                self._conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+        return len(expired)
+
+
+class DynamoDBSessionStore(SessionStore):
+    """Session store in a DynamoDB table, shared by every container of the runtime
+
+    Each session is one item collection: the item "snapshot" and an item "turn#<seq>" per turn after it, so
+    load() is a single Query. Expired sessions are removed by the table's TTL on "expires_at".
+    """
+
+    # most requests per batch_write_item call
+    MAX_BATCH = 25
+
+    def __init__(self, table_name, region, ttl=None, client=None, max_retries=5, backoff=0.05):
+        """
+        Args:
+            table_name: Table with partition key "session_id" and sort key "item" (strings)
+            region: AWS region of the table
+            ttl: Optional seconds a session is kept after its last write (enable TTL on "expires_at")
+            client: Optional boto3 DynamoDB client
+            max_retries: Retries of the unprocessed items of a batch write
+            backoff: Seconds before the first retry, doubled on each one
+        """
+        self.table_name = table_name
+        self.ttl = ttl
+        self.client = client or boto3.client("dynamodb", region_name=region)
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def load(self, session_id):
+        items = []
+        kwargs = {
+            "TableName": self.table_name,
+            "KeyConditionExpression": "session_id = :session_id",
+            "ExpressionAttributeValues": {":session_id": {"S": session_id}},
+            "ConsistentRead": True,
+        }
+        while True:
+            response = self.client.query(**kwargs)
+            items.extend(response["Items"])
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        if not items:
+            return None
+
+        snapshot = next((item for item in items if item["item"]["S"] == "snapshot"), None)
+        seq = int(snapshot["seq"]["N"]) if snapshot else 0
+        # sort keys are zero padded, so the turns come back in order
+        turns = [item for item in items if item["item"]["S"].startswith("turn#") and int(item["seq"]["N"]) > seq]
+        messages = json.loads(snapshot["messages"]["S"]) if snapshot else []
+        for turn in turns:
+            messages.extend(json.loads(turn["messages"]["S"]))
+        return SessionRecord(
+            seq=int(turns[-1]["seq"]["N"]) if turns else seq,
+            snapshot_seq=seq,
+            state=json.loads(snapshot["state"]["S"]) if snapshot else None,
+            messages=messages,
+        )
+
+    def append(self, session_id, seq, messages):
+        self.client.put_item(TableName=self.table_name, Item=self._item(session_id, f"turn#{seq:010d}", seq, messages=messages))
+
+    def save_snapshot(self, session_id, seq, state, messages, previous_seq=0):
+        self.client.put_item(
+            TableName=self.table_name, Item=self._item(session_id, "snapshot", seq, messages=messages, state=state)
+        )
+        # the turns the snapshot now includes, load() skips them anyway if a delete fails
+        keys = [{"session_id": {"S": session_id}, "item": {"S": f"turn#{s:010d}"}} for s in range(previous_seq + 1, seq + 1)]
+        left = self._delete_keys(keys)
+        if left:
+            # the table's TTL removes them eventually
+            logger.warning("%d compacted turns of session %s could not be deleted", left, session_id)
+
+    def delete(self, session_id):
+        record_keys = []
+        kwargs = {
+            "TableName": self.table_name,
+            "KeyConditionExpression": "session_id = :session_id",
+            "ExpressionAttributeValues": {":session_id": {"S": session_id}},
+            "ProjectionExpression": "session_id, #item",
+            "ExpressionAttributeNames": {"#item": "item"},
+        }
+        while True:
+            response = self.client.query(**kwargs)
+            record_keys.extend(response["Items"])
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        left = self._delete_keys(record_keys)
+        if left:
+            raise RuntimeError(f"{left} items of session {session_id} could not be deleted, DynamoDB kept throttling")
+
+    def _delete_keys(self, keys):
+        """Delete the items of keys in batches, retrying the unprocessed ones, returns how many were left"""
+        left = 0
+        for i in range(0, len(keys), self.MAX_BATCH):
+            requests = {self.table_name: [{"DeleteRequest": {"Key": key}} for key in keys[i:i + self.MAX_BATCH]]}
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    time.sleep(self.backoff * 2 ** (attempt - 1))
+                requests = self.client.batch_write_item(RequestItems=requests).get("UnprocessedItems") or {}
+                if not requests:
+                    break
+            left += len(requests.get(self.table_name, []))
+        return left
+
+    def _item(self, session_id, sort_key, seq, messages, state=None):
+        item = {
+            "session_id": {"S": session_id},
+            "item": {"S": sort_key},
+            "seq": {"N": str(seq)},
+            "messages": {"S": json.dumps(messages)},
+        }
+        if state is not None:
+            item["state"] = {"S": json.dumps(state)}
+        if self.ttl is not None:
+            item["expires_at"] = {"N": str(int(time.time() + self.ttl))}
+        return item
+
+
+class PersistedSession:
+    """Saves an agent's turns to a store and restores its history from it, for one session"""
+
+    def __init__(self, store, session_id, snapshot_every=8):
+        """
+        Args:
+            store: The SessionStore
+            session_id: The session, eg the AgentCore runtimeSessionId
+            snapshot_every: Turns appended between compacted snapshots
+        """
+        self.store = store
+        self.session_id = session_id
+        self.snapshot_every = snapshot_every
+        self.seq = 0
+        self.snapshot_seq = 0
+
+    def restore(self, agent):
+        """Load the session's history into a new agent, returns False for a session with nothing saved"""
+        record = self.store.load(self.session_id)
+        if record is None:
+            return False
+        self.seq, self.snapshot_seq = record.seq, record.snapshot_seq
+        if record.state is not None:
+            # the snapshot's messages already start with the summary, the returned summary messages are not needed
+            agent.conversation_manager.restore_from_session(record.state)
+        agent.messages = record.messages
+        # the turns appended after the snapshot may take the history past the conversation bounds
+        agent.conversation_manager.apply_management(agent)
+        return True
+
+    def save_turn(self, agent):
+        """Save the agent's last turn, as an append or, every snapshot_every turns, a compacted snapshot
+
+        Returns:
+            "append" or "snapshot"
+        """
+        self.seq += 1
+        if self.seq - self.snapshot_seq >= self.snapshot_every:
+            self.store.save_snapshot(
+                self.session_id, self.seq, agent.conversation_manager.get_state(), agent.messages,
+                previous_seq=self.snapshot_seq,
+            )
+            self.snapshot_seq = self.seq
+            return "snapshot"
+        start = max(i for i, message in enumerate(agent.messages) if is_turn_start(message))
+        self.store.append(self.session_id, self.seq, agent.messages[start:])
+        return "append"
@@ -0,0 +1,101 @@
+"""
+Per session objects, eg one orchestrator per AgentCore runtimeSessionId
+
+A single module level orchestrator is shared by every invocation, so the conversations of different sessions end
+up in one history. SessionRegistry keeps one object per session id, built by a factory on the session's first
+request:
+
+- requests of the same session are serialized (a strands Agent cannot be invoked concurrently), requests of
+  different sessions run side by side
+- sessions idle for longer than idle_timeout are dropped, and the least recently used ones beyond max_sessions,
+  so the memory held stays bounded
+
+USAGE:
+    sessions = SessionRegistry(lambda session_id: CryptoOrchestrator(...), max_sessions=256, idle_timeout=900)
+    with sessions.lease(context.session_id) as orchestrator:
+        result = orchestrator.query(prompt)
+"""
+
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+# session id used for requests without one, eg local testing
+DEFAULT_SESSION_ID = "default"
+
+
+class _Session:
+    def __init__(self, value):
+        self.value = value
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.leases = 0  # leased or waiting for the lock, such a session is never dropped
+
+
+class SessionRegistry:
+    """Thread safe LRU of per session objects with an idle timeout"""
+
+    def __init__(self, factory, max_sessions=256, idle_timeout=900, on_evict=None):
+        """
+        Args:
+            factory: Callable taking a session id and returning the session's object
+            max_sessions: Sessions kept, the least recently used idle ones are dropped beyond it
+            idle_timeout: Seconds a session is kept without requests, None to keep sessions until max_sessions
+            on_evict: Optional callable (session id, object) run when a session is dropped
+        """
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.on_evict = on_evict
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    @contextmanager
+    def lease(self, session_id=None):
+        """The session's object for the duration of the with block, built on the session's first request"""
+        session_id = session_id or DEFAULT_SESSION_ID
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                # the object is built outside the registry lock, the session's own lock keeps its requests waiting
+                session = self._sessions[session_id] = _Session(None)
+                self._stats["created"] += 1
+            else:
+                self._sessions.move_to_end(session_id)
+                self._stats["resumed"] += 1
+            session.leases += 1
+            evicted = self._evict_locked()
+
+        for evicted_id, evicted_session in evicted:
+            self._evicted(evicted_id, evicted_session)
+        try:
+            with session.lock:
+                if session.value is None:
+                    session.value = self.factory(session_id)
+                yield session.value
+        finally:
+            with self._lock:
+                session.leases -= 1
+                session.last_used = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "sessions": len(self._sessions), "max_sessions": self.max_sessions}
+
+    def _evict_locked(self):
+        """Drop idle sessions past the timeout and beyond max_sessions, call with the lock held"""
+        now = time.monotonic()
+        evicted = []
+        for session_id, session in list(self._sessions.items()):
+            expired = self.idle_timeout is not None and now - session.last_used > self.idle_timeout
+            if session.leases == 0 and (expired or len(self._sessions) > self.max_sessions):
+                del self._sessions[session_id]
+                evicted.append((session_id, session))
+                self._stats["expired" if expired else "evicted"] += 1
+        return evicted
+
+    def _evicted(self, session_id, session):
+        if self.on_evict is not None and session.value is not None:
+            self.on_evict(session_id, session.value)
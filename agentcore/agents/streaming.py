@@ -0,0 +1,102 @@
+"""
+Streaming of sub-agent tokens to the AgentCore entrypoint
+
+The orchestrator and its sub-agents run synchronously, so without streaming the caller sees nothing until the
+whole chain has finished. Here a request installs a sink in a context variable and the sub-agents' callback
+handler forwards every text chunk they generate to it. Strands copies context variables into the threads it
+runs agents and tools on, so the tokens of the sub-agent answering this request reach this request's stream.
+
+Events are dicts, which BedrockAgentCoreApp serializes as server-sent events (`data: {...}`):
+- {"type": "token", "tool": "crypto_educator", "data": "..."}: a text chunk from a sub-agent
+- {"type": "metrics", "answer": "...", "metrics": {...}}: always the final event
+
+USAGE:
+    @app.entrypoint
+    def invoke(payload):
+        return stream_events(orchestrator.query, payload["prompt"])  # async generator -> text/event-stream
+"""
+
+import asyncio
+import contextvars
+import logging
+from strands.handlers.callback_handler import PrintingCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+# sink (callable taking an event dict) of the request currently being streamed, if any
+current_sink = contextvars.ContextVar("stream_sink", default=None)
+
+
+def emit(event):
+    """Send an event to the current request's stream, returns False when the request is not streaming"""
+    sink = current_sink.get()
+    if sink is None:
+        return False
+    sink(event)
+    return True
+
+
+def stream_callback_handler(tool_name):
+    """Create a sub-agent callback handler that streams its text chunks to the current request
+
+    Args:
+        tool_name: Name of the sub-agent tool, added to each token event
+
+    Returns:
+        A callback handler, it prints like the strands default when the request is not streaming
+    """
+    printer = PrintingCallbackHandler()
+
+    def handler(**kwargs):
+        if "data" in kwargs and emit({"type": "token", "tool": tool_name, "data": kwargs["data"]}):
+            return
+        if current_sink.get() is None:
+            printer(**kwargs)
+
+    return handler
+
+
+async def stream_events(query, question):
+    """Run a blocking query in a worker thread and yield its sub-agents' tokens as they are generated
+
+    Args:
+        query: Callable returning a dict with "answer" and "metrics", eg CryptoOrchestrator.query
+        question: The user prompt passed to query
+
+    Yields:
+        Token events, then a final metrics event (or an error event if the query failed)
+    """
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    done = object()
+
+    def sink(event):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    def run():
+        current_sink.set(sink)
+        try:
+            result = query(question)
+            sink({"type": "metrics", "answer": result["answer"], "metrics": result["metrics"]})
+        except Exception as e:
+            logger.exception("streamed query failed")
+            sink({"type": "error", "error": str(e)})
+        finally:
+            sink(done)
+
+    # run in a copy of this context so the sink is only visible to this request
+    ctx = contextvars.copy_context()
+    worker = loop.run_in_executor(None, ctx.run, run)
+
+    streamed_tokens = False
+    while True:
+        event = await events.get()
+        if event is done:
+            break
+        if event["type"] == "token":
+            streamed_tokens = True
+        elif event["type"] == "metrics" and not streamed_tokens:
+            # nothing was streamed (eg the orchestrator answered itself), send the answer as one token
+            yield {"type": "token", "tool": None, "data": event["answer"]}
+        yield event
+    await worker
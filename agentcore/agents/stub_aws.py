@@ -0,0 +1,205 @@
+"""
+Local stand-ins for the S3, Bedrock runtime and S3 Vectors clients used by the knowledge base ingestion, and
+the DynamoDB client of the session store
+
+Each stub implements only the calls kb_ingestion.py makes, with a fixed latency per call, and counts its calls and
+the most calls it served at once:
+
+- StubS3Client: list_objects_v2 (paginated, with ETags) and get_object over an in-memory bucket
+- StubBedrockRuntimeClient: invoke_model of an embedding model, vectors come from a HashingEmbedder; more than
+  max_concurrency calls at once are rejected with a ThrottlingException, like a Bedrock quota
+- StubS3VectorsClient: put_vectors and delete_vectors into a dict, enforcing the 500 vectors per call limit, and
+  query_vectors (cosine distance, with "$eq" / "$in" metadata filters)
+- StubDynamoDBClient: put_item, query (by partition key, in sort key order) and batch_write_item deletes, the
+  first unprocessed_calls calls leave half of their requests in UnprocessedItems, like a throttled table
+
+USAGE:
+    s3 = StubS3Client(corpus("../resources/kb-datasource", copies=20), latency=0.01)
+    bedrock = StubBedrockRuntimeClient(latency=0.005, max_concurrency=6)
+    s3vectors = StubS3VectorsClient()
+    ingest(S3Source("bucket", client=s3), S3VectorsSink("vectors", "index", client=s3vectors),
+           BedrockEmbedder(client=bedrock), "manifest.json")
+"""
+
+import glob
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import Counter
+import numpy as np
+from botocore.exceptions import ClientError
+from embeddings import HashingEmbedder
+
+
+def corpus(datasource_dir, copies=1):
+    """Objects (key -> bytes) of a datasource folder, copied under copies prefixes to make a larger corpus"""
+    objects = {}
+    for path in sorted(glob.glob(os.path.join(datasource_dir, "*.md*"))):
+        with open(path, "rb") as f:
+            body = f.read()
+        name = os.path.basename(path)
+        for copy in range(copies):
+            if name.endswith(".md"):
+                # each copy differs, so its chunks get their own ids
+                objects[f"crypto/{copy:04d}/{name}"] = f"# Copy {copy}\n\n".encode("utf-8") + body.replace(
+                    b"crypto", f"crypto-{copy}".encode("utf-8"))
+            else:
+                objects[f"crypto/{copy:04d}/{name}"] = body
+    return objects
+
+
+class _StubClient:
+    """Latency, call counts and concurrency tracking shared by the stubs"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = Counter()
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _call(self, name, max_concurrency=None):
+        with self._lock:
+            self.calls[name] += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            throttled = max_concurrency is not None and self._in_flight > max_concurrency
+            if throttled:
+                self.calls[f"{name}_throttled"] += 1
+        try:
+            if throttled:
+                raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Too many requests"}}, name)
+            time.sleep(self.latency)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+class StubS3Client(_StubClient):
+
+    def __init__(self, objects=None, latency=0.01):
+        """
+        Args:
+            objects: Dict of key to bytes, see corpus()
+            latency: Seconds per get_object and per listed page
+        """
+        super().__init__(latency)
+        self.objects = dict(objects or {})
+
+    def get_paginator(self, operation):
+        assert operation == "list_objects_v2"
+        return self
+
+    def paginate(self, Bucket, Prefix=""):
+        keys = sorted(key for key in self.objects if key.startswith(Prefix))
+        for i in range(0, max(len(keys), 1), 1000):
+            self._call("list_objects_v2")
+            yield {"Contents": [
+                {"Key": key, "ETag": f'"{hashlib.md5(self.objects[key]).hexdigest()}"', "Size": len(self.objects[key])}
+                for key in keys[i:i + 1000]
+            ]}
+
+    def get_object(self, Bucket, Key):
+        self._call("get_object")
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": Key}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+
+class StubBedrockRuntimeClient(_StubClient):
+
+    def __init__(self, latency=0.005, max_concurrency=None):
+        """
+        Args:
+            latency: Seconds per invoke_model
+            max_concurrency: Calls served at once, calls beyond it are throttled, None for no limit
+        """
+        super().__init__(latency)
+        self.max_concurrency = max_concurrency
+        self._embedders = {}
+
+    def invoke_model(self, modelId, body):
+        request = json.loads(body)
+        self._call("invoke_model", self.max_concurrency)
+        dim = request.get("dimensions", 1024)
+        embedder = self._embedders.setdefault(dim, HashingEmbedder(dim))
+        vector = embedder.embed([request["inputText"]])[0]
+        return {"body": io.BytesIO(json.dumps({"embedding": vector.tolist()}).encode("utf-8"))}
+
+
+class StubS3VectorsClient(_StubClient):
+
+    # most vectors per call, as for S3 Vectors
+    MAX_BATCH = 500
+
+    def __init__(self, latency=0.02):
+        super().__init__(latency)
+        self.vectors = {}
+
+    def put_vectors(self, vectorBucketName, indexName, vectors):
+        assert 1 <= len(vectors) <= self.MAX_BATCH, f"put_vectors takes 1 to {self.MAX_BATCH} vectors"
+        self._call("put_vectors")
+        for vector in vectors:
+            self.vectors[vector["key"]] = vector
+
+    def delete_vectors(self, vectorBucketName, indexName, keys):
+        assert 1 <= len(keys) <= self.MAX_BATCH, f"delete_vectors takes 1 to {self.MAX_BATCH} keys"
+        self._call("delete_vectors")
+        for key in keys:
+            self.vectors.pop(key, None)
+
+    def query_vectors(self, vectorBucketName, indexName, queryVector, topK, filter=None, returnDistance=False,
+                      returnMetadata=False):
+        self._call("query_vectors")
+        query = np.array(queryVector["float32"], dtype=np.float32)
+        results = []
+        for key, vector in self.vectors.items():
+            metadata = vector.get("metadata", {})
+            if filter and not all(
+                metadata.get(field) in condition.get("$in", [condition.get("$eq")]) for field, condition in filter.items()
+            ):
+                continue
+            data = np.array(vector["data"]["float32"], dtype=np.float32)
+            distance = 1.0 - float(query @ data / (np.linalg.norm(query) * np.linalg.norm(data) or 1.0))
+            results.append({"key": key, "distance": distance, "metadata": metadata})
+        results.sort(key=lambda result: result["distance"])
+        return {"vectors": [
+            {"key": r["key"], **({"distance": r["distance"]} if returnDistance else {}),
+             **({"metadata": r["metadata"]} if returnMetadata else {})}
+            for r in results[:topK]
+        ]}
+
+
+class StubDynamoDBClient(_StubClient):
+
+    # most requests per batch_write_item call, as for DynamoDB
+    MAX_BATCH = 25
+
+    def __init__(self, latency=0.0, unprocessed_calls=0):
+        super().__init__(latency)
+        self.items = {}  # (partition key, sort key) -> item
+        self.unprocessed_calls = unprocessed_calls
+
+    def put_item(self, TableName, Item):
+        self._call("put_item")
+        self.items[(Item["session_id"]["S"], Item["item"]["S"])] = Item
+
+    def query(self, TableName, KeyConditionExpression, ExpressionAttributeValues, **kwargs):
+        self._call("query")
+        session_id = ExpressionAttributeValues[":session_id"]["S"]
+        return {"Items": [item for key, item in sorted(self.items.items()) if key[0] == session_id]}
+
+    def batch_write_item(self, RequestItems):
+        (table, requests), = RequestItems.items()
+        assert 1 <= len(requests) <= self.MAX_BATCH, f"batch_write_item takes 1 to {self.MAX_BATCH} requests"
+        self._call("batch_write_item")
+        with self._lock:
+            throttled = self.calls["batch_write_item"] <= self.unprocessed_calls
+        done, unprocessed = (requests[:len(requests) // 2], requests[len(requests) // 2:]) if throttled else (requests, [])
+        for request in done:
+            key = request["DeleteRequest"]["Key"]
+            self.items.pop((key["session_id"]["S"], key["item"]["S"]), None)
+        return {"UnprocessedItems": {table: unprocessed} if unprocessed else {}}
@@ -0,0 +1,143 @@
+"""
+Local stand-in for the GoPlus Labs token security API
+
+Serves GET /api/v1/token_security/{chain_id}?contract_addresses=0x...,0x... with the same response shape as
+https://api.gopluslabs.io (code, message, result keyed by lowercased address), including the bulky holder and
+dex lists the real API returns. Data is derived from the address, so answers are deterministic: an address
+ending in "dead" is reported as a honeypot with a 99% sell tax, an address ending in "0000" is not found (a partial answer, code 2).
+
+USAGE:
+    python stub_goplus_server.py --port 8091
+
+    # point the token security client at it
+    GOPLUS_API_URL=http://localhost:8091/api/v1 python Test_GoPlus_Client.py
+
+Every request is counted, GET /stats returns the number of requests and addresses served.
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PATH_RE = re.compile(r"^/api/v1/token_security/(\w+)$")
+
+stats = {"requests": 0, "addresses": 0}
+stats_lock = threading.Lock()
+
+
+def token_security(chain_id, address):
+    """Fake GoPlus token_security record for an address"""
+    seed = hashlib.sha256(f"{chain_id}:{address}".encode()).digest()
+    honeypot = address.endswith("dead")
+    holders = [
+        {
+            "address": "0x" + hashlib.sha256(seed + bytes([i])).hexdigest()[:40],
+            "tag": "",
+            "is_contract": 0,
+            "balance": str(1000000 - i * 1000),
+            "percent": f"{0.05 - i * 0.001:.6f}",
+            "is_locked": 0,
+        }
+        for i in range(10)
+    ]
+    return {
+        "token_name": f"Stub Token {address[2:6].upper()}",
+        "token_symbol": f"STB{seed[0] % 100}",
+        "total_supply": "1000000000",
+        "holder_count": str(1000 + seed[1] * 37),
+        "owner_address": "0x" + seed.hex()[:40] if seed[2] % 2 else "",
+        "creator_address": "0x" + seed.hex()[24:64],
+        "is_honeypot": "1" if honeypot else "0",
+        "buy_tax": "0" if not honeypot else "0.05",
+        "sell_tax": "0.99" if honeypot else f"{seed[3] % 5 / 100:.2f}",
+        "can_take_back_ownership": "1" if honeypot else "0",
+        "slippage_modifiable": "1" if honeypot else "0",
+        "is_blacklisted": "1" if seed[4] % 4 == 0 else "0",
+        "is_whitelisted": "0",
+        "is_open_source": "0" if honeypot else "1",
+        "is_proxy": "1" if seed[5] % 3 == 0 else "0",
+        "external_call": "0",
+        "is_mintable": "1" if seed[6] % 2 else "0",
+        "hidden_owner": "0",
+        "selfdestruct": "0",
+        "transfer_pausable": "0",
+        "trading_cooldown": "0",
+        "is_anti_whale": "0",
+        "personal_slippage_modifiable": "0",
+        "cannot_buy": "0",
+        "cannot_sell_all": "1" if honeypot else "0",
+        "owner_change_balance": "0",
+        "is_in_dex": "1",
+        "dex": [
+            {"liquidity_type": "UniV2", "name": "UniswapV2", "liquidity": "152340.52", "pair": "0x" + seed.hex()[:40]},
+            {"liquidity_type": "UniV3", "name": "UniswapV3", "liquidity": "98211.13", "pair": "0x" + seed.hex()[8:48]},
+        ],
+        "holders": holders,
+        "lp_holders": holders[:3],
+        "lp_holder_count": "12",
+        "lp_total_supply": "5000",
+        "trust_list": "0",
+    }
+
+
+class GoPlusHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            with stats_lock:
+                return self._send(200, dict(stats))
+        match = PATH_RE.match(url.path)
+        if not match:
+            return self._send(404, {"code": 0, "message": "not found", "result": {}})
+        addresses = [a.strip().lower() for a in parse_qs(url.query).get("contract_addresses", [""])[0].split(",")]
+        addresses = [a for a in addresses if a]
+        if not addresses:
+            return self._send(200, {"code": 0, "message": "contract_addresses is required", "result": {}})
+        with stats_lock:
+            stats["requests"] += 1
+            stats["addresses"] += len(addresses)
+        time.sleep(self.latency)
+        result = {a: token_security(match.group(1), a) for a in addresses if not a.endswith("0000")}
+        if len(result) < len(addresses):
+            # as GoPlus answers a batch with tokens it has no data on yet
+            return self._send(200, {"code": 2, "message": "partial data obtained", "result": result})
+        self._send(200, {"code": 1, "message": "OK", "result": result})
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=0, latency=0.0):
+    """Start the stub in a background thread, returns the server (server.server_port has the bound port)"""
+    handler = type("Handler", (GoPlusHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub of the GoPlus token security API")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    args = parser.parse_args()
+    server = serve(args.port, args.latency)
+    print(f"GoPlus stub listening on http://127.0.0.1:{server.server_port}/api/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,123 @@
+"""
+Local stand-in for the CoinGecko MCP server (stdio transport)
+
+Speaks just enough of the Model Context Protocol (newline-delimited JSON-RPC over stdin/stdout)
+to let the MCP session pool and tool catalog be exercised without Node.js, `npx mcp-remote`
+or network access. Prices are fixed, so answers are deterministic.
+
+USAGE:
+    python stub_mcp_server.py
+
+    # or wire it into an MCPClient in place of npx
+    MCPClient(lambda: stdio_client(StdioServerParameters(command=sys.executable, args=["stub_mcp_server.py"])))
+
+TOOLS:
+- get_simple_price: price, market cap and 24h change for a coin id (eg bitcoin)
+- get_search_trending: the top trending coins
+- crash: exits the server process, used to simulate the MCP process dying mid-session
+
+ENV VARS:
+- STUB_MCP_LATENCY: seconds to sleep before answering each tools/call (default 0)
+"""
+
+import json
+import os
+import sys
+import time
+
+SERVER_NAME = "coingecko-stub"
+SERVER_VERSION = "0.1.0"
+DEFAULT_PROTOCOL_VERSION = "2025-06-18"
+
+PRICES = {
+    "bitcoin": {"symbol": "btc", "usd": 65000.0, "usd_market_cap": 1280000000000.0, "usd_24h_change": 1.25},
+    "ethereum": {"symbol": "eth", "usd": 3200.0, "usd_market_cap": 385000000000.0, "usd_24h_change": -0.75},
+    "solana": {"symbol": "sol", "usd": 145.0, "usd_market_cap": 67000000000.0, "usd_24h_change": 3.1},
+}
+
+TOOLS = [
+    {
+        "name": "get_simple_price",
+        "description": "Get the current price of a coin in USD, with market cap and 24h change.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "ids": {"type": "string", "description": "Comma-separated CoinGecko coin ids, eg bitcoin,ethereum"},
+            },
+            "required": ["ids"],
+        },
+    },
+    {
+        "name": "get_search_trending",
+        "description": "Get the top trending coins on CoinGecko.",
+        "inputSchema": {"type": "object", "properties": {}},
+    },
+    {
+        "name": "crash",
+        "description": "Terminate the server process (test helper).",
+        "inputSchema": {"type": "object", "properties": {}},
+    },
+]
+
+
+def call_tool(name, arguments):
+    """Run a stub tool and return its MCP content blocks"""
+    if name == "get_simple_price":
+        ids = [i.strip().lower() for i in arguments.get("ids", "").split(",") if i.strip()]
+        result = {i: PRICES[i] for i in ids if i in PRICES}
+    elif name == "get_search_trending":
+        result = {"coins": [{"id": coin_id, "symbol": data["symbol"]} for coin_id, data in PRICES.items()]}
+    elif name == "crash":
+        sys.stdout.flush()
+        os._exit(1)
+    else:
+        return [{"type": "text", "text": f"Unknown tool: {name}"}], True
+    return [{"type": "text", "text": json.dumps(result)}], False
+
+
+def handle(message):
+    """Handle one JSON-RPC message, returning the response dict or None for notifications"""
+    method = message.get("method")
+    params = message.get("params") or {}
+    if "id" not in message:
+        # notifications (eg notifications/initialized) need no reply
+        return None
+
+    if method == "initialize":
+        result = {
+            "protocolVersion": params.get("protocolVersion", DEFAULT_PROTOCOL_VERSION),
+            "capabilities": {"tools": {"listChanged": False}},
+            "serverInfo": {"name": SERVER_NAME, "version": SERVER_VERSION},
+        }
+    elif method == "ping":
+        result = {}
+    elif method == "tools/list":
+        result = {"tools": TOOLS}
+    elif method == "tools/call":
+        latency = float(os.environ.get("STUB_MCP_LATENCY", "0"))
+        if latency:
+            time.sleep(latency)
+        content, is_error = call_tool(params.get("name"), params.get("arguments") or {})
+        result = {"content": content, "isError": is_error}
+    else:
+        return {
+            "jsonrpc": "2.0",
+            "id": message["id"],
+            "error": {"code": -32601, "message": f"Method not found: {method}"},
+        }
+    return {"jsonrpc": "2.0", "id": message["id"], "result": result}
+
+
+def main():
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        response = handle(json.loads(line))
+        if response is not None:
+            sys.stdout.write(json.dumps(response) + "\n")
+            sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Deterministic local stand-in for the Bedrock model, for offline benchmarks
+
+A strands Model that never calls Bedrock. Every call waits a fixed time to first token, then streams a fixed number
+of output tokens with a fixed delay between them, and reports token usage like Bedrock does (input tokens are
+estimated from the size of the system prompt, messages and tool specs). So the time an agent spends in the model
+is known and the rest of a benchmark's latency is the agents' own overhead.
+
+Tool use is scripted, on the first turn of an invocation the model calls the first tool in tool_inputs that the
+agent has (eg goplus_token_security for the security sub-agent), or the tool picked by choose_tool, and answers
+with text once the tool result is in. Agents without a scripted tool answer straight away. Structured output is
+scripted the same way, the output model is built from tool_inputs[output_model.__name__].
+
+USAGE:
+    model = StubModel(first_token_latency=0.3, token_latency=0.01, output_tokens=150,
+                      tool_inputs={"get_simple_price": {"ids": "bitcoin"}})
+    set_bedrock_model(model, INFERENCE_MODEL, REGION)  # see model_registry, before the agents are imported
+"""
+
+import asyncio
+import json
+import time
+from strands.models.model import Model
+
+# rough characters per token of English text, used to estimate input tokens
+CHARS_PER_TOKEN = 4
+
+
+class StubModel(Model):
+    """Bedrock stand-in with configurable latency, token counts and scripted tool calls"""
+
+    def __init__(self, first_token_latency=0.3, token_latency=0.01, output_tokens=150, tool_inputs=None,
+                 choose_tool=None):
+        """
+        Args:
+            first_token_latency: Seconds before the first token of every model call
+            token_latency: Seconds between output tokens
+            output_tokens: Tokens in every text answer
+            tool_inputs: Dict of tool name to its input, a dict or a callable taking the user prompt
+            choose_tool: Optional callable (prompt, tool names) returning the tool to call, eg for the orchestrator
+        """
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.output_tokens = output_tokens
+        self.tool_inputs = dict(tool_inputs or {})
+        self.choose_tool = choose_tool
+        self.config = {"model_id": "stub"}
+
+    def update_config(self, **model_config):
+        self.config.update(model_config)
+
+    def get_config(self):
+        return self.config
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        """output_model built from the fields scripted under its class name in tool_inputs, as its tool's input"""
+        await asyncio.sleep(self.first_token_latency)
+        fields = self.tool_inputs.get(output_model.__name__, {})
+        if callable(fields):
+            fields = fields(self._prompt(prompt))
+        yield {"output": output_model(**fields)}
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        start = time.perf_counter()
+        input_tokens = len(json.dumps([system_prompt, messages, tool_specs], default=str)) // CHARS_PER_TOKEN
+        await asyncio.sleep(self.first_token_latency)
+        yield {"messageStart": {"role": "assistant"}}
+
+        tool_name = self._pick_tool(messages, tool_specs)
+        if tool_name is not None:
+            tool_input = self.tool_inputs.get(tool_name, {"query": self._prompt(messages)})
+            if callable(tool_input):
+                tool_input = tool_input(self._prompt(messages))
+            yield {"contentBlockStart": {"start": {"toolUse": {"toolUseId": f"stub-{time.monotonic_ns()}", "name": tool_name}}}}
+            yield {"contentBlockDelta": {"delta": {"toolUse": {"input": json.dumps(tool_input)}}}}
+            yield {"contentBlockStop": {}}
+            yield {"messageStop": {"stopReason": "tool_use"}}
+            output_tokens = len(json.dumps(tool_input)) // CHARS_PER_TOKEN + 1
+        else:
+            yield {"contentBlockStart": {"start": {}}}
+            for i in range(self.output_tokens):
+                if self.token_latency:
+                    await asyncio.sleep(self.token_latency)
+                yield {"contentBlockDelta": {"delta": {"text": f"tok{i} "}}}
+            yield {"contentBlockStop": {}}
+            yield {"messageStop": {"stopReason": "end_turn"}}
+            output_tokens = self.output_tokens
+
+        yield {
+            "metadata": {
+                "usage": {
+                    "inputTokens": input_tokens,
+                    "outputTokens": output_tokens,
+                    "totalTokens": input_tokens + output_tokens,
+                },
+                "metrics": {"latencyMs": int((time.perf_counter() - start) * 1000)},
+            }
+        }
+
+    def _pick_tool(self, messages, tool_specs):
+        """Tool to call on this turn, None once the last message is a tool result or no tool is scripted"""
+        if not tool_specs or any("toolResult" in block for block in messages[-1]["content"]):
+            return None
+        names = [spec["name"] for spec in tool_specs]
+        if self.choose_tool is not None:
+            choice = self.choose_tool(self._prompt(messages), names)
+            if choice in names:
+                return choice
+        return next((name for name in self.tool_inputs if name in names), None)
+
+    @staticmethod
+    def _prompt(messages):
+        """Text of the last user message"""
+        for message in reversed(messages):
+            if message["role"] == "user":
+                texts = [block["text"] for block in message["content"] if "text" in block]
+                if texts:
+                    return "\n".join(texts)
+        return ""
@@ -0,0 +1,143 @@
+"""
+Per sub-agent tool latency and token breakdown, also exported as OpenTelemetry spans
+
+A sub-agent tool returns str(response), so the tokens and time its inner agent spent are lost and the orchestrator's
+metrics only show its own model calls. Here each sub-agent tool call is measured:
+
+- wall time of the call, from the orchestrator's point of view
+- model time (Bedrock latency) and input/output tokens of the inner agent, from its AgentResult metrics
+- time in the inner agent's tools, also counted as MCP or HTTP time depending on what the sub-agent's tools call
+- other time, ie the rest of the wall time (waiting for a pooled agent or MCP session, strands overhead)
+
+Each call runs in a "sub_agent <tool>" span with the same numbers as attributes, a child of the span of the
+request and the parent of the spans strands creates for the inner agent's model and tool calls, so a trace shows
+where a request's time went. Spans go to whatever tracer provider is configured (eg AgentCore Observability),
+without one they are no-ops.
+
+Calls made while handling one request are collected by track(), which CryptoOrchestrator.query uses to report
+the per-tool breakdown in its metrics.
+
+USAGE:
+    @tool
+    @measured
+    @response_cache.cached
+    def crypto_educator(query: str) -> str:
+        with kb_agent_pool.lease() as kb_agent:
+            response = kb_agent(query)
+        record_agent_result(response, io="http")
+        return str(response)
+"""
+
+import contextvars
+import functools
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from opentelemetry import trace
+
+tracer = trace.get_tracer(__name__)
+
+# times reported in seconds, rounded to the millisecond
+TIME_FIELDS = ("wall_time", "model_time", "tool_time", "mcp_time", "http_time", "other_time")
+TOKEN_FIELDS = ("input_tokens", "output_tokens", "total_tokens")
+
+# breakdown of the request currently being handled, see track()
+_current_breakdown = contextvars.ContextVar("tool_metrics_breakdown", default=None)
+# counters of the sub-agent tool call currently running, see measured()
+_current_call = contextvars.ContextVar("tool_metrics_call", default=None)
+
+
+class ToolBreakdown:
+    """Thread safe per-tool totals of the sub-agent calls of one request (fanned out parts run side by side)"""
+
+    def __init__(self):
+        self._tools = {}
+        self._lock = threading.Lock()
+
+    def add(self, tool, counters):
+        with self._lock:
+            self._tools.setdefault(tool, Counter()).update(counters)
+
+    def report(self):
+        """Dict of tool name to its calls, times (seconds) and tokens"""
+        with self._lock:
+            tools = {tool: Counter(counters) for tool, counters in self._tools.items()}
+        return {
+            tool: {
+                "calls": counters["calls"],
+                **{f: round(counters[f], 3) for f in TIME_FIELDS},
+                **{f: counters[f] for f in TOKEN_FIELDS},
+                "model_calls": counters["model_calls"],
+                "inner_tool_calls": counters["inner_tool_calls"],
+            }
+            for tool, counters in tools.items()
+        }
+
+
+@contextmanager
+def track():
+    """Collect the sub-agent tool calls made inside the with block, including those on other threads
+
+    Yields:
+        The ToolBreakdown the calls are added to
+    """
+    breakdown = ToolBreakdown()
+    token = _current_breakdown.set(breakdown)
+    try:
+        yield breakdown
+    finally:
+        _current_breakdown.reset(token)
+
+
+def measured(func):
+    """Decorator measuring a sub-agent tool function, apply it below @tool and above @response_cache.cached"""
+    tool = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        counters = Counter(calls=1)
+        token = _current_call.set(counters)
+        start = time.perf_counter()
+        try:
+            with tracer.start_as_current_span(f"sub_agent {tool}", attributes={"sub_agent.tool": tool}) as span:
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    counters["wall_time"] = time.perf_counter() - start
+                    counters["other_time"] = max(
+                        0.0, counters["wall_time"] - counters["model_time"] - counters["tool_time"]
+                    )
+                    span.set_attributes({f"sub_agent.{k}": round(v, 3) for k, v in counters.items()})
+        finally:
+            _current_call.reset(token)
+            breakdown = _current_breakdown.get()
+            if breakdown is not None:
+                breakdown.add(tool, counters)
+
+    return wrapper
+
+
+def record_agent_result(result, io=None):
+    """Add an inner agent's model time, tokens and tool time to the sub-agent tool call running
+
+    Args:
+        result: AgentResult of the inner agent, its metrics must only cover this call (eg a pooled agent)
+        io: "mcp" or "http" when the inner agent's tools are MCP tools or HTTP calls, their time is counted as such
+    """
+    counters = _current_call.get()
+    if counters is None:
+        return
+    metrics = result.metrics
+    tool_time = sum(m.total_time for m in metrics.tool_metrics.values())
+    counters.update({
+        "model_time": metrics.accumulated_metrics["latencyMs"] / 1000,
+        "input_tokens": metrics.accumulated_usage["inputTokens"],
+        "output_tokens": metrics.accumulated_usage["outputTokens"],
+        "total_tokens": metrics.accumulated_usage["totalTokens"],
+        "model_calls": metrics.cycle_count,
+        "inner_tool_calls": sum(m.call_count for m in metrics.tool_metrics.values()),
+        "tool_time": tool_time,
+    })
+    if io in ("mcp", "http"):
+        counters[f"{io}_time"] += tool_time
@@ -0,0 +1,270 @@
+"""
+Async (ASGI) version of the chat website
+
+web_app.py runs synchronous Flask, so every chat ties up a worker thread for the whole agent runtime call and the
+number of workers caps the number of concurrent chats. This version serves the same page and routes from one
+asyncio event loop:
+
+- runtime calls are offloaded to a dedicated thread pool sharing one boto3 client, whose connection pool is
+  sized to match, so connections to AgentCore are kept alive and reused
+- at most MAX_IN_FLIGHT runtime calls run at once, up to MAX_QUEUED more wait (for at most QUEUE_TIMEOUT
+  seconds) and anything beyond that is rejected straight away with a 429 and a Retry-After header
+- /stats reports the in-flight, queued and rejected counts
+
+USAGE:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8080
+
+    # load test against the local stub runtime, see load_test.py
+"""
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from botocore.config import Config
+from certifi import where
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.templating import Jinja2Templates
+from config import (
+    AGENT_RUNTIME_ARN,
+    REGION,
+    AGENTCORE_ENDPOINT_URL,
+    MAX_IN_FLIGHT,
+    MAX_QUEUED,
+    QUEUE_TIMEOUT,
+    RUNTIME_READ_TIMEOUT,
+)
+from chat_format import format_metrics, sse, STREAM_CHUNK_SIZE
+import uuid
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted, the client should retry later"""
+
+
+class Slot:
+    """One admitted request, releasing it more than once is harmless"""
+
+    def __init__(self, controller):
+        self._controller = controller
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release()
+
+
+class SlotStreamingResponse(StreamingResponse):
+    """Streaming response that frees its slot however the stream ends, even if the client left before it started"""
+
+    def __init__(self, content, slot, **kwargs):
+        super().__init__(content, **kwargs)
+        self.slot = slot
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.slot.release()
+
+
+class AdmissionController:
+    """Caps concurrent runtime calls, queues a bounded number of waiters and rejects the rest"""
+
+    def __init__(self, max_in_flight, max_queued, queue_timeout):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        """Wait for a free slot
+
+        Returns:
+            A Slot, release it when the runtime call is finished
+
+        Raises:
+            Overloaded: If the queue is full or no slot became free within queue_timeout
+        """
+        if self._slots.locked() and self.queued >= self.max_queued:
+            self.rejected += 1
+            raise Overloaded("too many requests queued")
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded(f"no capacity within {self.queue_timeout}s") from None
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        self.admitted += 1
+        return Slot(self)
+
+    def _release(self):
+        self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "max_in_flight": self.max_in_flight,
+            "max_queued": self.max_queued,
+        }
+
+
+# Configure AWS clients
+# one client shared by all worker threads (boto3 clients are thread safe), its pool holds a connection per slot
+agentcore = boto3.client(
+    'bedrock-agentcore',
+    region_name=REGION,
+    verify=where(),
+    endpoint_url=AGENTCORE_ENDPOINT_URL,
+    config=Config(
+        max_pool_connections=MAX_IN_FLIGHT,
+        read_timeout=RUNTIME_READ_TIMEOUT,
+        tcp_keepalive=True,
+        retries={"max_attempts": 2, "mode": "standard"},
+    ),
+)
+
+# a thread per in-flight call, the default executor is far smaller
+executor = ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT, thread_name_prefix="agentcore")
+admission = AdmissionController(MAX_IN_FLIGHT, MAX_QUEUED, QUEUE_TIMEOUT)
+templates = Jinja2Templates(directory="templates")
+
+
+def too_many_requests(error):
+    return JSONResponse({'error': str(error)}, status_code=429, headers={'Retry-After': str(QUEUE_TIMEOUT)})
+
+
+def get_session_id(request):
+    # Generate or retrieve session ID (minimum 33 chars)
+    if 'session_id' not in request.session:
+        request.session['session_id'] = f"web-session-{uuid.uuid4()}"
+    return request.session['session_id']
+
+
+def invoke_runtime(user_message, session_id, stream):
+    return agentcore.invoke_agent_runtime(
+        agentRuntimeArn=AGENT_RUNTIME_ARN,
+        payload=json.dumps({"prompt": user_message, "stream": stream}),
+        runtimeSessionId=session_id
+    )
+
+
+async def run_blocking(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+async def index(request: Request):
+    return templates.TemplateResponse(request, 'index.html')
+
+
+async def chat(request: Request):
+    user_message = (await request.json()).get('message', '')
+    session_id = get_session_id(request)
+
+    try:
+        slot = await admission.acquire()
+    except Overloaded as e:
+        return too_many_requests(e)
+
+    try:
+        response = await run_blocking(invoke_runtime, user_message, session_id, False)
+        body = await run_blocking(response['response'].read)
+        result = json.loads(body) if response.get('contentType') == 'application/json' else body.decode('utf-8')
+
+        # Format response if it contains metrics
+        if isinstance(result, dict) and 'answer' in result:
+            formatted = result['answer'].replace('<thinking>', '').replace('</thinking>', '').strip()
+            metrics = result.get('metrics', {})
+            if metrics:
+                formatted += format_metrics(metrics)
+            return JSONResponse({'response': formatted})
+
+        return JSONResponse({'response': str(result)})
+
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+    finally:
+        slot.release()
+
+
+async def chat_stream(request: Request):
+    """Relay the runtime's event stream to the browser as it arrives (server-sent events)"""
+    user_message = (await request.json()).get('message', '')
+    session_id = get_session_id(request)
+
+    # admit before the response starts, so an overloaded server can still answer with a 429
+    try:
+        slot = await admission.acquire()
+    except Overloaded as e:
+        return too_many_requests(e)
+
+    async def generate():
+        try:
+            response = await run_blocking(invoke_runtime, user_message, session_id, True)
+
+            if "text/event-stream" not in response.get('contentType', ''):
+                # the runtime did not stream (eg an older agent version), send its whole answer as one event
+                result = json.loads(await run_blocking(response['response'].read))
+                answer = result.get('answer', str(result)) if isinstance(result, dict) else str(result)
+                metrics = result.get('metrics', {}) if isinstance(result, dict) else {}
+                yield sse({'type': 'token', 'data': answer})
+                yield sse({'type': 'metrics', 'answer': answer, 'metrics': metrics, 'footer': format_metrics(metrics) if metrics else ''})
+                return
+
+            lines = response['response'].iter_lines(chunk_size=STREAM_CHUNK_SIZE)
+            while True:
+                # each read blocks on the network, so it runs on the worker threads
+                line = await run_blocking(next, lines, None)
+                if line is None:
+                    break
+                line = line.decode('utf-8')
+                if not line.startswith('data: '):
+                    continue
+                event = json.loads(line[6:])
+                if isinstance(event, dict) and event.get('type') == 'metrics':
+                    event['footer'] = format_metrics(event.get('metrics', {}))
+                yield sse(event)
+        except Exception as e:
+            yield sse({'type': 'error', 'error': str(e)})
+        finally:
+            slot.release()
+
+    return SlotStreamingResponse(
+        generate(),
+        slot,
+        media_type='text/event-stream',
+        # stop proxies buffering the stream
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+async def stats(request: Request):
+    return JSONResponse(admission.stats())
+
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/chat', chat, methods=['POST']),
+        Route('/chat/stream', chat_stream, methods=['POST']),
+        Route('/stats', stats),
+    ],
+    middleware=[Middleware(SessionMiddleware, secret_key='your-secret-key-here')],
+)
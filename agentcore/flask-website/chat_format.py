@@ -0,0 +1,16 @@
+"""
+Formatting shared by the Flask (web_app.py) and ASGI (asgi_app.py) front ends
+
+Kept apart from both apps so either one can be served without importing the other's framework or clients.
+"""
+
+import json
+
+# Bytes read at a time from the runtime's event stream, small so each token event is relayed as soon as it arrives
+STREAM_CHUNK_SIZE = 64
+
+def format_metrics(metrics):
+    return f"\n\n---\n📊 Tokens: {metrics.get('total_tokens', 'N/A')} | ⏱️ Time: {metrics.get('execution_time', 'N/A')} | 🔧 Tools: {', '.join(metrics.get('tools_used', []))}"
+
+def sse(event):
+    return f"data: {json.dumps(event)}\n\n"
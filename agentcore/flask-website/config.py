@@ -1,3 +1,4 @@
+import os
 import warnings
 
 # ===== CONFIGURATION =====
@@ -7,6 +8,18 @@ REGION = "us-east-1"
 # Your AGENT_RUNTIME_ARN
 AGENT_RUNTIME_ARN = 'XXXXXXXX'  # Replace with your agent arn
 
+# ===== ASYNC SERVING (asgi_app.py) =====
+# Maximum concurrent calls to the agent runtime, also the size of the HTTP connection pool and worker threads
+MAX_IN_FLIGHT = 200
+# Requests allowed to wait for a free slot, beyond this new requests get a 429
+MAX_QUEUED = 100
+# Seconds a queued request waits for a free slot before getting a 429
+QUEUE_TIMEOUT = 10
+# Seconds to wait for data from the agent runtime, agent chains can take a while
+RUNTIME_READ_TIMEOUT = 300
+# Override the AgentCore endpoint, eg "http://localhost:8090" for the local stub runtime (stub_runtime.py)
+AGENTCORE_ENDPOINT_URL = os.environ.get("AGENTCORE_ENDPOINT_URL")
+
 # DO NOT REPLACE THIS ONE - ITS USED TO WARN WHEN YOU HAVE NOT DONE IT ABOVE!!
 if AGENT_RUNTIME_ARN == "XXXXXXXX":
     warnings.warn(
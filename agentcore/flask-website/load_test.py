@@ -0,0 +1,92 @@
+"""
+Load test for the chat website
+
+Runs a number of concurrent virtual users, each with its own cookie session, that send chats back to back for a
+fixed duration, then reports status codes, latency percentiles, time to first byte (streaming) and throughput.
+
+USAGE:
+    # terminal 1: stub runtime, every answer takes 5s
+    python stub_runtime.py --port 8090 --latency 5
+
+    # terminal 2: the website under test
+    AGENTCORE_ENDPOINT_URL=http://localhost:8090 AWS_ACCESS_KEY_ID=x AWS_SECRET_ACCESS_KEY=x \\
+        uvicorn asgi_app:app --port 8080
+
+    # terminal 3
+    python load_test.py --url http://localhost:8080 --users 500 --duration 30 --stream
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def virtual_user(base_url, path, deadline, results):
+    # one client per user so each keeps its own session cookie, like a separate browser
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            first_byte = None
+            try:
+                async with client.stream("POST", path, json={"message": "What is Bitcoin?"}) as response:
+                    async for _ in response.aiter_bytes():
+                        if first_byte is None:
+                            first_byte = time.perf_counter() - start
+                    status = response.status_code
+                    retry_after = response.headers.get("Retry-After")
+            except httpx.HTTPError as e:
+                status, retry_after = type(e).__name__, None
+            elapsed = time.perf_counter() - start
+            results.append((status, elapsed, first_byte))
+            if status == 429:
+                # back off as told, but stop at the end of the test
+                await asyncio.sleep(min(float(retry_after or 1), max(deadline - time.perf_counter(), 0)))
+
+
+async def run(base_url, users, duration, stream):
+    path = "/chat/stream" if stream else "/chat"
+    results = []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(virtual_user(base_url, path, deadline, results) for _ in range(users)))
+    wall = time.perf_counter() - start
+
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        response = await client.get("/stats")
+        # the Flask app has no /stats
+        server_stats = response.json() if response.status_code == 200 else {}
+
+    ok = [r for r in results if r[0] == 200]
+    latencies = [r[1] for r in ok]
+    ttfb = [r[2] for r in ok if r[2] is not None]
+
+    print(f"Load test: {users} users, {duration}s, {path}")
+    print(f"Requests:    {len(results)} in {wall:.1f}s")
+    print(f"Status:      {dict(Counter(r[0] for r in results))}")
+    print(f"Throughput:  {len(ok) / wall:.1f} answers/s")
+    print(f"Latency:     p50 {percentile(latencies, 50):.2f}s  p95 {percentile(latencies, 95):.2f}s  "
+          f"p99 {percentile(latencies, 99):.2f}s")
+    if stream:
+        print(f"First byte:  p50 {percentile(ttfb, 50):.2f}s  p95 {percentile(ttfb, 95):.2f}s  "
+              f"p99 {percentile(ttfb, 99):.2f}s")
+    if server_stats:
+        print(f"Server:      {server_stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the chat website")
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--users", type=int, default=100, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--stream", action="store_true", help="use /chat/stream instead of /chat")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.users, args.duration, args.stream))
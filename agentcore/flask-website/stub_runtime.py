@@ -0,0 +1,74 @@
+"""
+Local stand-in for the AgentCore runtime (InvokeAgentRuntime), used to load test the website without AWS
+
+Answers POST /runtimes/{agentRuntimeArn}/invocations like the deployed crypto orchestration agent:
+- {"prompt": "...", "stream": true}: text/event-stream of token events then a final metrics event
+- {"prompt": "..."}: a single application/json answer with metrics
+Each answer takes --latency seconds, spread over --tokens tokens when streaming.
+
+USAGE:
+    python stub_runtime.py --port 8090 --latency 5 --tokens 50
+
+    # then point the website at it, boto3 still needs (any) credentials to sign the request
+    AGENTCORE_ENDPOINT_URL=http://localhost:8090 AWS_ACCESS_KEY_ID=x AWS_SECRET_ACCESS_KEY=x uvicorn asgi_app:app
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+SESSION_HEADER = "X-Amzn-Bedrock-AgentCore-Runtime-Session-Id"
+
+settings = {"latency": 5.0, "tokens": 50}
+
+
+def metrics(elapsed):
+    return {
+        "total_tokens": settings["tokens"] + 100,
+        "input_tokens": 100,
+        "output_tokens": settings["tokens"],
+        "execution_time": f"{elapsed:.2f}s",
+        "tools_used": ["general_knowledge"],
+    }
+
+
+async def invocations(request):
+    start = time.perf_counter()
+    payload = json.loads(await request.body() or b"{}")
+    prompt = payload.get("prompt", "Hello")
+    headers = {SESSION_HEADER: request.headers.get(SESSION_HEADER, "")}
+    words = [f"token{i}" for i in range(settings["tokens"])]
+    delay = settings["latency"] / max(len(words), 1)
+
+    if payload.get("stream"):
+
+        async def events():
+            for word in words:
+                await asyncio.sleep(delay)
+                yield f"data: {json.dumps({'type': 'token', 'tool': 'general_knowledge', 'data': word + ' '})}\n\n"
+            answer = f"Stub answer to: {prompt}"
+            final = {"type": "metrics", "answer": answer, "metrics": metrics(time.perf_counter() - start)}
+            yield f"data: {json.dumps(final)}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+    await asyncio.sleep(settings["latency"])
+    answer = f"Stub answer to: {prompt}\n" + " ".join(words)
+    return JSONResponse({"answer": answer, "metrics": metrics(time.perf_counter() - start)}, headers=headers)
+
+
+app = Starlette(routes=[Route("/runtimes/{arn:path}/invocations", invocations, methods=["POST"])])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub of the AgentCore runtime")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=settings["latency"], help="seconds per answer")
+    parser.add_argument("--tokens", type=int, default=settings["tokens"], help="tokens per answer")
+    args = parser.parse_args()
+    settings.update(latency=args.latency, tokens=args.tokens)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -1,15 +1,22 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context
 import boto3
 import json
 import uuid
 from certifi import where
-from config import AGENT_RUNTIME_ARN, REGION
+from config import AGENT_RUNTIME_ARN, REGION, AGENTCORE_ENDPOINT_URL
+from chat_format import format_metrics, sse, STREAM_CHUNK_SIZE
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'
 
 # Configure AWS clients
-agentcore = boto3.client('bedrock-agentcore', region_name=REGION, verify=where())
+agentcore = boto3.client('bedrock-agentcore', region_name=REGION, verify=where(), endpoint_url=AGENTCORE_ENDPOINT_URL)
+
+def get_session_id():
+    # Generate or retrieve session ID (minimum 33 chars)
+    if 'session_id' not in session:
+        session['session_id'] = f"web-session-{uuid.uuid4()}"
+    return session['session_id']
 
 @app.route('/')
 def index():
@@ -18,16 +25,13 @@ def index():
 @app.route('/chat', methods=['POST'])
 def chat():
     user_message = request.json.get('message', '')
-    
-    # Generate or retrieve session ID (minimum 33 chars)
-    if 'session_id' not in session:
-        session['session_id'] = f"web-session-{uuid.uuid4()}"
+    session_id = get_session_id()
     
     try:
         response = agentcore.invoke_agent_runtime(
             agentRuntimeArn=AGENT_RUNTIME_ARN,
             payload=json.dumps({"prompt": user_message}),
-            runtimeSessionId=session['session_id']
+            runtimeSessionId=session_id
         )
         
         # Extract response text
@@ -44,7 +48,7 @@ def chat():
             formatted = result['answer'].replace('<thinking>', '').replace('</thinking>', '').strip()
             metrics = result.get('metrics', {})
             if metrics:
-                formatted += f"\n\n---\n📊 Tokens: {metrics.get('total_tokens', 'N/A')} | ⏱️ Time: {metrics.get('execution_time', 'N/A')} | 🔧 Tools: {', '.join(metrics.get('tools_used', []))}"
+                formatted += format_metrics(metrics)
             return jsonify({'response': formatted})
         
         return jsonify({'response': str(result)})
@@ -52,5 +56,48 @@ def chat():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Relay the runtime's event stream to the browser as it arrives (server-sent events)"""
+    user_message = request.json.get('message', '')
+    session_id = get_session_id()
+
+    def generate():
+        try:
+            response = agentcore.invoke_agent_runtime(
+                agentRuntimeArn=AGENT_RUNTIME_ARN,
+                payload=json.dumps({"prompt": user_message, "stream": True}),
+                runtimeSessionId=session_id
+            )
+
+            if "text/event-stream" in response.get('contentType', ''):
+                for line in response['response'].iter_lines(chunk_size=STREAM_CHUNK_SIZE):
+                    line = line.decode('utf-8')
+                    if not line.startswith('data: '):
+                        continue
+                    event = json.loads(line[6:])
+                    if isinstance(event, dict) and event.get('type') == 'metrics':
+                        event['footer'] = format_metrics(event.get('metrics', {}))
+                    yield sse(event)
+                return
+
+            # the runtime did not stream (eg an older agent version), send its whole answer as one event
+            result = json.loads(response['response'].read().decode('utf-8'))
+            if isinstance(result, dict) and 'answer' in result:
+                yield sse({'type': 'token', 'data': result['answer']})
+                metrics = result.get('metrics', {})
+                yield sse({'type': 'metrics', 'answer': result['answer'], 'metrics': metrics, 'footer': format_metrics(metrics) if metrics else ''})
+            else:
+                yield sse({'type': 'token', 'data': str(result)})
+        except Exception as e:
+            yield sse({'type': 'error', 'error': str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        # stop proxies buffering the stream
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', debug=True, port=8080)